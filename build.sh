@@ -4,6 +4,8 @@ set -o errexit
 
 pip install -r requirements.txt
 
+python manage.py build_assets
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py createcachetable
 python manage.py create_superuser_jtanabalon
@@ -0,0 +1,187 @@
+"""
+Calendario de citas de un profesional: agenda (hoy y mañana), semana, mes y
+feed iCal para aplicaciones de calendario.
+
+* Cada vista hace una sola consulta por rango ``date_time >= inicio AND
+  date_time < fin`` con JOIN al paciente del usuario (índice
+  ``appointment_calendar``), nunca comparando la fecha truncada de la columna.
+* El feed (``/calendar/<token>.ics``) se escribe con ``StreamingHttpResponse``
+  recorriendo las citas con un iterador. Su ETag sale de una consulta
+  agregada (última modificación, cantidad y último borrado), así que un
+  cliente que consulta cada pocos minutos recibe ``304`` sin leer las citas.
+* El token del feed es un valor firmado con ``django.core.signing`` que incluye
+  el hash de sesión del usuario: cambiar la contraseña invalida los enlaces.
+"""
+import calendar
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Appointment, SyncTombstone
+
+FEED_SALT = 'core.agenda.feed'
+FEED_CHUNK_SIZE = 1000
+ICAL_LINE_OCTETS = 75
+WEEKDAY_NAMES = ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')
+MONTH_NAMES = (
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre',
+)
+
+
+def day_start(day):
+    """Aware datetime at 00:00 of `day` in the current time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def appointments_between(user, start, end):
+    """The user's appointments with start <= date_time < end (one range query)"""
+    return (
+        Appointment.objects.filter(patient__user=user, date_time__gte=day_start(start), date_time__lt=day_start(end))
+        .select_related('patient')
+        .only('date_time', 'session_description', 'patient__full_name')
+        .order_by('date_time', 'pk')
+    )
+
+
+def by_day(appointments):
+    """{local date: [appointments]} preserving order"""
+    days = {}
+    for appointment in appointments:
+        days.setdefault(timezone.localtime(appointment.date_time).date(), []).append(appointment)
+    return days
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def week(user, day):
+    """(day, appointments) for the seven days of the week containing `day`"""
+    start = week_start(day)
+    days = by_day(appointments_between(user, start, start + timedelta(days=7)))
+    return [(start + timedelta(days=offset), days.get(start + timedelta(days=offset), [])) for offset in range(7)]
+
+
+def month(user, year, month_number):
+    """Weeks of the month grid; each cell is (day, appointments) or None outside the month"""
+    first = datetime(year, month_number, 1).date()
+    last = first + timedelta(days=calendar.monthrange(year, month_number)[1])
+    days = by_day(appointments_between(user, first, last))
+    return [
+        [(day, days.get(day, [])) if day.month == month_number else None for day in week_days]
+        for week_days in calendar.Calendar().monthdatescalendar(year, month_number)
+    ]
+
+
+# ----------------------------------------------
+# Feed iCal
+# ----------------------------------------------
+
+def feed_token(user):
+    """Signed token identifying the user's feed; changes with the password"""
+    signer = signing.Signer(salt=f'{FEED_SALT}:{user.get_session_auth_hash()}')
+    return signer.sign(str(user.pk))
+
+
+def feed_user(token):
+    """User owning a feed token, or None"""
+    user_id, _, _ = token.partition(signing.Signer().sep)
+    if not user_id.isdigit():
+        return None
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return None
+    try:
+        signing.Signer(salt=f'{FEED_SALT}:{user.get_session_auth_hash()}').unsign(token)
+    except signing.BadSignature:
+        return None
+    return user
+
+
+def feed_start():
+    return day_start(timezone.localdate() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS))
+
+
+def feed_queryset(user):
+    return Appointment.objects.filter(patient__user=user, date_time__gte=feed_start())
+
+
+def feed_validator(user):
+    """(ETag, last modified) of the feed from aggregates only, or (ETag, None) when empty"""
+    stats = feed_queryset(user).aggregate(
+        count=Count('pk'), appointments=Max('updated_at'), patients=Max('patient__updated_at'),
+    )
+    deleted = (
+        SyncTombstone.objects.filter(user=user, resource='appointments')
+        .aggregate(latest=Max('deleted_at'))['latest']
+    )
+    stamps = [value for value in (stats['appointments'], stats['patients'], deleted) if value is not None]
+    last_modified = max(stamps) if stamps else None
+    parts = [
+        str(user.pk), settings.RELEASE_VERSION, feed_start().date().isoformat(), str(stats['count']),
+        last_modified.isoformat() if last_modified else '',
+    ]
+    etag = '"%s"' % hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return etag, last_modified
+
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces (RFC 5545, 3.1)"""
+    encoded = line.encode()
+    if len(encoded) <= ICAL_LINE_OCTETS:
+        return line + '\r\n'
+    pieces = []
+    limit = ICAL_LINE_OCTETS
+    while encoded:
+        cut = min(limit, len(encoded))
+        # No cortar un carácter UTF-8 multibyte
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = ICAL_LINE_OCTETS - 1
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def _stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def feed_lines(user, host, appointment_url):
+    """Generator of the iCal feed; `appointment_url(pk)` gives each event's link"""
+    duration = f'PT{settings.APPOINTMENT_DURATION_MINUTES}M'
+    yield _fold('BEGIN:VCALENDAR')
+    yield _fold('VERSION:2.0')
+    yield _fold('PRODID:-//MakiMotion//Agenda//ES')
+    yield _fold('CALSCALE:GREGORIAN')
+    yield _fold(f'X-WR-CALNAME:{_escape(f"MakiMotion - {user.get_username()}")}')
+    rows = (
+        feed_queryset(user)
+        .order_by('date_time', 'pk')
+        .values_list('pk', 'date_time', 'updated_at', 'session_description', 'patient__full_name')
+        .iterator(chunk_size=FEED_CHUNK_SIZE)
+    )
+    for pk, date_time, updated_at, description, patient_name in rows:
+        yield _fold('BEGIN:VEVENT')
+        yield _fold(f'UID:appointment-{pk}@{host}')
+        yield _fold(f'DTSTAMP:{_stamp(updated_at)}')
+        yield _fold(f'DTSTART:{_stamp(date_time)}')
+        yield _fold(f'DURATION:{duration}')
+        yield _fold(f'SUMMARY:{_escape(patient_name)}')
+        yield _fold(f'DESCRIPTION:{_escape(description)}')
+        yield _fold(f'URL:{appointment_url(pk)}')
+        yield _fold('END:VEVENT')
+    yield _fold('END:VCALENDAR')
@@ -0,0 +1,359 @@
+"""
+Analítica de resultados de la práctica.
+
+Las consultas de la vista de analítica leen solo dos tablas agregadas:
+
+* ``WeeklyPracticeStats``: una fila por (profesional, semana, cohorte) con
+  conteos de citas/pacientes, sumas de PERFECT y conteos de síntomas de las
+  fichas de esa semana.
+* ``PatientOutcome``: una fila por paciente con sus banderas de cohorte, la
+  serie de puntajes PERFECT de las primeras sesiones y los síntomas de su ficha
+  más reciente.
+
+Cuando se escribe una cita, ficha o paciente, ``core.signals`` marca la semana
+y el paciente afectados y se recalculan solo esos buckets al confirmar la
+transacción. El comando ``analytics_rollup`` reconstruye todo de una vez.
+"""
+import threading
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import Appointment, FichaClinica, Patient, PatientOutcome, WeeklyPracticeStats
+
+COHORTS = {
+    'all': Q(),
+    'pregnant': Q(patient__is_pregnant=True),
+    'postpartum': Q(patient__is_postpartum=True),
+    'alta': Q(patient__alta=True),
+}
+# Bandera de Patient que define cada cohorte (salvo 'all')
+COHORT_FLAGS = {
+    'pregnant': 'is_pregnant',
+    'postpartum': 'is_postpartum',
+    'alta': 'alta',
+}
+
+PERFECT_FIELDS = {
+    'p': 'perfect_p_power',
+    'e': 'perfect_e_endurance',
+    'r': 'perfect_r_repetitions',
+    'f': 'perfect_f_fast',
+}
+SYMPTOM_FIELDS = {
+    'pollakiuria': 'Polaquiuria',
+    'nocturia': 'Nocturia',
+    'urgency': 'Urgencia',
+    'iue': 'IUE',
+    'iuu': 'IUU',
+    'ium': 'IUM',
+    'constipation': 'Estreñimiento',
+    'fecal_incontinence': 'Incontinencia fecal',
+    'gas_incontinence': 'Incontinencia gases',
+    'dyspareunia': 'Dispareunia',
+}
+
+# Sesiones guardadas en PatientOutcome.perfect_series (permite "ganancia tras N sesiones")
+MAX_TRACKED_SESSIONS = 24
+
+
+# ----------------------------------------------
+# Semanas
+# ----------------------------------------------
+
+def week_start(value):
+    """Monday of the week containing a date or (aware) datetime, as TruncWeek computes it"""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date()
+    return value - timedelta(days=value.weekday())
+
+
+def _week_bounds(week):
+    start = timezone.make_aware(datetime.combine(week, time.min))
+    return start, start + timedelta(days=7)
+
+
+# ----------------------------------------------
+# Cálculo de buckets semanales
+# ----------------------------------------------
+
+def _appointment_aggregates():
+    aggregates = {}
+    for cohort, condition in COHORTS.items():
+        aggregates[f'{cohort}__appointment_count'] = Count('pk', filter=condition)
+        aggregates[f'{cohort}__patient_count'] = Count('patient', filter=condition, distinct=True)
+        for key, field in PERFECT_FIELDS.items():
+            aggregates[f'{cohort}__perfect_{key}_sum'] = Sum(field, filter=condition)
+            aggregates[f'{cohort}__perfect_{key}_count'] = Count(field, filter=condition)
+    return aggregates
+
+
+def _ficha_aggregates():
+    aggregates = {}
+    for cohort, condition in COHORTS.items():
+        aggregates[f'{cohort}__ficha_count'] = Count('pk', filter=condition)
+        for field in SYMPTOM_FIELDS:
+            aggregates[f'{cohort}__symptom__{field}'] = Count('pk', filter=condition & Q(**{field: True}))
+    return aggregates
+
+
+def _collect(rows, buckets):
+    """Fold grouped aggregate rows into {(user_id, week): {cohort: {column: value}}}"""
+    for row in rows:
+        week = row.pop('week')
+        if isinstance(week, datetime):
+            week = timezone.localtime(week).date() if timezone.is_aware(week) else week.date()
+        cohorts = buckets.setdefault((row.pop('user_id'), week), {})
+        for name, value in row.items():
+            cohort, column = name.split('__', 1)
+            stats = cohorts.setdefault(cohort, {'symptom_counts': {}})
+            if column.startswith('symptom__'):
+                stats['symptom_counts'][column[len('symptom__'):]] = value or 0
+            else:
+                stats[column] = value or 0
+
+
+def compute_weekly_buckets(appointments, fichas):
+    """
+    Aggregate the given querysets by (practitioner, week) in two grouped queries.
+
+    Returns unsaved WeeklyPracticeStats, skipping empty cohorts.
+    """
+    buckets = {}
+    _collect(
+        appointments
+        .annotate(week=TruncWeek('date_time'), user_id=F('patient__user'))
+        .values('user_id', 'week')
+        .annotate(**_appointment_aggregates())
+        .order_by(),
+        buckets,
+    )
+    _collect(
+        fichas
+        .annotate(week=TruncWeek('fecha'), user_id=F('patient__user'))
+        .values('user_id', 'week')
+        .annotate(**_ficha_aggregates())
+        .order_by(),
+        buckets,
+    )
+
+    stats = []
+    for (user_id, week), cohorts in buckets.items():
+        for cohort, values in cohorts.items():
+            if not values.get('appointment_count') and not values.get('ficha_count'):
+                continue
+            stats.append(WeeklyPracticeStats(user_id=user_id, week=week, cohort=cohort, **values))
+    return stats
+
+
+def refresh_week(user_id, week):
+    """Recompute the buckets of one practitioner-week from the raw rows of that week only"""
+    start, end = _week_bounds(week)
+    stats = compute_weekly_buckets(
+        Appointment.objects.filter(patient__user_id=user_id, date_time__gte=start, date_time__lt=end),
+        FichaClinica.objects.filter(patient__user_id=user_id, fecha__gte=week, fecha__lt=week + timedelta(days=7)),
+    )
+    with transaction.atomic():
+        WeeklyPracticeStats.objects.filter(user_id=user_id, week=week).delete()
+        WeeklyPracticeStats.objects.bulk_create(stats)
+
+
+# ----------------------------------------------
+# Resultados por paciente
+# ----------------------------------------------
+
+def build_outcome(patient, sessions, latest_ficha):
+    """Build an unsaved PatientOutcome from ordered session rows and the latest ficha row"""
+    series = {key: [] for key in PERFECT_FIELDS}
+    count = 0
+    first = last = None
+    for session in sessions:
+        count += 1
+        first = first or session['date_time']
+        last = session['date_time']
+        if count <= MAX_TRACKED_SESSIONS:
+            for key, field in PERFECT_FIELDS.items():
+                series[key].append(session[field])
+
+    return PatientOutcome(
+        patient_id=patient['pk'],
+        user_id=patient['user_id'],
+        is_pregnant=patient['is_pregnant'],
+        is_postpartum=patient['is_postpartum'],
+        alta=patient['alta'],
+        session_count=count,
+        first_session=first,
+        last_session=last,
+        perfect_series=series,
+        latest_symptoms={field: bool(latest_ficha[field]) for field in SYMPTOM_FIELDS} if latest_ficha else {},
+    )
+
+
+def refresh_patient(patient_id):
+    """Recompute the PatientOutcome row of one patient"""
+    patient = (
+        Patient.objects.filter(pk=patient_id)
+        .values('pk', 'user_id', *COHORT_FLAGS.values())
+        .first()
+    )
+    if patient is None:
+        return
+    sessions = (
+        Appointment.objects.filter(patient_id=patient_id)
+        .order_by('date_time', 'pk')
+        .values('date_time', *PERFECT_FIELDS.values())
+    )
+    latest_ficha = (
+        FichaClinica.objects.filter(patient_id=patient_id)
+        .order_by('-fecha', '-created_at')
+        .values(*SYMPTOM_FIELDS)
+        .first()
+    )
+    outcome = build_outcome(patient, sessions, latest_ficha)
+    outcome.save()
+
+
+def refresh_patient_weeks(patient_id, user_id):
+    """Recompute every week the patient has activity in (used when its cohort changes)"""
+    weeks = {week_start(d) for d in Appointment.objects.filter(patient_id=patient_id).values_list('date_time', flat=True)}
+    weeks |= {week_start(d) for d in FichaClinica.objects.filter(patient_id=patient_id).values_list('fecha', flat=True)}
+    for week in sorted(weeks):
+        refresh_week(user_id, week)
+
+
+# ----------------------------------------------
+# Actualización al escribir (deduplicada por transacción)
+# ----------------------------------------------
+
+# Si la transacción se revierte, sus buckets quedan aquí y se recalculan (sin efecto) en el
+# próximo _flush: recalcular un bucket desde la BD es idempotente
+_pending = threading.local()
+
+
+def _state():
+    if not hasattr(_pending, 'weeks'):
+        _reset()
+    return _pending
+
+
+def _reset():
+    _pending.weeks = set()
+    _pending.patients = set()
+    _pending.patient_weeks = set()
+    _pending.owners = {}
+
+
+def _flush():
+    state = _state()
+    weeks, patients, patient_weeks = state.weeks, state.patients, state.patient_weeks
+    _reset()
+    for patient_id, user_id in sorted(patient_weeks):
+        refresh_patient_weeks(patient_id, user_id)
+    for user_id, week in sorted(weeks):
+        refresh_week(user_id, week)
+    for patient_id in sorted(patients):
+        refresh_patient(patient_id)
+
+
+def _flush_registered():
+    """Whether _flush is already queued for the current transaction (not for a rolled-back one)"""
+    connection = transaction.get_connection()
+    # Al revertir un savepoint o la transacción, Django descarta sus callbacks de run_on_commit
+    return connection.in_atomic_block and any(entry[1] is _flush for entry in connection.run_on_commit)
+
+
+def remember_owner(patient_id, user_id):
+    """Record a patient's practitioner before a cascade delete removes the row"""
+    _state().owners[patient_id] = user_id
+
+
+def owner_of(instance):
+    """Practitioner of an Appointment/FichaClinica, without a query during cascades"""
+    owners = _state().owners
+    if instance.patient_id in owners:
+        return owners[instance.patient_id]
+    return instance.patient.user_id
+
+
+def schedule(user_id=None, week=None, patient_id=None, cohort_changed=False):
+    """Queue buckets for recomputation once the current transaction commits"""
+    if not settings.ANALYTICS_UPDATE_ON_WRITE:
+        return
+    state = _state()
+    if user_id is not None and week is not None:
+        state.weeks.add((user_id, week))
+    if patient_id is not None:
+        state.patients.add(patient_id)
+        if cohort_changed:
+            state.patient_weeks.add((patient_id, user_id))
+    if not _flush_registered():
+        transaction.on_commit(_flush)
+
+
+# ----------------------------------------------
+# Lectura para la vista de analítica
+# ----------------------------------------------
+
+def weekly_summary(user, weeks=12):
+    """Per cohort, the last `weeks` weekly buckets with averages ready to display"""
+    since = week_start(timezone.localdate()) - timedelta(weeks=weeks - 1)
+    rows = WeeklyPracticeStats.objects.filter(user=user, week__gte=since).order_by('week')
+
+    summary = {cohort: [] for cohort in COHORTS}
+    for row in rows:
+        entry = {
+            'week': row.week,
+            'appointments': row.appointment_count,
+            'patients': row.patient_count,
+            'fichas': row.ficha_count,
+        }
+        for key in PERFECT_FIELDS:
+            total, count = getattr(row, f'perfect_{key}_sum'), getattr(row, f'perfect_{key}_count')
+            entry[f'avg_{key}'] = round(total / count, 2) if count else None
+        summary[row.cohort].append(entry)
+    return summary
+
+
+def _in_cohort(outcome, cohort):
+    return cohort == 'all' or getattr(outcome, COHORT_FLAGS[cohort])
+
+
+def outcome_summary(user, sessions=8):
+    """Per cohort: patient count, average PERFECT gain after `sessions` sessions and symptom prevalence"""
+    sessions = max(2, min(sessions, MAX_TRACKED_SESSIONS))
+    outcomes = list(PatientOutcome.objects.filter(user=user))
+
+    summary = {}
+    for cohort in COHORTS:
+        members = [o for o in outcomes if _in_cohort(o, cohort)]
+        gains = {key: [] for key in PERFECT_FIELDS}
+        for outcome in members:
+            for key in PERFECT_FIELDS:
+                values = outcome.perfect_series.get(key, [])
+                if len(values) >= sessions and values[0] is not None and values[sessions - 1] is not None:
+                    gains[key].append(values[sessions - 1] - values[0])
+
+        with_ficha = [o for o in members if o.latest_symptoms]
+        prevalence = [
+            {
+                'field': field,
+                'label': label,
+                'pct': round(100 * sum(o.latest_symptoms.get(field, False) for o in with_ficha) / len(with_ficha), 1),
+            }
+            for field, label in SYMPTOM_FIELDS.items()
+        ] if with_ficha else []
+
+        summary[cohort] = {
+            'patients': len(members),
+            'patients_with_ficha': len(with_ficha),
+            'gain': {
+                key: {'avg': round(sum(values) / len(values), 2), 'n': len(values)} if values else None
+                for key, values in gains.items()
+            },
+            'prevalence': prevalence,
+        }
+    return summary
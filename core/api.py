@@ -0,0 +1,160 @@
+"""
+API JSON versionada (``/api/v1/``) para pacientes, citas y fichas clínicas.
+
+* Mismo control de propiedad que las vistas HTML (``loaders.OWNER_PATHS``).
+* ``?fields=fecha,nocturia,urgency`` proyecta solo esas columnas en el SQL.
+* Las listas usan paginación por cursor (pk ascendente, cursor firmado) y se
+  serializan desde ``values()``, sin instanciar modelos.
+* Autenticación por la sesión de Django; sin sesión se responde 401 en JSON.
+"""
+from functools import wraps
+
+from django.core import signing
+from django.http import JsonResponse
+
+from .loaders import OWNER_PATHS
+from .models import Appointment, FichaClinica, Patient
+
+API_VERSION = 'v1'
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+CURSOR_SALT = 'core.api.cursor'
+
+
+class Resource:
+    """Exposed model, its selectable fields and the defaults used by list endpoints"""
+
+    def __init__(self, model, list_fields, parent_filter=None, hidden=()):
+        self.model = model
+        self.owner_path = OWNER_PATHS[model]
+        self.parent_filter = parent_filter
+        hidden = {'user', *hidden}
+        self.fields = ['id'] + [
+            f.attname for f in model._meta.concrete_fields if f.name not in hidden and f.attname != 'id'
+        ]
+        self.list_fields = ['id', *list_fields]
+
+    def queryset(self, user):
+        return self.model.objects.filter(**{self.owner_path: user.pk}).order_by()
+
+
+RESOURCES = {
+    'patients': Resource(
+        Patient,
+        list_fields=['full_name', 'birth_date', 'alta', 'is_pregnant', 'is_postpartum', 'updated_at'],
+    ),
+    'appointments': Resource(
+        Appointment,
+        list_fields=['patient_id', 'date_time', 'session_description', 'updated_at'],
+        parent_filter='patient_id',
+    ),
+    'fichas': Resource(
+        FichaClinica,
+        list_fields=['patient_id', 'fecha', 'consultation_reason', 'updated_at'],
+        parent_filter='patient_id',
+    ),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def error_response(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(view_func):
+    """JSON 401 for anonymous users; ApiError -> JSON error response"""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response('Authentication required', 401)
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as exc:
+            return error_response(str(exc), exc.status)
+    return _wrapped
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise ApiError(f'Unknown resource: {name}', 404)
+
+
+def selected_fields(request, resource, default):
+    """Validated ?fields= list (id always included), or `default`"""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default)
+    requested = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in resource.fields]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [name for name in requested if name != 'id']
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def encode_cursor(value):
+    return signing.dumps(value, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    try:
+        return signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise ApiError('Invalid cursor')
+
+
+def _next_url(request, cursor):
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+@api_view
+def resource_list(request, resource_name):
+    """Cursor-paginated list of the user's rows, projected to the requested fields"""
+    resource = get_resource(resource_name)
+    fields = selected_fields(request, resource, resource.list_fields)
+    limit = parse_limit(request)
+
+    queryset = resource.queryset(request.user)
+    if resource.parent_filter and request.GET.get('patient'):
+        try:
+            queryset = queryset.filter(**{resource.parent_filter: int(request.GET['patient'])})
+        except ValueError:
+            raise ApiError('patient must be an integer')
+    if request.GET.get('cursor'):
+        queryset = queryset.filter(pk__gt=decode_cursor(request.GET['cursor']))
+
+    rows = list(queryset.order_by('pk').values(*fields)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]['id']) if len(rows) > limit else None
+    return JsonResponse({
+        'version': API_VERSION,
+        'results': rows[:limit],
+        'next_cursor': next_cursor,
+        'next': _next_url(request, next_cursor) if next_cursor else None,
+    })
+
+
+@api_view
+def resource_detail(request, resource_name, pk):
+    """One row of the user's, all fields unless ?fields= narrows them"""
+    resource = get_resource(resource_name)
+    fields = selected_fields(request, resource, resource.fields)
+    row = resource.queryset(request.user).filter(pk=pk).values(*fields).first()
+    if row is None:
+        raise ApiError('Not found', 404)
+    return JsonResponse({'version': API_VERSION, 'result': row})
@@ -0,0 +1,223 @@
+"""
+Paso de build de los estáticos (comando ``build_assets``, antes de collectstatic).
+
+* Purga de CSS: se eliminan de ``static/css/style.css`` las reglas cuyos
+  selectores usan clases o ids que no aparecen en ninguna plantilla ni en el
+  código de ``core`` (p. ej. clases de widgets en ``forms.py``).
+* CSS crítico: las reglas que solo usan clases de ``base.html`` (cabecera,
+  navegación, contenedores, botones) se incrustan en ``<head>``; la hoja
+  completa purgada se carga sin bloquear el render.
+* Logo: variantes WebP/PNG al tamaño en que se muestra (1x y 2x), un
+  ``favicon.ico`` real y un ``apple-touch-icon``. Requiere Pillow; sin Pillow se
+  siguen usando el JPG original.
+
+Todo se escribe en ``ASSET_BUILD_DIR``, que se publica bajo ``static/build/`` y
+se versiona con hash por ``CompressedManifestStaticFilesStorage``.
+"""
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional
+    Image = None
+
+SOURCE_CSS = 'css/style.css'
+SOURCE_LOGO = 'makimotion_logo.JPG'
+MANIFEST_NAME = 'assets.json'
+# Altura (px) en que se muestra cada logo: cabecera y login
+LOGO_HEIGHTS = (50, 80)
+FAVICON_SIZES = (16, 32, 48)
+APPLE_TOUCH_SIZE = 180
+
+_comment = re.compile(r'/\*.*?\*/', re.DOTALL)
+_token = re.compile(r'[A-Za-z_][\w-]*')
+# "alert-{{ message.tags }}": clases construidas en la plantilla -> prefijo
+_dynamic_prefix = re.compile(r'([A-Za-z_][\w-]*-)\{[{%]')
+_selector_name = re.compile(r'[.#](-?[A-Za-z_][\w-]*)')
+_not_pseudo = re.compile(r':not\([^)]*\)')
+_attribute = re.compile(r'\[[^\]]*\]')
+
+
+# ----------------------------------------------
+# Uso de clases en plantillas y código
+# ----------------------------------------------
+
+class UsedNames:
+    """Class/id names found in source files, plus prefixes of template-built names"""
+
+    def __init__(self, texts):
+        self.tokens = set()
+        self.prefixes = set()
+        for text in texts:
+            self.tokens.update(_token.findall(text))
+            self.prefixes.update(_dynamic_prefix.findall(text))
+
+    def __contains__(self, name):
+        return name in self.tokens or any(name.startswith(prefix) for prefix in self.prefixes)
+
+
+def _read_all(paths):
+    return [path.read_text(encoding='utf-8') for path in paths]
+
+
+def source_files():
+    """Templates and core Python modules that may reference CSS classes"""
+    templates = sorted(Path(settings.BASE_DIR, 'templates').rglob('*.html'))
+    code = sorted(p for p in Path(settings.BASE_DIR, 'core').rglob('*.py') if 'migrations' not in p.parts)
+    return templates + code
+
+
+# ----------------------------------------------
+# CSS
+# ----------------------------------------------
+
+def parse_css(css):
+    """Split a stylesheet into top-level (prelude, body) blocks; bodies of @media are parsed recursively"""
+    css = _comment.sub('', css)
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = ''
+    for index, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                prelude = css[start:index].strip()
+                start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                body = css[start:index]
+                if prelude.startswith('@media') or prelude.startswith('@supports'):
+                    body = parse_css(body)
+                blocks.append((prelude, body))
+                start = index + 1
+    return blocks
+
+
+def _selector_names(selector):
+    selector = _attribute.sub('', _not_pseudo.sub('', selector))
+    return _selector_name.findall(selector)
+
+
+def filter_blocks(blocks, used):
+    """Keep the selectors whose classes/ids are all in `used`; drop rules left without selectors"""
+    kept = []
+    for prelude, body in blocks:
+        if isinstance(body, list):
+            inner = filter_blocks(body, used)
+            if inner:
+                kept.append((prelude, inner))
+        elif prelude.startswith('@'):
+            # @keyframes, @font-face, @import...: se conservan tal cual
+            kept.append((prelude, body))
+        else:
+            selectors = [s.strip() for s in prelude.split(',')]
+            selectors = [s for s in selectors if all(name in used for name in _selector_names(s))]
+            if selectors:
+                kept.append((', '.join(selectors), body))
+    return kept
+
+
+def serialize_css(blocks):
+    """Compact serialization of parsed blocks"""
+    out = []
+    for prelude, body in blocks:
+        if isinstance(body, list):
+            out.append(f'{prelude}{{{serialize_css(body)}}}')
+        else:
+            out.append(f"{prelude}{{{' '.join(body.split())}}}")
+    return ''.join(out)
+
+
+# ----------------------------------------------
+# Imágenes
+# ----------------------------------------------
+
+def build_images(source, out_dir):
+    """Logo variants and favicons; returns their manifest entries (empty without Pillow)"""
+    if Image is None:
+        return {}
+    logo = Image.open(source).convert('RGB')
+    entries = {'logo': {}}
+    for height in LOGO_HEIGHTS:
+        variants = {}
+        for density in (1, 2):
+            size = height * density
+            resized = logo.resize((round(logo.width * size / logo.height), size), Image.LANCZOS)
+            for fmt, extension, options in (
+                ('WEBP', 'webp', {'quality': 85, 'method': 6}),
+                ('PNG', 'png', {'optimize': True}),
+            ):
+                name = f'logo-{size}.{extension}'
+                resized.save(out_dir / name, fmt, **options)
+                variants[f'{extension}_{density}x'] = name
+        variants['width'] = round(logo.width * height / logo.height)
+        entries['logo'][str(height)] = variants
+
+    logo.save(out_dir / 'favicon.ico', 'ICO', sizes=[(s, s) for s in FAVICON_SIZES])
+    logo.resize((APPLE_TOUCH_SIZE, APPLE_TOUCH_SIZE), Image.LANCZOS).save(
+        out_dir / 'apple-touch-icon.png', 'PNG', optimize=True
+    )
+    entries['favicon'] = 'favicon.ico'
+    entries['apple_touch_icon'] = 'apple-touch-icon.png'
+    return entries
+
+
+# ----------------------------------------------
+# Build y lectura del manifiesto
+# ----------------------------------------------
+
+def build(out_dir=None):
+    """Write the purged/critical CSS and image variants; returns the manifest"""
+    out_dir = Path(out_dir or settings.ASSET_BUILD_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    static_dir = Path(settings.BASE_DIR, 'static')
+
+    css = (static_dir / SOURCE_CSS).read_text(encoding='utf-8')
+    blocks = parse_css(css)
+    purged = filter_blocks(blocks, UsedNames(_read_all(source_files())))
+    shell = Path(settings.BASE_DIR, 'templates', 'base.html').read_text(encoding='utf-8')
+    critical = filter_blocks(purged, UsedNames([shell]))
+
+    (out_dir / 'style.css').write_text(serialize_css(purged), encoding='utf-8')
+    (out_dir / 'critical.css').write_text(serialize_css(critical), encoding='utf-8')
+
+    manifest = {
+        'css': 'style.css',
+        'critical_css': 'critical.css',
+        'sizes': {
+            'source_css': len(css.encode()),
+            'css': (out_dir / 'style.css').stat().st_size,
+            'critical_css': (out_dir / 'critical.css').stat().st_size,
+        },
+    }
+    manifest.update(build_images(static_dir / SOURCE_LOGO, out_dir))
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    load_manifest.cache_clear()
+    critical_css.cache_clear()
+    return manifest
+
+
+@lru_cache(maxsize=1)
+def load_manifest():
+    """Manifest of the last build, or None when the build is disabled or missing"""
+    if not settings.ASSET_BUILD_ENABLED:
+        return None
+    path = Path(settings.ASSET_BUILD_DIR, MANIFEST_NAME)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+@lru_cache(maxsize=1)
+def critical_css():
+    manifest = load_manifest()
+    if manifest is None:
+        return ''
+    return Path(settings.ASSET_BUILD_DIR, manifest['critical_css']).read_text(encoding='utf-8')
@@ -0,0 +1,36 @@
+"""
+Backfills registrados para el comando ``run_backfill`` (ver core.data_migrations).
+"""
+from .data_migrations import ChunkedBackfill, register
+from .volumes import parse_volume_ml
+
+# Copia fija del mapeo de Appointment: los modelos históricos no tienen sus atributos de clase
+BALLOON_VOLUME_FIELDS = {
+    'balloon_rectal_sensation': 'balloon_rectal_sensation_ml',
+    'balloon_first_desire_volume': 'balloon_first_desire_volume_ml',
+    'balloon_normal_desire_volume': 'balloon_normal_desire_volume_ml',
+    'balloon_max_tolerable_capacity': 'balloon_max_tolerable_capacity_ml',
+}
+
+
+@register
+class BalloonVolumeBackfill(ChunkedBackfill):
+    """Fill the numeric balloon-test columns (ml) from their free-text fields"""
+
+    name = 'balloon_volumes'
+    model_label = 'core.Appointment'
+
+    def process(self, chunk):
+        text_fields = list(BALLOON_VOLUME_FIELDS)
+        numeric_fields = list(BALLOON_VOLUME_FIELDS.values())
+
+        changed = []
+        for row in chunk.order_by().values_list('pk', *text_fields, *numeric_fields):
+            texts, current = row[1:1 + len(text_fields)], row[1 + len(text_fields):]
+            parsed = [parse_volume_ml(text) for text in texts]
+            if parsed != list(current):
+                changed.append(self.model(pk=row[0], **dict(zip(numeric_fields, parsed))))
+
+        # bulk_update no pasa por save(), así que no reescribe updated_at
+        self.model._default_manager.bulk_update(changed, numeric_fields)
+        return len(changed)
@@ -0,0 +1,173 @@
+"""
+Compresión de respuestas y minificado opcional de HTML.
+
+WhiteNoise solo comprime los estáticos; las páginas (detalle de paciente,
+formulario de ficha, dashboard) salían sin comprimir. ``CompressionMiddleware``
+usa Brotli (paquete ``brotli`` de requirements.txt) si el navegador lo acepta, o
+gzip en caso contrario, también para respuestas en streaming.
+
+BREACH: las páginas que incluyen un token CSRF (los tokens ya van enmascarados
+por request) se comprimen siempre con gzip y la mitigación "Heal the Breach"
+de Django (bytes aleatorios en la cabecera gzip, que varían el largo de la
+respuesta). Brotli solo se usa en páginas sin token. ``CsrfViewMiddleware``
+limpia su marca de "token usado" al responder, así que
+``CsrfTokenUsageMiddleware`` (ubicado dentro de él) la copia antes.
+
+Con ``HTML_MINIFY = True`` se colapsan los espacios en blanco entre etiquetas
+(``>   <``) antes de comprimir, salvo dentro de ``<pre>``, ``<textarea>``,
+``<script>`` y ``<style>``. El texto y los valores de atributos no se tocan: un
+``<input value="a  b">`` debe volver igual al guardar el formulario.
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # en requirements.txt; sin él (entorno local) se usa gzip
+    brotli = None
+
+MIN_LENGTH = 200
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+# Bytes aleatorios máximos en la cabecera gzip (mitigación BREACH de Django)
+GZIP_RANDOM_BYTES = 100
+# request.META: la respuesta incluye un token CSRF (lo fija CsrfTokenUsageMiddleware)
+CSRF_TOKEN_USED = 'core.compression.csrf_token_used'
+
+_accepts = _lazy_re_compile(r'\b(br|gzip)\b(?:\s*;\s*q=(0(?:\.\d*)?|1(?:\.0*)?))?', re.IGNORECASE)
+_protected = _lazy_re_compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL
+)
+# Entre dos etiquetas; el inicio/fin de un trozo linda con un bloque protegido (también una etiqueta)
+_between_tags = _lazy_re_compile(r'(?:(?<=>)|^)\s{2,}(?=<|$)')
+
+
+def accepted_encodings(request):
+    """Encodings among br/gzip the client accepts (q > 0)"""
+    accepted = set()
+    for encoding, quality in _accepts.findall(request.headers.get('Accept-Encoding', '')):
+        if quality == '' or float(quality) > 0:
+            accepted.add(encoding.lower())
+    return accepted
+
+
+def minify_html(html):
+    """Collapse whitespace runs between tags outside pre/textarea/script/style blocks"""
+    parts = _protected.split(html)
+    # split() con dos grupos devuelve [texto, bloque, nombre de etiqueta, texto, ...]
+    out = []
+    for index, part in enumerate(parts):
+        kind = index % 3
+        if kind == 0:
+            out.append(_between_tags.sub(lambda m: '\n' if '\n' in m.group() else ' ', part))
+        elif kind == 1:
+            out.append(part)
+    return ''.join(out)
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(mode=brotli.MODE_TEXT)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _weaken_etag(response):
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response.headers['ETag'] = 'W/' + etag
+
+
+def uses_csrf_token(request):
+    """Whether the response embeds a CSRF token (get_token() was called)"""
+    return bool(request.META.get(CSRF_TOKEN_USED) or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'))
+
+
+class CsrfTokenUsageMiddleware:
+    """
+    Record that get_token() was used before CsrfViewMiddleware.process_response
+    resets CSRF_COOKIE_NEEDS_UPDATE. Must be listed after CsrfViewMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            request.META[CSRF_TOKEN_USED] = True
+        return response
+
+
+class CompressionMiddleware:
+    """Minify (optionally) and compress text responses, Brotli when allowed"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 304:
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        if settings.HTML_MINIFY and not response.streaming and content_type.startswith('text/html'):
+            response.content = minify_html(response.content.decode(response.charset)).encode(response.charset)
+            response.headers['Content-Length'] = str(len(response.content))
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not response.streaming and len(response.content) < MIN_LENGTH:
+            return response
+
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Las respuestas async no se comprimen (no hay vistas async en core)
+                return response
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=GZIP_RANDOM_BYTES
+                )
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, mode=brotli.MODE_TEXT)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=GZIP_RANDOM_BYTES)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(response.content))
+
+        _weaken_etag(response)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request)
+        if brotli is not None and 'br' in accepted and not uses_csrf_token(request):
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
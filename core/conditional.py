@@ -0,0 +1,115 @@
+"""
+GET condicional (ETag / Last-Modified) para las páginas de detalle.
+
+Cada página tiene un validador barato: el ``updated_at`` más reciente entre el
+paciente y los registros que muestra, obtenido con una sola consulta agregada.
+Si el navegador ya tiene esa versión se responde ``304 Not Modified`` sin
+cargar los modelos ni renderizar la plantilla.
+
+El ETag incluye además el usuario, el secreto CSRF (la página lleva formularios
+con token) y ``RELEASE_VERSION`` (cambios de plantillas en un deploy). Las
+páginas con mensajes pendientes nunca responden 304 para no perderlos.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import Appointment, FichaClinica, Patient
+
+
+def _max_updated(model):
+    """Subquery: latest updated_at among the patient's rows of `model`"""
+    return Subquery(
+        model.objects.filter(patient=OuterRef('pk'))
+        .order_by()
+        .values('patient')
+        .annotate(latest=Max('updated_at'))
+        .values('latest')
+    )
+
+
+def patient_last_modified(request, pk):
+    """Latest change across the patient, its appointments and its fichas"""
+    return latest_patient_change(request.user.pk, pk)
+
+
+def latest_patient_change(user_id, pk):
+    """patient_last_modified without a request (None if not the user's patient)"""
+    return (
+        Patient.objects.filter(pk=pk, user_id=user_id)
+        .annotate(
+            last_modified=Greatest(
+                'updated_at',
+                Coalesce(_max_updated(Appointment), 'updated_at'),
+                Coalesce(_max_updated(FichaClinica), 'updated_at'),
+            )
+        )
+        .values_list('last_modified', flat=True)
+        .first()
+    )
+
+
+def appointment_last_modified(request, pk):
+    return (
+        Appointment.objects.filter(pk=pk, patient__user_id=request.user.pk)
+        .annotate(last_modified=Greatest('updated_at', 'patient__updated_at'))
+        .values_list('last_modified', flat=True)
+        .first()
+    )
+
+
+def ficha_last_modified(request, patient_pk, pk):
+    return (
+        FichaClinica.objects.filter(pk=pk, patient_id=patient_pk, patient__user_id=request.user.pk)
+        .annotate(last_modified=Greatest('updated_at', 'patient__updated_at'))
+        .values_list('last_modified', flat=True)
+        .first()
+    )
+
+
+def _etag(request, last_modified):
+    parts = [
+        str(request.user.pk),
+        request.META.get('CSRF_COOKIE', ''),
+        settings.RELEASE_VERSION,
+        last_modified.isoformat(),
+    ]
+    return '"%s"' % hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def conditional_page(last_modified_func):
+    """
+    Answer 304 when the validator matches; otherwise render and attach
+    ETag, Last-Modified and a private, revalidate-always Cache-Control.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            last_modified = last_modified_func(request, *args, **kwargs)
+            if last_modified is None:
+                # No existe o no es del usuario: la vista responde 404
+                return view_func(request, *args, **kwargs)
+
+            etag = _etag(request, last_modified)
+            timestamp = int(last_modified.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return _wrapped
+    return decorator
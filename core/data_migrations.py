@@ -0,0 +1,160 @@
+"""
+Backfills de datos por lotes, reanudables.
+
+Una migración de datos sobre ``Patient``/``FichaClinica``/``Appointment`` hecha
+en un solo ``RunPython`` bloquea la tabla durante toda la ejecución. Un
+``ChunkedBackfill`` recorre la tabla por rangos de pk, confirma cada lote en su
+propia transacción junto con su checkpoint (``BackfillCheckpoint``), puede
+limitarse a un número de filas por segundo e informa el avance y el tiempo
+restante estimado. Si se interrumpe, la siguiente ejecución continúa desde el
+último lote confirmado.
+
+Uso desde el comando ``run_backfill``::
+
+    @register
+    class FillSomething(ChunkedBackfill):
+        name = 'fill_something'
+        model_label = 'core.FichaClinica'
+
+        def process(self, chunk):
+            return chunk.filter(something='').update(something='x')
+
+Uso desde una migración (debe declarar ``atomic = False`` para que cada lote
+se confirme por separado)::
+
+    class Migration(migrations.Migration):
+        atomic = False
+        operations = [backfill_operation(FillSomething)]
+"""
+import logging
+import time
+
+from django.apps import apps as global_apps
+from django.db import migrations, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def register(backfill_class):
+    """Make a backfill available to the run_backfill command"""
+    REGISTRY[backfill_class.name] = backfill_class
+    return backfill_class
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{hours}h{minutes:02d}m{seconds:02d}s' if hours else f'{minutes}m{seconds:02d}s'
+
+
+class ChunkedBackfill:
+    """Base class: subclasses set name/model_label and implement process()"""
+
+    name = None
+    model_label = None
+    chunk_size = 1000
+    rows_per_second = None
+
+    def __init__(self, apps=None, chunk_size=None, rows_per_second=None, report=None):
+        # En una migración se reciben los modelos históricos en `apps`
+        self.apps = apps or global_apps
+        self.chunk_size = chunk_size or self.chunk_size
+        self.rows_per_second = rows_per_second if rows_per_second is not None else self.rows_per_second
+        self.report = report or logger.info
+
+    @property
+    def model(self):
+        return self.apps.get_model(self.model_label)
+
+    def get_queryset(self):
+        """Rows the backfill walks over; override to narrow it"""
+        return self.model._default_manager.all()
+
+    def process(self, chunk):
+        """Handle the rows of one pk range (a queryset); return how many rows changed"""
+        raise NotImplementedError
+
+    def _checkpoint(self, reset):
+        Checkpoint = self.apps.get_model('core', 'BackfillCheckpoint')
+        checkpoint, created = Checkpoint.objects.get_or_create(name=self.name)
+        if reset and not created:
+            checkpoint.delete()
+            checkpoint = Checkpoint.objects.create(name=self.name)
+        return checkpoint
+
+    def _next_upper_bound(self, queryset, last_pk):
+        remaining = queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)
+        upper = list(remaining[self.chunk_size - 1:self.chunk_size])
+        if upper:
+            return upper[0]
+        return remaining.aggregate(max_pk=Max('pk'))['max_pk']
+
+    def _throttle(self, rows, elapsed):
+        if not self.rows_per_second:
+            return
+        target = rows / self.rows_per_second
+        if target > elapsed:
+            time.sleep(target - elapsed)
+
+    def run(self, reset=False):
+        """Process every remaining chunk; returns the checkpoint"""
+        checkpoint = self._checkpoint(reset)
+        if checkpoint.status == 'completed':
+            self.report(f'{self.name}: already completed (use --reset to run again)')
+            return checkpoint
+
+        queryset = self.get_queryset()
+        checkpoint.rows_total = checkpoint.rows_processed + queryset.filter(pk__gt=checkpoint.last_pk).count()
+        checkpoint.save(update_fields=['rows_total', 'updated_at'])
+
+        start = time.monotonic()
+        processed_this_run = 0
+        while True:
+            upper = self._next_upper_bound(queryset, checkpoint.last_pk)
+            if upper is None:
+                break
+
+            chunk = queryset.filter(pk__gt=checkpoint.last_pk, pk__lte=upper)
+            with transaction.atomic():
+                rows = chunk.count()
+                changed = self.process(chunk) or 0
+                checkpoint.last_pk = upper
+                checkpoint.rows_processed += rows
+                checkpoint.rows_changed += changed
+                checkpoint.save(update_fields=['last_pk', 'rows_processed', 'rows_changed', 'updated_at'])
+
+            processed_this_run += rows
+            self._throttle(processed_this_run, time.monotonic() - start)
+            self.report(self._progress(checkpoint, processed_this_run, time.monotonic() - start))
+
+        checkpoint.status = 'completed'
+        checkpoint.completed_at = timezone.now()
+        checkpoint.save(update_fields=['status', 'completed_at', 'updated_at'])
+        self.report(
+            f'{self.name}: completed, {checkpoint.rows_processed} rows processed, '
+            f'{checkpoint.rows_changed} changed'
+        )
+        return checkpoint
+
+    def _progress(self, checkpoint, processed_this_run, elapsed):
+        total = max(checkpoint.rows_total, checkpoint.rows_processed)
+        percent = 100 * checkpoint.rows_processed / total if total else 100
+        rate = processed_this_run / elapsed if elapsed > 0 else 0
+        eta = format_duration((total - checkpoint.rows_processed) / rate) if rate else '?'
+        return (
+            f'{self.name}: {checkpoint.rows_processed}/{total} ({percent:.1f}%), '
+            f'{checkpoint.rows_changed} changed, pk <= {checkpoint.last_pk}, '
+            f'{rate:.0f} rows/s, ETA {eta}'
+        )
+
+
+def backfill_operation(backfill_class, **kwargs):
+    """RunPython operation running a backfill with the migration's historical models"""
+    def forwards(apps, schema_editor):
+        backfill_class(apps=apps, **kwargs).run()
+    return migrations.RunPython(forwards, migrations.RunPython.noop)
@@ -0,0 +1,169 @@
+"""
+Dossier imprimible del paciente: antecedentes, todas sus fichas clínicas y
+todas sus citas con PERFECT y test del balón.
+
+* Se genera en segundo plano (tarea ``render_dossier``) escribiendo sección por
+  sección a un archivo: fichas y citas se recorren con iteradores, así que la
+  memoria no depende de cuántas tenga el paciente.
+* El archivo se guarda con una versión derivada del ``updated_at`` más reciente
+  del paciente y sus registros (``conditional.latest_patient_change``) y de
+  ``RELEASE_VERSION``. Mientras nada cambie, las descargas se sirven desde ese
+  archivo con ETag/Last-Modified (304 si el navegador ya lo tiene).
+* Lo genera el worker y lo sirve la web, que no comparten disco: el archivo
+  terminado se guarda en el storage compartido de ``core.files``. El disco
+  local del worker solo se usa para los temporales de una generación.
+* PDF solo si WeasyPrint está instalado (``pip install weasyprint``).
+"""
+import hashlib
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.template.loader import get_template
+from django.utils import timezone
+
+from . import ficha_diff
+from .files import delete_tree, job_storage
+from .forms import PatientForm
+from .models import Appointment, FichaClinica, Patient
+
+try:
+    from weasyprint import HTML as WeasyHTML
+except ImportError:  # WeasyPrint es opcional
+    WeasyHTML = None
+
+CHUNK_SIZE = 200
+CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+def formats():
+    """Formats this installation can produce"""
+    return ('html', 'pdf') if WeasyHTML is not None else ('html',)
+
+
+def version(last_modified):
+    """Cache version of a dossier for the patient's latest change"""
+    key = f'{settings.RELEASE_VERSION}|{last_modified.isoformat()}'
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def directory(patient_id):
+    return f'dossiers/{patient_id}'
+
+
+def file_name(patient_id, dossier_version, fmt):
+    """Name of the dossier in the shared storage"""
+    return f'{directory(patient_id)}/{dossier_version}.{fmt}'
+
+
+def discard(patient_id):
+    """Delete every cached dossier of a patient"""
+    delete_tree(job_storage(), directory(patient_id))
+
+
+# ----------------------------------------------
+# Secciones
+# ----------------------------------------------
+
+def _display(field, value):
+    if value in (None, '', False):
+        return None
+    if value is True:
+        return 'Sí'
+    if field.choices:
+        return dict(field.flatchoices).get(value, value)
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d/%m/%Y')
+    return value
+
+
+def patient_rows(patient):
+    """(label, value) of the patient's non-empty antecedentes"""
+    rows = []
+    for name in PatientForm._meta.fields:
+        if name == 'full_name':
+            continue
+        field = Patient._meta.get_field(name)
+        value = _display(field, getattr(patient, name))
+        if value is not None:
+            rows.append((field.help_text or field.verbose_name, value))
+    return rows
+
+
+def ficha_sections(row):
+    """Non-empty fields of a ficha values() row grouped by form section"""
+    grouped = {}
+    for field in ficha_diff.COMPARED_FIELDS:
+        if field == 'fecha' or row[field] in (None, '', False):
+            continue
+        grouped.setdefault(ficha_diff.FIELD_SECTIONS[field], []).append(
+            (ficha_diff.FIELD_LABELS[field], ficha_diff.display_value(field, row[field]))
+        )
+    return [(section, grouped[section]) for section in ficha_diff.SECTIONS if section in grouped]
+
+
+def sections(patient):
+    """Generator of the dossier's HTML, one section (or record) at a time"""
+    yield get_template('dossier/dossier_start.html').render({
+        'patient': patient,
+        'antecedentes': patient_rows(patient),
+        'generated_at': timezone.localtime(),
+    })
+
+    ficha_template = get_template('dossier/dossier_ficha.html')
+    fichas = (
+        FichaClinica.objects.filter(patient=patient)
+        .order_by('fecha', 'created_at')
+        .values('pk', *ficha_diff.COMPARED_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    yield '<section class="dossier-section"><h2>Fichas Clínicas</h2>'
+    empty = True
+    for row in fichas:
+        empty = False
+        yield ficha_template.render({'fecha': row['fecha'], 'sections': ficha_sections(row)})
+    if empty:
+        yield '<p class="dossier-empty">Sin fichas clínicas.</p>'
+    yield '</section>'
+
+    appointment_template = get_template('dossier/dossier_appointment.html')
+    appointments = Appointment.objects.filter(patient=patient).order_by('date_time').iterator(chunk_size=CHUNK_SIZE)
+    yield '<section class="dossier-section"><h2>Citas</h2>'
+    empty = True
+    for number, appointment in enumerate(appointments, start=1):
+        empty = False
+        yield appointment_template.render({'appointment': appointment, 'number': number})
+    if empty:
+        yield '<p class="dossier-empty">Sin citas registradas.</p>'
+    yield '</section>'
+
+    yield get_template('dossier/dossier_end.html').render({})
+
+
+def render(patient, dossier_version, fmt):
+    """Store the dossier for this version in the shared storage and drop older versions"""
+    storage = job_storage()
+    name = file_name(patient.pk, dossier_version, fmt)
+    # Directorio temporal propio: dos renders de la misma versión no escriben el mismo archivo
+    with tempfile.TemporaryDirectory() as tmp:
+        html_path = Path(tmp, 'dossier.html')
+        with open(html_path, 'w', encoding='utf-8') as handle:
+            for chunk in sections(patient):
+                handle.write(chunk)
+        path = html_path
+        if fmt == 'pdf':
+            path = Path(tmp, 'dossier.pdf')
+            WeasyHTML(filename=str(html_path)).write_pdf(str(path))
+        # Otro render de la misma versión ya lo guardó: el contenido es el mismo
+        if not storage.exists(name):
+            with open(path, 'rb') as handle:
+                storage.save(name, File(handle))
+
+    for old in storage.listdir(directory(patient.pk))[1]:
+        if old.endswith(f'.{fmt}') and f'{directory(patient.pk)}/{old}' != name:
+            storage.delete(f'{directory(patient.pk)}/{old}')
+    return name
@@ -0,0 +1,153 @@
+"""
+Comparación de fichas clínicas de un mismo paciente.
+
+El mapa campo -> sección se arma una sola vez al importar el módulo, siguiendo
+el orden de los campos de ``FichaClinica`` y las secciones de su formulario.
+Las dos fichas a comparar se leen en una sola consulta ``values()`` y solo se
+muestran los campos que cambiaron, agrupados por sección.
+
+``history_summary`` recorre todas las fichas del paciente en orden cronológico
+con un iterador, guardando solo la fila anterior, así que la memoria no crece
+con el largo de cada ficha.
+"""
+from .models import FichaClinica
+
+# Primer campo de cada sección (en el orden de FichaClinica) -> título de la sección
+SECTION_STARTS = {
+    'fecha': 'Fecha de la Ficha Clínica',
+    'consultation_reason': 'Motivo de Consulta',
+    'aprendizaje_pujo_caca': 'Aprendizajes Generales',
+    'aprendizaje_emb_oms': 'Aprendizajes Embarazo',
+    'smoking': 'Hábitos de Vida',
+    'daily_frequency_initial': 'Función Urinaria',
+    'iue': 'Incontinencia Orina',
+    'constipation': 'Funcionamiento Intestinal',
+    'sexual_status': 'Historial Sexual',
+    'diastasis': 'Examen Físico',
+    'intracavitary_consent': 'Examen Intracavitario',
+    'coloproctologic_consent': 'Examen Coloproctológico',
+}
+EXCLUDED_FIELDS = {'id', 'patient', 'created_at', 'updated_at'}
+HISTORY_CHUNK_SIZE = 200
+
+
+def _build_field_map():
+    sections = []
+    field_sections = {}
+    labels = {}
+    choices = {}
+    current = None
+    for field in FichaClinica._meta.concrete_fields:
+        if field.name in EXCLUDED_FIELDS:
+            continue
+        if field.name in SECTION_STARTS:
+            current = SECTION_STARTS[field.name]
+            sections.append(current)
+        field_sections[field.name] = current
+        labels[field.name] = field.help_text or field.verbose_name
+        if field.choices:
+            choices[field.name] = dict(field.flatchoices)
+    return sections, field_sections, labels, choices
+
+
+SECTIONS, FIELD_SECTIONS, FIELD_LABELS, FIELD_CHOICES = _build_field_map()
+COMPARED_FIELDS = tuple(FIELD_SECTIONS)
+
+
+def display_value(field, value):
+    """Human-readable value of a ficha field for the diff"""
+    if value is True:
+        return 'Sí'
+    if value is False:
+        return 'No'
+    if value in (None, ''):
+        return '—'
+    if field in FIELD_CHOICES:
+        return FIELD_CHOICES[field].get(value, value)
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d/%m/%Y')
+    return str(value)
+
+
+def changed_fields(old, new):
+    """Names of the compared fields whose values differ between two values() rows"""
+    return [field for field in COMPARED_FIELDS if old[field] != new[field]]
+
+
+def diff(old, new):
+    """Changed fields grouped by section, in form order; sections without changes are omitted"""
+    grouped = {}
+    for field in changed_fields(old, new):
+        grouped.setdefault(FIELD_SECTIONS[field], []).append({
+            'field': field,
+            'label': FIELD_LABELS[field],
+            'old': display_value(field, old[field]),
+            'new': display_value(field, new[field]),
+        })
+    return [{'section': section, 'changes': grouped[section]} for section in SECTIONS if section in grouped]
+
+
+def load_pair(patient_id, first_pk=None, second_pk=None):
+    """
+    (older, newer) values() rows of two fichas of the patient in one query.
+
+    Without pks, the two most recent fichas are used. Returns None if the
+    fichas are not both found for this patient.
+    """
+    queryset = FichaClinica.objects.filter(patient_id=patient_id).values('pk', 'created_at', *COMPARED_FIELDS)
+    if first_pk is None or second_pk is None:
+        rows = list(queryset.order_by('-fecha', '-created_at')[:2])
+    else:
+        rows = list(queryset.filter(pk__in=[first_pk, second_pk]))
+    if len(rows) != 2:
+        return None
+    older, newer = sorted(rows, key=lambda row: (row['fecha'], row['created_at']))
+    return older, newer
+
+
+def history_summary(patient_id):
+    """
+    Change summary across all the patient's fichas in one chronological pass.
+
+    Returns the ficha list (pk, fecha), one entry per consecutive pair with
+    its changed-field count per section, and how often each field changed.
+    """
+    rows = (
+        FichaClinica.objects.filter(patient_id=patient_id)
+        .order_by('fecha', 'created_at')
+        .values('pk', *COMPARED_FIELDS)
+        .iterator(chunk_size=HISTORY_CHUNK_SIZE)
+    )
+    fichas = []
+    transitions = []
+    field_counts = {}
+    previous = None
+    for row in rows:
+        fichas.append({'pk': row['pk'], 'fecha': row['fecha']})
+        if previous is not None:
+            sections = {}
+            for field in changed_fields(previous, row):
+                if field == 'fecha':
+                    continue
+                section = FIELD_SECTIONS[field]
+                sections[section] = sections.get(section, 0) + 1
+                field_counts[field] = field_counts.get(field, 0) + 1
+            transitions.append({
+                'from_pk': previous['pk'],
+                'to_pk': row['pk'],
+                'from_fecha': previous['fecha'],
+                'to_fecha': row['fecha'],
+                'changed': sum(sections.values()),
+                'sections': sections,
+            })
+        previous = row
+
+    most_changed = sorted(field_counts.items(), key=lambda item: (-item[1], item[0]))
+    return {
+        'fichas': fichas,
+        'transitions': transitions,
+        'fields': [
+            {'field': field, 'label': FIELD_LABELS[field], 'section': FIELD_SECTIONS[field], 'count': count}
+            for field, count in most_changed
+        ],
+    }
@@ -0,0 +1,90 @@
+"""
+Archivos que comparten los procesos web y ``run_worker``.
+
+Web y worker corren en procesos (y en Render, en máquinas) distintos: un
+archivo que uno escribe en su disco local el otro no lo ve. Las subidas de la
+importación, las exportaciones ``.gz`` y los dossiers pasan por el storage
+``STORAGES['jobs']``, que debe ser común a ambos:
+
+* Por defecto ``DatabaseStorage``: el contenido va en la tabla ``StoredFile``,
+  que los dos ya comparten. Pensado para archivos de pocos MB (se leen
+  completos en memoria).
+* ``JOBS_STORAGE_BACKEND`` permite usar otro backend compartido (p. ej. S3 con
+  django-storages). Un ``FileSystemStorage`` solo sirve si web y worker montan
+  el mismo disco.
+"""
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, storages
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+STORAGE_ALIAS = 'jobs'
+
+
+def job_storage():
+    """Storage shared by the web and worker processes"""
+    return storages[STORAGE_ALIAS]
+
+
+def delete_tree(storage, path):
+    """Delete every file under `path` in `storage`"""
+    directories, filenames = storage.listdir(path)
+    for filename in filenames:
+        storage.delete(f'{path}/{filename}')
+    for directory in directories:
+        delete_tree(storage, f'{path}/{directory}')
+
+
+@deconstructible
+class DatabaseStorage(Storage):
+    """Storage backed by the StoredFile table (no URLs: files are served by views)"""
+
+    def _open(self, name, mode='rb'):
+        content = StoredFile.objects.filter(name=name).values_list('content', flat=True).first()
+        if content is None:
+            raise FileNotFoundError(name)
+        return ContentFile(bytes(content), name=name)
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        data = b''.join(
+            chunk.encode() if isinstance(chunk, str) else chunk for chunk in content.chunks()
+        )
+        StoredFile.objects.create(name=name, content=data, size=len(data))
+        return name
+
+    def delete(self, name):
+        StoredFile.objects.filter(name=name).delete()
+
+    def exists(self, name):
+        return StoredFile.objects.filter(name=name).exists()
+
+    def size(self, name):
+        size = StoredFile.objects.filter(name=name).values_list('size', flat=True).first()
+        if size is None:
+            raise FileNotFoundError(name)
+        return size
+
+    def listdir(self, path):
+        prefix = f'{path.rstrip("/")}/' if path else ''
+        directories, filenames = set(), []
+        for name in StoredFile.objects.filter(name__startswith=prefix).values_list('name', flat=True):
+            head, slash, tail = name[len(prefix):].partition('/')
+            if slash:
+                directories.add(head)
+            else:
+                filenames.append(head)
+        return sorted(directories), sorted(filenames)
+
+    def get_created_time(self, name):
+        created_at = StoredFile.objects.filter(name=name).values_list('created_at', flat=True).first()
+        if created_at is None:
+            raise FileNotFoundError(name)
+        return created_at
+
+    get_modified_time = get_created_time
+
+    def url(self, name):
+        raise NotImplementedError('DatabaseStorage files are served by views, not by URL')
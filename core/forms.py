@@ -1,6 +1,9 @@
+from datetime import date
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import Patient, Appointment, FichaClinica
 
 
@@ -62,6 +65,107 @@ class CustomUserCreationForm(UserCreationForm):
         return user
 
 
+# ----------------------------------------------
+# Validaciones compartidas por los formularios y la importación CSV (core.imports)
+# ----------------------------------------------
+
+def validate_birth_date(birth_date):
+    """Birth date not in the future and age at most 120 years"""
+    if birth_date:
+        today = date.today()
+        if birth_date > today:
+            raise forms.ValidationError("La fecha de nacimiento no puede estar en el futuro.")
+        
+        # Calculate age
+        age = today.year - birth_date.year
+        if today.month < birth_date.month or (today.month == birth_date.month and today.day < birth_date.day):
+            age -= 1
+            
+        if age > 120:
+            raise forms.ValidationError("Por favor ingresa una fecha de nacimiento válida.")
+    return birth_date
+
+
+def validate_full_name(full_name):
+    """Stripped full name, required and at least 2 characters"""
+    full_name = (full_name or '').strip()
+    if not full_name:
+        raise forms.ValidationError("El nombre completo es requerido.")
+    if len(full_name) < 2:
+        raise forms.ValidationError("El nombre debe tener al menos 2 caracteres.")
+    return full_name
+
+
+def validate_pregnancy_weeks(weeks, is_pregnant):
+    if is_pregnant and weeks is not None:
+        if weeks < 1:
+            raise forms.ValidationError("Las semanas de embarazo deben ser mayor a 0.")
+        if weeks > 42:
+            raise forms.ValidationError("Las semanas de embarazo no pueden exceder 42 semanas.")
+    return weeks
+
+
+def apply_registration_dates(patient):
+    """Set or clear the pregnancy/postpartum registration fields from the patient's flags"""
+    # Si está embarazada y tiene semanas registradas, establecer fecha de registro
+    if patient.is_pregnant and patient.pregnancy_weeks_at_registration and not patient.pregnancy_registration_date:
+        patient.pregnancy_registration_date = timezone.now().date()
+    
+    # Si está en postparto y tiene semanas registradas, establecer fecha de registro
+    if patient.is_postpartum and patient.postpartum_weeks_at_registration and not patient.postpartum_registration_date:
+        patient.postpartum_registration_date = timezone.now().date()
+    
+    # Si ya no está embarazada, limpiar campos de embarazo
+    if not patient.is_pregnant:
+        patient.pregnancy_weeks_at_registration = None
+        patient.pregnancy_week_day = ''
+        patient.pregnancy_registration_date = None
+    
+    # Si ya no está en postparto, limpiar campos de postparto
+    if not patient.is_postpartum:
+        patient.postpartum_weeks_at_registration = None
+        patient.postpartum_week_day = ''
+        patient.postpartum_registration_date = None
+        patient.postpartum_start_date = None
+    return patient
+
+
+def validate_session_description(session_description):
+    """Stripped session description, required and at most 1000 characters"""
+    session_description = (session_description or '').strip()
+    if not session_description:
+        raise forms.ValidationError("La descripción de la sesión es requerida.")
+    if len(session_description) > 1000:
+        raise forms.ValidationError("La descripción no puede exceder 1000 caracteres.")
+    return session_description
+
+
+def validate_appointment_date_time(date_time):
+    """Past dates are allowed; future ones at most 2 years ahead"""
+    # NOTE: allow past dates because clinicians may register past appointments
+    if date_time:
+        # Only restrict excessively far future dates (2 years)
+        now = timezone.now()
+        max_future = now + timezone.timedelta(days=730)
+        if date_time > max_future:
+            raise forms.ValidationError("No se pueden programar citas con más de 2 años de anticipación.")
+    return date_time
+
+
+def validate_additional_notes(additional_notes):
+    additional_notes = (additional_notes or '').strip()
+    if additional_notes and len(additional_notes) > 500:
+        raise forms.ValidationError("Las notas adicionales no pueden exceder 500 caracteres.")
+    return additional_notes
+
+
+def validate_perfect_score(value):
+    """PERFECT P/E/R/F scores go from 0 to 10"""
+    if value is not None and (value < 0 or value > 10):
+        raise forms.ValidationError("El valor debe estar entre 0 y 10.")
+    return value
+
+
 class PatientForm(forms.ModelForm):
     """Form for creating and editing basic patient information"""
     
@@ -69,7 +173,7 @@ class PatientForm(forms.ModelForm):
         model = Patient
         fields = [
             # Datos básicos del paciente
-            'full_name', 'birth_date', 'profession', 'address', 'phone', 
+            'full_name', 'birth_date', 'profession', 'address', 'phone', 'email',
             'medications', 'musculoskeletal_history', 'patient_data_other',
             
             # Antecedentes ginecológicos
@@ -93,6 +197,7 @@ class PatientForm(forms.ModelForm):
             'profession': forms.TextInput(attrs={'class': 'form-control'}),
             'address': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
             'phone': forms.TextInput(attrs={'class': 'form-control'}),
+            'email': forms.EmailInput(attrs={'class': 'form-control'}),
             'medications': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'musculoskeletal_history': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'patient_data_other': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
@@ -133,70 +238,22 @@ class PatientForm(forms.ModelForm):
     
     def clean_birth_date(self):
         """Validate birth date is not in the future and person is not too old"""
-        from datetime import date
-        birth_date = self.cleaned_data.get('birth_date')
-        if birth_date:
-            today = date.today()
-            if birth_date > today:
-                raise forms.ValidationError("La fecha de nacimiento no puede estar en el futuro.")
-            
-            # Calculate age
-            age = today.year - birth_date.year
-            if today.month < birth_date.month or (today.month == birth_date.month and today.day < birth_date.day):
-                age -= 1
-                
-            if age > 120:
-                raise forms.ValidationError("Por favor ingresa una fecha de nacimiento válida.")
-        return birth_date
+        return validate_birth_date(self.cleaned_data.get('birth_date'))
     
     def clean_full_name(self):
         """Validate full name is not empty and has reasonable length"""
-        full_name = self.cleaned_data.get('full_name', '').strip()
-        if not full_name:
-            raise forms.ValidationError("El nombre completo es requerido.")
-        if len(full_name) < 2:
-            raise forms.ValidationError("El nombre debe tener al menos 2 caracteres.")
-        return full_name
+        return validate_full_name(self.cleaned_data.get('full_name', ''))
     
     def clean_pregnancy_weeks_at_registration(self):
         """Validate pregnancy weeks"""
-        weeks = self.cleaned_data.get('pregnancy_weeks_at_registration')
-        is_pregnant = self.cleaned_data.get('is_pregnant', False)
-        
-        if is_pregnant and weeks is not None:
-            if weeks < 1:
-                raise forms.ValidationError("Las semanas de embarazo deben ser mayor a 0.")
-            if weeks > 42:
-                raise forms.ValidationError("Las semanas de embarazo no pueden exceder 42 semanas.")
-        
-        return weeks
+        return validate_pregnancy_weeks(
+            self.cleaned_data.get('pregnancy_weeks_at_registration'),
+            self.cleaned_data.get('is_pregnant', False),
+        )
     
     def save(self, commit=True):
         """Save the patient and set pregnancy/postpartum registration dates if needed"""
-        patient = super().save(commit=False)
-        
-        # Si está embarazada y tiene semanas registradas, establecer fecha de registro
-        if patient.is_pregnant and patient.pregnancy_weeks_at_registration and not patient.pregnancy_registration_date:
-            from django.utils import timezone
-            patient.pregnancy_registration_date = timezone.now().date()
-        
-        # Si está en postparto y tiene semanas registradas, establecer fecha de registro
-        if patient.is_postpartum and patient.postpartum_weeks_at_registration and not patient.postpartum_registration_date:
-            from django.utils import timezone
-            patient.postpartum_registration_date = timezone.now().date()
-        
-        # Si ya no está embarazada, limpiar campos de embarazo
-        if not patient.is_pregnant:
-            patient.pregnancy_weeks_at_registration = None
-            patient.pregnancy_week_day = ''
-            patient.pregnancy_registration_date = None
-        
-        # Si ya no está en postparto, limpiar campos de postparto
-        if not patient.is_postpartum:
-            patient.postpartum_weeks_at_registration = None
-            patient.postpartum_week_day = ''
-            patient.postpartum_registration_date = None
-            patient.postpartum_start_date = None
+        patient = apply_registration_dates(super().save(commit=False))
         
         if commit:
             patient.save()
@@ -585,58 +642,28 @@ class AppointmentForm(forms.ModelForm):
     
     def clean_session_description(self):
         """Validate session description is not empty and has reasonable length"""
-        session_description = self.cleaned_data.get('session_description', '').strip()
-        if not session_description:
-            raise forms.ValidationError("La descripción de la sesión es requerida.")
-        if len(session_description) > 1000:
-            raise forms.ValidationError("La descripción no puede exceder 1000 caracteres.")
-        return session_description
+        return validate_session_description(self.cleaned_data.get('session_description', ''))
     
     def clean_date_time(self):
         """Validate appointment date and time"""
-        from django.utils import timezone
-        date_time = self.cleaned_data.get('date_time')
-        # NOTE: allow past dates because clinicians may register past appointments
-        if date_time:
-            # Only restrict excessively far future dates (2 years)
-            now = timezone.now()
-            max_future = now + timezone.timedelta(days=730)
-            if date_time > max_future:
-                raise forms.ValidationError("No se pueden programar citas con más de 2 años de anticipación.")
-        
-        return date_time
+        return validate_appointment_date_time(self.cleaned_data.get('date_time'))
     
     def clean_additional_notes(self):
         """Validate additional notes length if provided"""
-        additional_notes = self.cleaned_data.get('additional_notes', '').strip()
-        if additional_notes and len(additional_notes) > 500:
-            raise forms.ValidationError("Las notas adicionales no pueden exceder 500 caracteres.")
-        return additional_notes
+        return validate_additional_notes(self.cleaned_data.get('additional_notes', ''))
     
     def clean_perfect_p_power(self):
         """Validate P (Power) field"""
-        value = self.cleaned_data.get('perfect_p_power')
-        if value is not None and (value < 0 or value > 10):
-            raise forms.ValidationError("El valor debe estar entre 0 y 10.")
-        return value
+        return validate_perfect_score(self.cleaned_data.get('perfect_p_power'))
     
     def clean_perfect_e_endurance(self):
         """Validate E (Endurance) field"""
-        value = self.cleaned_data.get('perfect_e_endurance')
-        if value is not None and (value < 0 or value > 10):
-            raise forms.ValidationError("El valor debe estar entre 0 y 10.")
-        return value
+        return validate_perfect_score(self.cleaned_data.get('perfect_e_endurance'))
     
     def clean_perfect_r_repetitions(self):
         """Validate R (Repetitions) field"""
-        value = self.cleaned_data.get('perfect_r_repetitions')
-        if value is not None and (value < 0 or value > 10):
-            raise forms.ValidationError("El valor debe estar entre 0 y 10.")
-        return value
+        return validate_perfect_score(self.cleaned_data.get('perfect_r_repetitions'))
     
     def clean_perfect_f_fast(self):
         """Validate F (Fast contractions) field"""
-        value = self.cleaned_data.get('perfect_f_fast')
-        if value is not None and (value < 0 or value > 10):
-            raise forms.ValidationError("El valor debe estar entre 0 y 10.")
-        return value
\ No newline at end of file
+        return validate_perfect_score(self.cleaned_data.get('perfect_f_fast'))
\ No newline at end of file
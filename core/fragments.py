@@ -0,0 +1,24 @@
+"""
+Respuestas parciales al estilo HTMX.
+
+Cuando el JavaScript de una página pide solo un bloque (header
+``HX-Request: true``), la vista renderiza la plantilla parcial que la página
+completa incluye con ``{% include %}``, sin layout ni CSS. Así ambas respuestas
+salen de la misma plantilla.
+"""
+from django.shortcuts import render
+from django.utils.cache import patch_vary_headers
+
+FRAGMENT_HEADER = 'HX-Request'
+
+
+def wants_fragment(request):
+    return request.headers.get(FRAGMENT_HEADER) == 'true'
+
+
+def render_page(request, template_name, fragment_name, context):
+    """Render the full page, or only `fragment_name` for a fragment request"""
+    response = render(request, fragment_name if wants_fragment(request) else template_name, context)
+    # El navegador no debe reutilizar el fragmento como página completa (ni al revés)
+    patch_vary_headers(response, (FRAGMENT_HEADER,))
+    return response
@@ -0,0 +1,57 @@
+"""
+Contenido de la tarjeta que aparece al pasar el mouse por un paciente del dashboard.
+
+Antes se renderizaba oculta para cada paciente del dashboard; ahora se sirve
+bajo demanda desde ``patient_hover_card`` la primera vez que se hace hover. El
+fragmento se guarda en la caché compartida (``CACHE_ALIAS``, común a todos los
+workers) por (profesional, paciente) y se invalida desde ``core.signals`` al
+escribir una cita.
+"""
+from django.core.cache import caches
+from django.template.loader import render_to_string
+
+from .models import Appointment, Patient
+
+MAX_APPOINTMENTS = 7
+CACHE_ALIAS = 'shared'
+CACHE_TIMEOUT = 60 * 60 * 24
+FIELDS = (
+    'date_time', 'tasks',
+    'perfect_p_power', 'perfect_e_endurance', 'perfect_r_repetitions', 'perfect_f_fast',
+    'perfect_e_every', 'perfect_c_cocontraction', 'perfect_t_timing',
+)
+
+
+def cache_key(user_id, patient_id):
+    return f'hover_card:{user_id}:{patient_id}'
+
+
+def invalidate(user_id, patient_id):
+    caches[CACHE_ALIAS].delete(cache_key(user_id, patient_id))
+
+
+def render_card(user_id, patient_id):
+    """
+    Rendered fragment for an owned patient, or None if it is not the user's.
+
+    The latest appointments come from one query on the (patient, -date_time)
+    index, joined to the patient to check ownership.
+    """
+    cache = caches[CACHE_ALIAS]
+    key = cache_key(user_id, patient_id)
+    html = cache.get(key)
+    if html is not None:
+        return html
+
+    appointments = list(
+        Appointment.objects
+        .filter(patient_id=patient_id, patient__user_id=user_id)
+        .order_by('-date_time')
+        .values(*FIELDS)[:MAX_APPOINTMENTS]
+    )
+    if not appointments and not Patient.objects.filter(pk=patient_id, user_id=user_id).exists():
+        return None
+
+    html = render_to_string('dashboard/patient_hover_card.html', {'appointments': appointments})
+    cache.set(key, html, CACHE_TIMEOUT)
+    return html
@@ -0,0 +1,298 @@
+"""
+Importación masiva de pacientes y citas históricas desde CSV.
+
+* El CSV se lee fila a fila (``csv.DictReader`` sobre el archivo subido), sin
+  cargarlo completo en memoria. Se acepta ``,`` o ``;`` como separador y fechas
+  ``AAAA-MM-DD`` o ``DD/MM/AAAA``.
+* Cada columna se convierte con su campo del modelo y luego se aplican las
+  mismas reglas de ``PatientForm``/``AppointmentForm`` (``core.forms``), sin
+  construir un formulario por fila.
+* Las filas válidas se guardan con ``bulk_create`` en bloques de
+  ``CHUNK_SIZE``, cada uno en su transacción. Las inválidas se informan con su
+  número de línea y no detienen la importación.
+* Las citas indican su paciente con ``patient_key`` (la columna ``key`` del CSV
+  de pacientes importado en la misma corrida; el índice clave -> id vive solo
+  durante la importación) o con ``patient_id`` de un paciente ya existente.
+"""
+import csv
+import io
+import re
+from itertools import chain
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import forms, hover_cards, progress
+from .models import Appointment, Patient
+
+CHUNK_SIZE = 1000
+KEY_COLUMN = 'key'
+PATIENT_KEY_COLUMN = 'patient_key'
+PATIENT_ID_COLUMN = 'patient_id'
+TRUE_VALUES = {'1', 'true', 't', 'si', 'sí', 's', 'yes', 'y', 'x'}
+_day_first = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})(.*)$')
+
+
+class ImportFileError(ValueError):
+    """The file cannot be imported at all (encoding, missing or unknown columns)"""
+
+
+class RowSpec:
+    """How to turn the CSV columns of one model into field values"""
+
+    def __init__(self, model, columns, validators, required, extra_columns=()):
+        self.model = model
+        self.columns = list(columns)
+        self.fields = {name: model._meta.get_field(name) for name in self.columns}
+        self.validators = validators
+        self.required = set(required)
+        self.extra_columns = set(extra_columns)
+        # Etiqueta en minúsculas -> valor, para columnas con opciones ("Sí" -> "si")
+        self.choice_labels = {
+            name: {str(label).lower(): value for value, label in field.flatchoices}
+            for name, field in self.fields.items() if field.choices
+        }
+
+    def check_header(self, header):
+        header = {name.strip() for name in header or () if name}
+        missing = self.required - header
+        if missing:
+            raise ImportFileError(f"Faltan columnas: {', '.join(sorted(missing))}")
+        unknown = header - set(self.columns) - self.extra_columns
+        if unknown:
+            raise ImportFileError(f"Columnas desconocidas: {', '.join(sorted(unknown))}")
+
+    def convert(self, name, raw):
+        field = self.fields[name]
+        raw = (raw or '').strip()
+        if isinstance(field, models.BooleanField):
+            return raw.lower() in TRUE_VALUES
+        if not raw:
+            if not field.blank:
+                raise ValidationError('Este campo es obligatorio.')
+            return None if field.null else ''
+        if name in self.choice_labels:
+            raw = self.choice_labels[name].get(raw.lower(), raw)
+        if isinstance(field, (models.DateField, models.DateTimeField)):
+            match = _day_first.match(raw)
+            if match:
+                day, month, year, rest = match.groups()
+                raw = f'{year}-{int(month):02d}-{int(day):02d}{rest}'
+        value = field.clean(raw, None)
+        if isinstance(field, models.DateTimeField) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def build(self, row):
+        """(field values, {column: message}) for one CSV row"""
+        values = {}
+        errors = {}
+        for name in self.columns:
+            if name not in row:
+                continue
+            try:
+                value = self.convert(name, row[name])
+                if name in self.validators:
+                    value = self.validators[name](value)
+                values[name] = value
+            except ValidationError as exc:
+                errors[name] = ' '.join(exc.messages)
+        return values, errors
+
+
+PATIENTS = RowSpec(
+    Patient,
+    columns=forms.PatientForm._meta.fields,
+    validators={
+        'full_name': forms.validate_full_name,
+        'birth_date': forms.validate_birth_date,
+    },
+    required=['full_name', 'birth_date'],
+    extra_columns=[KEY_COLUMN],
+)
+APPOINTMENTS = RowSpec(
+    Appointment,
+    columns=forms.AppointmentForm._meta.fields,
+    validators={
+        'date_time': forms.validate_appointment_date_time,
+        'session_description': forms.validate_session_description,
+        'additional_notes': forms.validate_additional_notes,
+        'perfect_p_power': forms.validate_perfect_score,
+        'perfect_e_endurance': forms.validate_perfect_score,
+        'perfect_r_repetitions': forms.validate_perfect_score,
+        'perfect_f_fast': forms.validate_perfect_score,
+    },
+    required=['date_time', 'session_description'],
+    extra_columns=[PATIENT_KEY_COLUMN, PATIENT_ID_COLUMN],
+)
+
+
+# ----------------------------------------------
+# Lectura del CSV
+# ----------------------------------------------
+
+def read_csv(file):
+    """DictReader over an uploaded/opened binary file, detecting the `,`/`;` delimiter"""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        header = text.readline()
+    except UnicodeDecodeError:
+        raise ImportFileError('El archivo debe estar codificado en UTF-8.')
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.DictReader(chain([header], text), delimiter=delimiter)
+    reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+    return reader
+
+
+class ImportResult:
+    def __init__(self, on_chunk=None):
+        self.patients = 0
+        self.appointments = 0
+        self.errors = []
+        self.touched_patients = set()
+        # Llamado tras cada bloque guardado (progreso de core.jobs)
+        self.on_chunk = on_chunk
+
+    def error(self, file, line, column, message):
+        self.errors.append({'file': file, 'line': line, 'column': column, 'message': message})
+
+    def chunk_done(self):
+        if self.on_chunk is not None:
+            self.on_chunk(self)
+
+    def as_dict(self, max_errors=200):
+        """JSON-serializable summary, keeping the first `max_errors` errors"""
+        return {
+            'patients': self.patients,
+            'appointments': self.appointments,
+            'error_count': len(self.errors),
+            'errors': self.errors[:max_errors],
+        }
+
+
+def _rows(reader, file, result):
+    """(line number, row) pairs; undecodable content is reported as a row error and stops the file"""
+    line = 1
+    try:
+        for row in reader:
+            line += 1
+            yield line, row
+    except UnicodeDecodeError:
+        result.error(file, line + 1, '', 'El archivo debe estar codificado en UTF-8.')
+
+
+# ----------------------------------------------
+# Importación
+# ----------------------------------------------
+
+def _save_chunk(model, objects, dry_run):
+    if dry_run or not objects:
+        return objects
+    with transaction.atomic():
+        return model.objects.bulk_create(objects)
+
+
+def import_patients(user, reader, result, key_index, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Create the patients of a CSV; fills key_index with key -> pk for the appointment import"""
+    PATIENTS.check_header(reader.fieldnames)
+    batch, keys = [], []
+
+    def flush():
+        created = _save_chunk(Patient, batch, dry_run)
+        for key, patient in zip(keys, created):
+            if key:
+                key_index[key] = patient.pk
+        result.patients += len(created)
+        batch.clear()
+        keys.clear()
+        result.chunk_done()
+
+    for line, row in _rows(reader, 'patients', result):
+        key = (row.get(KEY_COLUMN) or '').strip()
+        values, errors = PATIENTS.build(row)
+        if key and (key in key_index or key in keys):
+            errors[KEY_COLUMN] = f'Clave repetida: {key}'
+        if 'pregnancy_weeks_at_registration' in values:
+            try:
+                forms.validate_pregnancy_weeks(values['pregnancy_weeks_at_registration'], values.get('is_pregnant'))
+            except ValidationError as exc:
+                errors['pregnancy_weeks_at_registration'] = ' '.join(exc.messages)
+        if errors:
+            for column, message in errors.items():
+                result.error('patients', line, column, message)
+            continue
+        batch.append(forms.apply_registration_dates(Patient(user=user, **values)))
+        keys.append(key)
+        if len(batch) >= chunk_size:
+            flush()
+    flush()
+
+
+def import_appointments(user, reader, result, key_index, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Create the appointments of a CSV, attached via patient_key or an owned patient_id"""
+    APPOINTMENTS.check_header(reader.fieldnames)
+    if PATIENT_KEY_COLUMN not in reader.fieldnames and PATIENT_ID_COLUMN not in reader.fieldnames:
+        raise ImportFileError(f'Falta la columna {PATIENT_KEY_COLUMN} o {PATIENT_ID_COLUMN}')
+    batch = []
+
+    def flush():
+        # Una consulta por bloque para verificar los patient_id referenciados
+        ids = {ref for _, ref, appointment in batch if ref is not None}
+        owned = set(Patient.objects.filter(user=user, pk__in=ids).values_list('pk', flat=True)) if ids else set()
+        objects = []
+        for line, ref, appointment in batch:
+            if ref is not None:
+                if ref not in owned:
+                    result.error('appointments', line, PATIENT_ID_COLUMN, f'Paciente no encontrado: {ref}')
+                    continue
+                appointment.patient_id = ref
+                result.touched_patients.add(ref)
+            appointment.parse_balloon_volumes()
+            objects.append(appointment)
+        result.appointments += len(_save_chunk(Appointment, objects, dry_run))
+        batch.clear()
+        result.chunk_done()
+
+    for line, row in _rows(reader, 'appointments', result):
+        values, errors = APPOINTMENTS.build(row)
+        key = (row.get(PATIENT_KEY_COLUMN) or '').strip()
+        raw_id = (row.get(PATIENT_ID_COLUMN) or '').strip()
+        patient_pk, ref = None, None
+        if key:
+            if key not in key_index:
+                errors[PATIENT_KEY_COLUMN] = f'Clave de paciente desconocida: {key}'
+            patient_pk = key_index.get(key)
+        elif raw_id.isdigit():
+            ref = int(raw_id)
+        else:
+            errors[PATIENT_ID_COLUMN] = 'Indica patient_key o un patient_id numérico.'
+        if errors:
+            for column, message in errors.items():
+                result.error('appointments', line, column, message)
+            continue
+        batch.append((line, ref, Appointment(patient_id=patient_pk, **values)))
+        if len(batch) >= chunk_size:
+            flush()
+    flush()
+
+
+def run(user, patients_file=None, appointments_file=None, dry_run=False, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """Import one or both CSV files for `user`; returns an ImportResult"""
+    result = ImportResult(on_chunk)
+    key_index = {}
+    if patients_file is not None:
+        import_patients(user, read_csv(patients_file), result, key_index, dry_run, chunk_size)
+    if appointments_file is not None:
+        import_appointments(user, read_csv(appointments_file), result, key_index, dry_run, chunk_size)
+
+    if not dry_run and (result.patients or result.appointments):
+        # bulk_create no emite señales: refrescar lo que mantienen
+        for patient_id in result.touched_patients:
+            progress.invalidate(patient_id)
+            hover_cards.invalidate(user.pk, patient_id)
+        if settings.ANALYTICS_UPDATE_ON_WRITE:
+            call_command('analytics_rollup', user=user.username, stdout=io.StringIO())
+    return result
@@ -0,0 +1,231 @@
+"""
+Cola de trabajos en la base de datos, sin broker externo.
+
+Las vistas encolan con ``enqueue('nombre', user=..., **payload)`` y responden
+de inmediato; el comando ``run_worker`` toma y ejecuta los trabajos.
+
+* Toma de trabajos: en PostgreSQL con ``SELECT ... FOR UPDATE SKIP LOCKED``, así
+  varios workers no se bloquean entre sí. En SQLite (sin bloqueo por fila) con
+  un ``UPDATE ... WHERE status = 'queued'`` condicional: solo un worker logra
+  cambiar la fila y los demás pasan al siguiente candidato.
+* Prioridades: se toma primero el de mayor ``priority``, luego el más antiguo.
+* Reintentos: si la tarea lanza una excepción se vuelve a encolar con espera
+  exponencial (``JOB_RETRY_BASE_SECONDS``) hasta ``max_attempts``.
+* Latido: mientras la tarea corre, un hilo del worker renueva ``locked_at``
+  cada ``JOB_LEASE_SECONDS / 3`` aunque la tarea no informe progreso; un
+  trabajo sin latido por ``JOB_LEASE_SECONDS`` (worker caído) se reencola.
+* Progreso: la tarea llama ``job.report(...)`` (que también renueva el latido).
+* Archivos: web y worker no comparten disco (procesos separados en el
+  Procfile), así que las subidas y los resultados se guardan en el storage
+  compartido de ``core.files`` (por defecto la BD), nunca en un directorio local.
+
+Las tareas se registran con ``@task('nombre')`` en ``core.tasks``.
+"""
+import logging
+import threading
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .files import delete_tree, job_storage
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+CLAIM_CANDIDATES = 5
+PROGRESS_INTERVAL_SECONDS = 1.0
+# Latidos por período de JOB_LEASE_SECONDS
+HEARTBEATS_PER_LEASE = 3
+
+
+def task(name):
+    """Register `func(job, **payload)` as the task `name`"""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def file_name(job, filename):
+    """Name in the shared storage of a file produced by the job"""
+    return f'jobs/{job.pk}/{filename}'
+
+
+def save_upload(uploaded_file):
+    """Store an uploaded file for a task in the shared storage; returns its name there"""
+    return job_storage().save(f'uploads/{uuid.uuid4().hex}.csv', uploaded_file)
+
+
+def enqueue(name, user=None, priority=0, max_attempts=3, **payload):
+    """Queue a registered task; runs it right away when JOBS_EAGER is on"""
+    if name not in TASKS:
+        raise ValueError(f'Unknown task: {name}')
+    job = Job.objects.create(
+        name=name, user=user, priority=priority, max_attempts=max_attempts, payload=payload,
+    )
+    if settings.JOBS_EAGER:
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by='eager', locked_at=timezone.now(),
+            started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            execute(job)
+            job.refresh_from_db()
+    return job
+
+
+class JobContext:
+    """What a task receives: the job row plus throttled progress reporting"""
+
+    def __init__(self, job):
+        self.job = job
+        self._last_report = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.job, name)
+
+    def report(self, done=None, total=None, message=None, force=False):
+        """Store progress (at most once per second unless `force`) and renew the lease"""
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        fields = {'locked_at': timezone.now()}
+        if done is not None:
+            fields['progress_done'] = done
+        if total is not None:
+            fields['progress_total'] = total
+        if message is not None:
+            fields['progress_message'] = message[:200]
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+
+
+# ----------------------------------------------
+# Toma y ejecución
+# ----------------------------------------------
+
+def _ready():
+    return (
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now())
+        .order_by('-priority', 'run_after', 'pk')
+    )
+
+
+def claim(worker):
+    """Take the next ready job for `worker`, or None"""
+    now = timezone.now()
+    running = {
+        'status': Job.RUNNING, 'locked_by': worker, 'locked_at': now, 'started_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = _ready().select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            Job.objects.filter(pk=pk).update(**running)
+        return Job.objects.get(pk=pk)
+
+    # Sin SKIP LOCKED (SQLite): el UPDATE condicional decide qué worker se queda con cada fila
+    for pk in _ready().values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**running):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _finish(job, **fields):
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+        finished_at=timezone.now(), **fields
+    )
+
+
+def _retry_or_fail(job, error):
+    """Queue again with exponential backoff, or fail once max_attempts is reached"""
+    if job.attempts < job.max_attempts:
+        delay = settings.JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+        Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+            status=Job.QUEUED, run_after=timezone.now() + timedelta(seconds=delay),
+            locked_by='', locked_at=None, error=error,
+        )
+    else:
+        _finish(job, status=Job.FAILED, error=error)
+
+
+class Heartbeat(threading.Thread):
+    """Renew a running job's lease from the worker until stop()"""
+
+    def __init__(self, job, interval):
+        super().__init__(name=f'job-{job.pk}-heartbeat', daemon=True)
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    Job.objects.filter(pk=self.job.pk, status=Job.RUNNING, locked_by=self.job.locked_by).update(
+                        locked_at=timezone.now()
+                    )
+                except Exception:
+                    logger.exception('Heartbeat of job %s failed', self.job.pk)
+        finally:
+            # La conexión de este hilo
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def execute(job):
+    """Run a claimed job and record its outcome"""
+    func = TASKS.get(job.name)
+    if func is None:
+        _finish(job, status=Job.FAILED, error=f'Unknown task: {job.name}')
+        return
+    heartbeat = Heartbeat(job, settings.JOB_LEASE_SECONDS / HEARTBEATS_PER_LEASE)
+    heartbeat.start()
+    try:
+        result = func(JobContext(job), **job.payload)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts)
+        _retry_or_fail(job, traceback.format_exc())
+        return
+    finally:
+        heartbeat.stop()
+    _finish(job, status=Job.SUCCEEDED, result=result, error='')
+
+
+def requeue_stale():
+    """Jobs whose worker stopped renewing the lease go back to the queue (or fail)"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    stale = list(
+        Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+        .only('pk', 'attempts', 'max_attempts', 'locked_by')
+    )
+    for job in stale:
+        _retry_or_fail(job, f'Worker {job.locked_by} stopped responding')
+    return len(stale)
+
+
+def prune():
+    """Delete finished jobs (and their stored files) older than JOB_RETENTION_DAYS"""
+    cutoff = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    old = list(
+        Job.objects.filter(status__in=(Job.SUCCEEDED, Job.FAILED), finished_at__lt=cutoff)
+        .values_list('pk', flat=True)
+    )
+    storage = job_storage()
+    for pk in old:
+        delete_tree(storage, f'jobs/{pk}')
+    Job.objects.filter(pk__in=old).delete()
+    return len(old)
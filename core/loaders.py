@@ -0,0 +1,49 @@
+"""
+Carga de recursos con control de propiedad.
+
+``get_owned_or_404`` trae el objeto pedido filtrando por el profesional de la
+request en la misma consulta; para citas y fichas también trae al paciente
+con un JOIN. El resultado queda memoizado en la request, de modo que llamadas
+repetidas (vista, decoradores, helpers) no vuelven a la base de datos.
+"""
+from django.shortcuts import get_object_or_404
+
+from .models import Appointment, FichaClinica, Patient
+
+# Ruta desde cada modelo hasta el id del profesional dueño
+OWNER_PATHS = {
+    Patient: 'user_id',
+    Appointment: 'patient__user_id',
+    FichaClinica: 'patient__user_id',
+}
+
+
+def _cache(request):
+    return request.__dict__.setdefault('_owned_objects', {})
+
+
+def get_owned_or_404(request, model, **lookup):
+    """Fetch a Patient/Appointment/FichaClinica owned by request.user (memoized per request)"""
+    cache = _cache(request)
+    key = (model, tuple(sorted(lookup.items())))
+    if key not in cache:
+        queryset = model.objects.filter(**{OWNER_PATHS[model]: request.user.pk})
+        if model is not Patient:
+            queryset = queryset.select_related('patient')
+        obj = get_object_or_404(queryset, **lookup)
+        cache[key] = obj
+        if model is not Patient:
+            cache.setdefault((Patient, (('pk', obj.patient_id),)), obj.patient)
+    return cache[key]
+
+
+def get_owned_patient(request, pk):
+    return get_owned_or_404(request, Patient, pk=pk)
+
+
+def get_owned_appointment(request, pk):
+    return get_owned_or_404(request, Appointment, pk=pk)
+
+
+def get_owned_ficha(request, patient_pk, pk):
+    return get_owned_or_404(request, FichaClinica, pk=pk, patient_id=patient_pk)
@@ -0,0 +1,93 @@
+from itertools import groupby
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import analytics
+from core.models import Appointment, FichaClinica, Patient, PatientOutcome, WeeklyPracticeStats
+
+OUTCOME_FIELDS = [
+    'user', 'is_pregnant', 'is_postpartum', 'alta', 'session_count',
+    'first_session', 'last_session', 'perfect_series', 'latest_symptoms', 'updated_at',
+]
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the analytics aggregate tables (weekly buckets and patient outcomes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild this practitioner (username)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per bulk write')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(patient__isnull=False).distinct().order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+
+        for user in users:
+            weeks = self.rebuild_weeks(user, options['chunk_size'])
+            outcomes = self.rebuild_outcomes(user, options['chunk_size'])
+            self.stdout.write(f'{user.username}: {weeks} weekly buckets, {outcomes} patient outcomes')
+
+        self.stdout.write(self.style.SUCCESS('Analytics rollup completed'))
+
+    def rebuild_weeks(self, user, chunk_size):
+        stats = analytics.compute_weekly_buckets(
+            Appointment.objects.filter(patient__user=user),
+            FichaClinica.objects.filter(patient__user=user),
+        )
+        with transaction.atomic():
+            WeeklyPracticeStats.objects.filter(user=user).delete()
+            WeeklyPracticeStats.objects.bulk_create(stats, batch_size=chunk_size)
+        return len(stats)
+
+    def rebuild_outcomes(self, user, chunk_size):
+        patients = Patient.objects.filter(user=user).order_by('pk').values(
+            'pk', 'user_id', *analytics.COHORT_FLAGS.values()
+        )
+        sessions = groupby(
+            Appointment.objects.filter(patient__user=user)
+            .order_by('patient_id', 'date_time', 'pk')
+            .values('patient_id', 'date_time', *analytics.PERFECT_FIELDS.values())
+            .iterator(chunk_size=2000),
+            key=lambda row: row['patient_id'],
+        )
+        # La primera ficha de cada grupo es la más reciente
+        fichas = groupby(
+            FichaClinica.objects.filter(patient__user=user)
+            .order_by('patient_id', '-fecha', '-created_at')
+            .values('patient_id', *analytics.SYMPTOM_FIELDS)
+            .iterator(chunk_size=2000),
+            key=lambda row: row['patient_id'],
+        )
+        next_sessions = next(sessions, (None, iter(())))
+        next_fichas = next(fichas, (None, iter(())))
+
+        batch, total = [], 0
+        for patient in patients.iterator(chunk_size=chunk_size):
+            # Los tres iteradores avanzan en orden de patient_id
+            while next_sessions[0] is not None and next_sessions[0] < patient['pk']:
+                next_sessions = next(sessions, (None, iter(())))
+            while next_fichas[0] is not None and next_fichas[0] < patient['pk']:
+                next_fichas = next(fichas, (None, iter(())))
+
+            patient_sessions = next_sessions[1] if next_sessions[0] == patient['pk'] else ()
+            latest_ficha = next(next_fichas[1], None) if next_fichas[0] == patient['pk'] else None
+            batch.append(analytics.build_outcome(patient, patient_sessions, latest_ficha))
+
+            if len(batch) >= chunk_size:
+                total += self.write_outcomes(batch)
+                batch = []
+        if batch:
+            total += self.write_outcomes(batch)
+        return total
+
+    def write_outcomes(self, batch):
+        PatientOutcome.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['patient'],
+            update_fields=OUTCOME_FIELDS,
+        )
+        return len(batch)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.backfills import BalloonVolumeBackfill
+
+
+class Command(BaseCommand):
+    help = 'Backfill the numeric balloon-test columns (ml); same as "run_backfill balloon_volumes"'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per committed batch')
+        parser.add_argument('--rows-per-second', type=float, help='Throttle to this many rows per second')
+        parser.add_argument('--reset', action='store_true', help='Discard the checkpoint and start over')
+
+    def handle(self, *args, **options):
+        BalloonVolumeBackfill(
+            chunk_size=options['chunk_size'],
+            rows_per_second=options['rows_per_second'],
+            report=self.stdout.write,
+        ).run(reset=options['reset'])
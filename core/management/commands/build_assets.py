@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import assets
+
+
+class Command(BaseCommand):
+    help = 'Purge and split the stylesheet and generate logo/favicon variants (run before collectstatic)'
+
+    def handle(self, *args, **options):
+        manifest = assets.build()
+        sizes = manifest['sizes']
+        self.stdout.write(
+            f"CSS: {sizes['source_css'] / 1024:.1f}KB -> {sizes['css'] / 1024:.1f}KB purged, "
+            f"{sizes['critical_css'] / 1024:.1f}KB critical (inlined)"
+        )
+        if 'logo' in manifest:
+            self.stdout.write(f"Logo variants: {', '.join(sorted(manifest['logo']))}px (WebP/PNG 1x, 2x), favicon.ico")
+        else:
+            self.stdout.write(self.style.WARNING('Pillow is not installed: keeping the original JPG logo and favicon'))
+        self.stdout.write(self.style.SUCCESS(f'Assets written to {settings.ASSET_BUILD_DIR}'))
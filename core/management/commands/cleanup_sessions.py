@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+DB_BACKED_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+class Command(BaseCommand):
+    help = 'Delete expired rows from django_session in small batches (db and cached_db strategies)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Sessions deleted per transaction')
+        parser.add_argument('--force', action='store_true',
+                            help='Clean the table even if the current strategy does not use it')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in DB_BACKED_ENGINES and not options['force']:
+            self.stdout.write(self.style.WARNING(
+                f'SESSION_STRATEGY={settings.SESSION_STRATEGY} does not store sessions in the database; '
+                'nothing to do (use --force to clean leftovers)'
+            ))
+            return
+
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:options['chunk_size']]
+            )
+            if not keys:
+                break
+            with transaction.atomic():
+                Session.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired sessions deleted'))
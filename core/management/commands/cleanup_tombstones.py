@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Tombstones deleted per transaction')
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} tombstones older than {settings.SYNC_TOMBSTONE_RETENTION_DAYS} days deleted'
+        ))
@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core import compression
+from core.models import Patient
+
+# (etiqueta, Accept-Encoding, HTML_MINIFY)
+VARIANTS = [
+    ('raw', '', False),
+    ('minified', '', True),
+    ('gzip', 'gzip', True),
+    ('br', 'br, gzip', True),
+]
+
+
+class Command(BaseCommand):
+    help = 'Bytes over the wire and estimated transfer time of the heaviest pages, per encoding'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='Practitioner whose pages are measured')
+        parser.add_argument('--kbps', type=int, default=1000, help='Link bandwidth (default: slow clinic Wi-Fi)')
+        parser.add_argument('--rtt-ms', type=int, default=150)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        patient = Patient.objects.filter(user=user).order_by('-updated_at').first()
+        if patient is None:
+            raise CommandError('The user has no patients to measure')
+        pages = [
+            ('dashboard', reverse('dashboard')),
+            ('patient_list', reverse('patient_list')),
+            ('patient_detail', reverse('patient_detail', args=[patient.pk])),
+            ('ficha_clinica_create', reverse('ficha_clinica_create', args=[patient.pk])),
+        ]
+
+        if compression.brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed: the br column falls back to gzip'))
+
+        self.stdout.write(f"{'page':24}" + ''.join(f'{label:>18}' for label, _, _ in VARIANTS))
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, url in pages:
+                cells = []
+                for label, accept, minify in VARIANTS:
+                    with override_settings(HTML_MINIFY=minify):
+                        client = Client()
+                        client.force_login(user)
+                        response = client.get(url, HTTP_ACCEPT_ENCODING=accept)
+                    size = len(b''.join(response)) if response.streaming else len(response.content)
+                    cells.append(f'{size / 1024:>7.1f}KB {self.transfer_ms(size, options):>6.0f}ms')
+                self.stdout.write(f'{name:24}' + ''.join(f'{c:>18}' for c in cells))
+
+        self.stdout.write(
+            f"Estimated transfer time at {options['kbps']} kbps with {options['rtt_ms']} ms RTT "
+            '(TCP slow start, 14KB initial window)'
+        )
+
+    def transfer_ms(self, size, options):
+        """One RTT for the request plus slow-start round trips plus serialization time"""
+        window, sent, round_trips = 14 * 1024, 0, 1
+        while sent + window < size:
+            sent += window
+            window *= 2
+            round_trips += 1
+        return round_trips * options['rtt_ms'] + size * 8 / options['kbps']
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import exports
+
+
+class Command(BaseCommand):
+    help = "Write a practitioner's patients, appointments and fichas to gzip-compressed CSV/JSONL files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Practitioner (username)')
+        parser.add_argument('--resource', choices=[*exports.EXPORTS, 'all'], default='all')
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--output-dir', default='.', help='Directory for the .gz files')
+        parser.add_argument('--date-from', help='YYYY-MM-DD, inclusive')
+        parser.add_argument('--date-to', help='YYYY-MM-DD, inclusive')
+        parser.add_argument('--status', choices=exports.STATUSES, help='Only active or discharged patients')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user: {options['user']}")
+        try:
+            filters = exports.parse_filters(options['date_from'], options['date_to'], options['status'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        names = list(exports.EXPORTS) if options['resource'] == 'all' else [options['resource']]
+        fmt = options['format']
+        stamp = timezone.localdate().strftime('%Y-%m-%d')
+
+        for name in names:
+            path = output_dir / f'makimotion-{user.username}-{name}-{stamp}.{fmt}.gz'
+            rows = exports.write_gzip(path, name, fmt, user, filters)
+            self.stdout.write(f'{name}: {rows} rows -> {path} ({path.stat().st_size / 1024:.1f} KB)')
+
+        self.stdout.write(self.style.SUCCESS('Export completed'))
@@ -0,0 +1,49 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import imports
+
+
+class Command(BaseCommand):
+    help = 'Import patients and historical appointments from CSV files for a practitioner'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Practitioner (username)')
+        parser.add_argument('--patients', help='Patients CSV (full_name, birth_date, optional key, ...)')
+        parser.add_argument('--appointments', help='Appointments CSV (patient_key or patient_id, date_time, ...)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+        parser.add_argument('--chunk-size', type=int, default=imports.CHUNK_SIZE, help='Rows per bulk_create transaction')
+
+    def handle(self, *args, **options):
+        if not options['patients'] and not options['appointments']:
+            raise CommandError('Pass --patients and/or --appointments')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user: {options['user']}")
+
+        handles = {name: open(options[name], 'rb') for name in ('patients', 'appointments') if options[name]}
+        started = time.monotonic()
+        try:
+            result = imports.run(
+                user, handles.get('patients'), handles.get('appointments'),
+                dry_run=options['dry_run'], chunk_size=options['chunk_size'],
+            )
+        except imports.ImportFileError as exc:
+            raise CommandError(str(exc))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        elapsed = time.monotonic() - started
+
+        for error in result.errors:
+            self.stderr.write(f"{error['file']}:{error['line']} {error['column']}: {error['message']}")
+        rows = result.patients + result.appointments
+        verb = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(
+            f'{result.patients} patients and {result.appointments} appointments {verb}, '
+            f'{len(result.errors)} errors ({elapsed:.1f}s, {rows / max(elapsed, 1e-6):.0f} rows/s)'
+        )
+        self.stdout.write(self.style.SUCCESS('Import completed'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import backfills  # noqa: F401  (registra los backfills)
+from core.data_migrations import REGISTRY
+from core.models import BackfillCheckpoint
+
+
+class Command(BaseCommand):
+    help = 'Run a registered chunked backfill, resuming from its checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Backfill name (omit to list them)')
+        parser.add_argument('--chunk-size', type=int, help='Rows per committed batch')
+        parser.add_argument('--rows-per-second', type=float, help='Throttle to this many rows per second')
+        parser.add_argument('--reset', action='store_true', help='Discard the checkpoint and start over')
+
+    def handle(self, *args, **options):
+        if not options['name']:
+            checkpoints = {c.name: c for c in BackfillCheckpoint.objects.all()}
+            for name in sorted(REGISTRY):
+                checkpoint = checkpoints.get(name)
+                state = str(checkpoint) if checkpoint else 'not started'
+                self.stdout.write(f'{name}: {state}')
+            return
+
+        try:
+            backfill_class = REGISTRY[options['name']]
+        except KeyError:
+            raise CommandError(f"Unknown backfill '{options['name']}'. Available: {', '.join(sorted(REGISTRY))}")
+
+        backfill = backfill_class(
+            chunk_size=options['chunk_size'],
+            rows_per_second=options['rows_per_second'],
+            report=self.stdout.write,
+        )
+        backfill.run(reset=options['reset'])
@@ -0,0 +1,63 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import jobs
+
+# Cada cuántos segundos revisar trabajos abandonados y purgar los antiguos
+MAINTENANCE_INTERVAL_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = 'Process background jobs from the database queue (core.jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 = no limit)')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f'Worker {worker} started')
+
+        processed = 0
+        last_maintenance = 0.0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL_SECONDS:
+                stale = jobs.requeue_stale()
+                pruned = jobs.prune()
+                if stale or pruned:
+                    self.stdout.write(f'{stale} stale jobs requeued, {pruned} old jobs pruned')
+                last_maintenance = time.monotonic()
+
+            job = jobs.claim(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            started = time.monotonic()
+            jobs.execute(job)
+            job.refresh_from_db(fields=['status'])
+            self.stdout.write(
+                f'Job {job.pk} {job.name} (attempt {job.attempts}): {job.status} '
+                f'in {time.monotonic() - started:.1f}s'
+            )
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped after {processed} jobs'))
+
+    def stop(self, signum, frame):
+        # Terminar el trabajo en curso y salir
+        self.stopping = True
@@ -0,0 +1,49 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import reminders
+
+
+class Command(BaseCommand):
+    help = 'Email reminders for appointments starting within the reminder window (core.reminders)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help='Window in hours (default: REMINDER_WINDOW_HOURS)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages per batch (default: REMINDER_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the reminders that are due')
+        parser.add_argument('--every', type=float, default=0, help='Repeat every N seconds until stopped (0 = run once, e.g. from cron)')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if options['every']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        while True:
+            close_old_connections()
+            started = time.monotonic()
+            result = reminders.dispatch(
+                window_hours=options['hours'], batch_size=options['batch_size'], dry_run=options['dry_run'],
+            )
+            if options['dry_run']:
+                self.stdout.write(f"{result['due']} reminders due")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{result['sent']} reminders sent, {result['skipped']} taken by another run "
+                    f"in {time.monotonic() - started:.1f}s"
+                ))
+            if not options['every'] or self.stopping:
+                break
+            self.sleep(options['every'])
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(1.0, deadline - time.monotonic()))
+
+    def stop(self, signum, frame):
+        # Terminar el envío en curso y salir
+        self.stopping = True
@@ -0,0 +1,131 @@
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import urls as core_urls
+from core.models import Appointment, FichaClinica, Patient
+
+# Estrategias que guardan la sesión en SESSION_CACHE_ALIAS
+CACHE_STRATEGIES = ('cached_db', 'cache')
+
+# Segmento de la ruta que precede a <int:pk> -> objeto cuyo pk se usa
+PK_OWNERS = {
+    'patients': 'patient',
+    'appointments': 'appointment',
+    'fichas-clinicas': 'ficha',
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request query counts of every core GET view across session strategies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default='db', choices=list(settings.SESSION_ENGINES))
+        parser.add_argument('--strategies', nargs='+', choices=list(settings.SESSION_ENGINES),
+                            help='Default: signed_cookies, plus cached_db when the session cache is not a database table')
+
+    def handle(self, *args, **options):
+        requested = options['strategies'] or self.default_strategies()
+        strategies = [options['baseline']] + [s for s in requested if s != options['baseline']]
+        backend = settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND']
+        if backend not in settings.SHARED_CACHE_BACKENDS and any(s in CACHE_STRATEGIES for s in strategies):
+            raise CommandError(
+                f'SESSION_CACHE_ALIAS={settings.SESSION_CACHE_ALIAS} ({backend}) is not shared by all processes; '
+                'production refuses cached sessions on it'
+            )
+        results = {}
+        try:
+            with transaction.atomic():
+                objects = self.create_fixtures()
+                targets = self.targets(objects)
+                for strategy in strategies:
+                    results[strategy] = self.measure(strategy, targets)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.report(options['baseline'], strategies, results)
+
+    def default_strategies(self):
+        # Con la caché en una tabla de la BD, cached_db cambia una consulta por otra
+        if isinstance(caches[settings.SESSION_CACHE_ALIAS], DatabaseCache):
+            return ['signed_cookies']
+        return ['cached_db', 'signed_cookies']
+
+    def create_fixtures(self):
+        user = User.objects.create_user('session-benchmark', password='session-benchmark')
+        patient = Patient.objects.create(user=user, full_name='Paciente Benchmark', birth_date=date(1990, 1, 1))
+        appointment = Appointment.objects.create(
+            patient=patient, date_time=timezone.now(), session_description='Benchmark'
+        )
+        ficha = FichaClinica.objects.create(patient=patient)
+        return {'user': user, 'patient': patient, 'appointment': appointment, 'ficha': ficha}
+
+    def targets(self, objects):
+        """(url name, url) for every core view reachable with the fixture objects"""
+        targets = []
+        for pattern in core_urls.urlpatterns:
+            if not pattern.name or getattr(pattern.callback, '__module__', None) != 'core.views':
+                continue
+            segments = str(pattern.pattern).split('/')
+            kwargs = {}
+            for index, segment in enumerate(segments):
+                if segment in ('<int:patient_pk>', '<int:patient_id>'):
+                    kwargs[segment[5:-1]] = objects['patient'].pk
+                elif segment == '<int:pk>':
+                    owner = PK_OWNERS.get(segments[index - 1]) if index else None
+                    if owner is None:
+                        break
+                    kwargs['pk'] = objects[owner].pk
+                elif '<' in segment:
+                    # Parámetros que los objetos de prueba no completan (tipo de evento, token del feed)
+                    break
+            else:
+                targets.append((pattern.name, reverse(pattern.name, kwargs=kwargs)))
+        return targets
+
+    def measure(self, strategy, targets):
+        counts = {}
+        # Las sesiones cacheadas usan SESSION_CACHE_ALIAS tal como está configurada: con la caché
+        # en la BD, sus consultas también se cuentan
+        with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[strategy], ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            client.login(username='session-benchmark', password='session-benchmark')
+            for name, url in targets:
+                client.get(url)  # calienta la caché de sesión / plantillas
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                counts[name] = (response.status_code, len(queries))
+        return counts
+
+    def report(self, baseline, strategies, results):
+        header = f"{'view':32}" + ''.join(f'{s:>16}' for s in strategies)
+        self.stdout.write(header)
+        failures = []
+        for name in results[baseline]:
+            status, base_count = results[baseline][name]
+            cells = []
+            for strategy in strategies:
+                count = results[strategy][name][1]
+                cells.append(f'{count:>16}' if strategy == baseline else f'{count:>10} ({count - base_count:+d})')
+                # Solo las vistas login_required que responden 200 deben mejorar
+                if strategy != baseline and status == 200 and base_count - count < 1:
+                    failures.append(f'{name} [{strategy}]')
+            self.stdout.write(f'{name:32}' + ''.join(f'{c:>16}' for c in cells) + ('' if status == 200 else f'  (HTTP {status})'))
+
+        if failures:
+            raise CommandError(f'No query saved for: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Every view saves at least one query per request'))
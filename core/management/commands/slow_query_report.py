@@ -0,0 +1,75 @@
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import fingerprint
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the slow query log by normalized SQL fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(settings.SLOW_QUERY_LOG_FILE),
+                            help='Slow query log (rotated files .1, .2, ... are included)')
+        parser.add_argument('--top', type=int, default=10, help='Number of fingerprints to show')
+        parser.add_argument('--sort', choices=['total', 'count', 'max', 'avg'], default='total',
+                            help='Ranking criterion')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        files = [f for f in [path] + sorted(glob.glob(f'{path}.*')) if os.path.isfile(f)]
+        if not files:
+            self.stdout.write(self.style.WARNING(f'No slow query log found at {path}'))
+            return
+
+        stats = {}
+        for filename in files:
+            with open(filename, encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = record.get('fingerprint') or fingerprint(record.get('sql', ''))
+                    duration = float(record.get('duration_ms', 0))
+                    entry = stats.setdefault(key, {
+                        'count': 0, 'total': 0.0, 'max': 0.0,
+                        'views': set(), 'locations': set(), 'sample': record,
+                    })
+                    entry['count'] += 1
+                    entry['total'] += duration
+                    if duration > entry['max']:
+                        entry['max'] = duration
+                        entry['sample'] = record
+                    if record.get('view'):
+                        entry['views'].add(record['view'])
+                    if record.get('location'):
+                        entry['locations'].add(record['location'])
+
+        for entry in stats.values():
+            entry['avg'] = entry['total'] / entry['count']
+
+        ranked = sorted(stats.items(), key=lambda item: item[1][options['sort']], reverse=True)
+        for position, (key, entry) in enumerate(ranked[:options['top']], start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"#{position}  total={entry['total']:.1f}ms  count={entry['count']}  "
+                f"avg={entry['avg']:.1f}ms  max={entry['max']:.1f}ms"
+            ))
+            self.stdout.write(f'  {key}')
+            if entry['views']:
+                self.stdout.write(f"  views: {', '.join(sorted(entry['views']))}")
+            if entry['locations']:
+                self.stdout.write(f"  at: {', '.join(sorted(entry['locations'])[:3])}")
+            explain = entry['sample'].get('explain')
+            if explain:
+                self.stdout.write('  plan (slowest sample):')
+                for row in explain:
+                    self.stdout.write(f'    {row}')
+            self.stdout.write('')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(e["count"] for e in stats.values())} slow queries, {len(stats)} fingerprints'
+        ))
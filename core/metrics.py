@@ -0,0 +1,157 @@
+"""
+Métricas en formato Prometheus.
+
+Con gunicorn cada worker es un proceso distinto, así que los contadores se
+escriben en archivos compartidos (modo multiproceso de ``prometheus_client``)
+cuando existe ``PROMETHEUS_MULTIPROC_DIR``; ``gunicorn.conf.py`` lo configura.
+Sin esa variable se usa el registro en memoria del proceso (runserver).
+"""
+import os
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connection
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_LATENCY = Histogram(
+    'makimotion_request_latency_seconds',
+    'Request latency by URL name',
+    ['url_name', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_ERRORS = Counter(
+    'makimotion_request_errors_total',
+    'Responses with status >= 500 or unhandled exceptions, by URL name',
+    ['url_name', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'makimotion_request_db_queries',
+    'Database queries executed per request, by URL name',
+    ['url_name'],
+    buckets=QUERY_BUCKETS,
+)
+DB_CONNECTION_OPEN = Gauge(
+    'makimotion_db_connection_open',
+    'Whether the worker holds an open database connection',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+DB_POOL = Gauge(
+    'makimotion_db_pool',
+    'Connection pool statistics (psycopg pool, PostgreSQL only)',
+    ['alias', 'stat'],
+    multiprocess_mode='livesum',
+)
+CACHE_REQUESTS = Counter(
+    'makimotion_cache_requests_total',
+    'Cache lookups by result',
+    ['cache', 'result'],
+)
+
+POOL_STATS = ('pool_size', 'pool_available', 'requests_waiting')
+
+
+def record_cache_lookup(cache_name, hit, count=1):
+    """Count cache hits and misses; the ratio is computed in PromQL"""
+    CACHE_REQUESTS.labels(cache=cache_name, result='hit' if hit else 'miss').inc(count)
+
+
+def record_connection_state():
+    """Update the connection/pool gauges of this worker"""
+    alias = connection.alias
+    DB_CONNECTION_OPEN.labels(alias=alias).set(1 if connection.connection is not None else 0)
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats = pool.get_stats()
+        for stat in POOL_STATS:
+            DB_POOL.labels(alias=alias, stat=stat).set(stats.get(stat, 0))
+
+
+def render_latest():
+    """Return (payload, content_type) aggregating every worker when running multiprocess"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class _QueryCounter:
+    """Execute wrapper that only counts queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Record latency, errors and query count for every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        status = '500'
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            match = getattr(request, 'resolver_match', None)
+            url_name = (match.view_name if match else None) or 'unresolved'
+            REQUEST_LATENCY.labels(url_name=url_name, method=request.method).observe(
+                time.perf_counter() - start
+            )
+            REQUEST_DB_QUERIES.labels(url_name=url_name).observe(counter.count)
+            if status.startswith('5'):
+                REQUEST_ERRORS.labels(url_name=url_name, status=status).inc()
+            record_connection_state()
+
+
+class InstrumentedCacheMixin:
+    """
+    Count hits and misses of get() for any cache backend.
+
+    get_many() is not wrapped: the base implementation already goes through
+    get(), and DatabaseCache.get() delegates to get_many(), so wrapping both
+    would count lookups twice.
+    """
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version=version)
+        hit = value is not self._missing
+        record_cache_lookup(self._metrics_name, hit)
+        return value if hit else default
+
+    @property
+    def _metrics_name(self):
+        return type(self).__name__.replace('Instrumented', '')
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedDatabaseCache(InstrumentedCacheMixin, DatabaseCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
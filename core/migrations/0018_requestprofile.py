@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_alter_fichaclinica_options_fichaclinica_fecha'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view_name', models.CharField(blank=True, max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('profiler', models.CharField(help_text='cprofile o pyinstrument', max_length=20)),
+                ('report', models.TextField(help_text='Árbol de llamadas / estadísticas del profiler')),
+                ('queries', models.JSONField(default=list, help_text='SQL ejecutado con su duración')),
+                ('user', models.ForeignKey(blank=True, help_text='Usuario que pidió el perfil', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Perfil de Request',
+                'verbose_name_plural': 'Perfiles de Request',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
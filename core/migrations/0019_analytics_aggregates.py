@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_requestprofile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientOutcome',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='outcome', serialize=False, to='core.patient')),
+                ('is_pregnant', models.BooleanField(default=False)),
+                ('is_postpartum', models.BooleanField(default=False)),
+                ('alta', models.BooleanField(default=False)),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('first_session', models.DateTimeField(blank=True, null=True)),
+                ('last_session', models.DateTimeField(blank=True, null=True)),
+                ('perfect_series', models.JSONField(default=dict, help_text='Puntajes P/E/R/F de las primeras sesiones, en orden')),
+                ('latest_symptoms', models.JSONField(default=dict, help_text='Síntomas de la ficha clínica más reciente')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_outcomes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resultado de Paciente',
+                'verbose_name_plural': 'Resultados de Pacientes',
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyPracticeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(help_text='Lunes de la semana')),
+                ('cohort', models.CharField(choices=[('all', 'Todos'), ('pregnant', 'Embarazadas'), ('postpartum', 'Postparto'), ('alta', 'Dados de alta')], max_length=20)),
+                ('appointment_count', models.PositiveIntegerField(default=0)),
+                ('patient_count', models.PositiveIntegerField(default=0, help_text='Pacientes distintos con citas en la semana')),
+                ('perfect_p_sum', models.PositiveIntegerField(default=0)),
+                ('perfect_p_count', models.PositiveIntegerField(default=0)),
+                ('perfect_e_sum', models.PositiveIntegerField(default=0)),
+                ('perfect_e_count', models.PositiveIntegerField(default=0)),
+                ('perfect_r_sum', models.PositiveIntegerField(default=0)),
+                ('perfect_r_count', models.PositiveIntegerField(default=0)),
+                ('perfect_f_sum', models.PositiveIntegerField(default=0)),
+                ('perfect_f_count', models.PositiveIntegerField(default=0)),
+                ('ficha_count', models.PositiveIntegerField(default=0)),
+                ('symptom_counts', models.JSONField(default=dict, help_text='Fichas de la semana con cada síntoma')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Estadística Semanal',
+                'verbose_name_plural': 'Estadísticas Semanales',
+                'ordering': ['-week', 'cohort'],
+                'unique_together': {('user', 'week', 'cohort')},
+            },
+        ),
+    ]
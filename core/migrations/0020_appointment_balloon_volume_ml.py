@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_analytics_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='balloon_first_desire_volume_ml',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=1, editable=False, help_text='Volumen primer deseo (ml)', max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='balloon_max_tolerable_capacity_ml',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=1, editable=False, help_text='Capacidad máxima tolerable (ml)', max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='balloon_normal_desire_volume_ml',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=1, editable=False, help_text='Volumen deseo normal constante (ml)', max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='balloon_rectal_sensation_ml',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=1, editable=False, help_text='Sensación rectal consciente (ml)', max_digits=6, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_appointment_balloon_volume_ml'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('running', 'En curso'), ('completed', 'Completado')], default='running', max_length=20)),
+                ('last_pk', models.BigIntegerField(default=0, help_text='Último pk procesado y confirmado')),
+                ('rows_processed', models.PositiveBigIntegerField(default=0)),
+                ('rows_changed', models.PositiveBigIntegerField(default=0)),
+                ('rows_total', models.PositiveBigIntegerField(default=0, help_text='Estimación al comenzar')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Backfill',
+                'verbose_name_plural': 'Checkpoints de Backfill',
+                'ordering': ['name'],
+            },
+        ),
+    ]
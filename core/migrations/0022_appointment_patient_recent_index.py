@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_backfillcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-date_time'], name='appointment_patient_recent'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_appointment_patient_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fichaclinica',
+            index=models.Index(fields=['patient', '-fecha'], name='ficha_patient_recent'),
+        ),
+    ]
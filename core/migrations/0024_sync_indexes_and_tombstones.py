@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_ficha_patient_recent_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(help_text='patients, appointments o fichas', max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Borrado Sincronizado',
+                'verbose_name_plural': 'Borrados Sincronizados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['updated_at', 'id'], name='appointment_sync'),
+        ),
+        migrations.AddIndex(
+            model_name='fichaclinica',
+            index=models.Index(fields=['updated_at', 'id'], name='ficha_sync'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='patient_sync'),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='user',
+            field=models.ForeignKey(help_text='Profesional dueño del registro borrado', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_sync'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date_time', 'patient'], name='appointment_calendar'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_appointment_calendar_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='email',
+            field=models.EmailField(blank=True, default='', help_text='Correo electrónico (recordatorios de citas)', max_length=254),
+        ),
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_time', models.DateTimeField(help_text='Fecha y hora de la cita recordada (si se reprograma, se recuerda de nuevo)')),
+                ('run_id', models.CharField(help_text='Ejecución de send_reminders que lo tomó', max_length=32)),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.appointment')),
+            ],
+            options={
+                'verbose_name': 'Recordatorio de Cita',
+                'verbose_name_plural': 'Recordatorios de Citas',
+                'indexes': [models.Index(fields=['run_id'], name='reminder_run')],
+                'constraints': [models.UniqueConstraint(fields=('appointment', 'date_time'), name='reminder_once_per_time')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_appointment_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text="Ruta dentro del storage 'jobs'", max_length=255, unique=True)),
+                ('content', models.BinaryField()),
+                ('size', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archivo de Trabajo',
+                'verbose_name_plural': 'Archivos de Trabajos',
+            },
+        ),
+    ]
@@ -215,8 +215,38 @@ class FichaClinica(models.Model):
     def __str__(self):
         return f"Ficha Clínica - {self.patient.full_name} - {self.fecha.strftime('%d/%m/%Y')}"
     
+    # Campos que no se copian al crear una ficha a partir de la anterior
+    COPY_EXCLUDED_FIELDS = ('id', 'patient', 'fecha', 'created_at', 'updated_at')
+    
+    @classmethod
+    def copy_latest(cls, patient, fecha=None):
+        """
+        Create a ficha for the patient with the values of their latest one.
+
+        One values() query plus one INSERT; returns (new ficha, source fecha)
+        or (None, None) if the patient has no fichas.
+        """
+        fields = [f.attname for f in cls._meta.concrete_fields if f.name not in cls.COPY_EXCLUDED_FIELDS]
+        row = (
+            cls.objects.filter(patient=patient)
+            .order_by('-fecha', '-created_at')
+            .values('fecha', *fields)
+            .first()
+        )
+        if row is None:
+            return None, None
+        source_fecha = row.pop('fecha')
+        ficha = cls.objects.create(patient=patient, fecha=fecha or timezone.localdate(), **row)
+        return ficha, source_fecha
+    
     class Meta:
         ordering = ['-fecha', '-created_at']
+        indexes = [
+            # Fichas de un paciente por fecha (línea de tiempo, última ficha)
+            models.Index(fields=['patient', '-fecha'], name='ficha_patient_recent'),
+            # Sincronización incremental por (updated_at, id) (core.sync)
+            models.Index(fields=['updated_at', 'id'], name='ficha_sync'),
+        ]
         verbose_name = "Ficha Clínica"
         verbose_name_plural = "Fichas Clínicas"
 
@@ -230,6 +260,7 @@ class Patient(models.Model):
     birth_date = models.DateField(help_text="Fecha de nacimiento del paciente")
     profession = models.CharField(max_length=100, default="", blank=True, help_text="Profesión")
     phone = models.CharField(max_length=20, default="", blank=True, help_text="Teléfono")
+    email = models.EmailField(default="", blank=True, help_text="Correo electrónico (recordatorios de citas)")
     address = models.TextField(default="", blank=True, help_text="Dirección")
     medications = models.TextField(blank=True, help_text="Medicamentos actuales")
     musculoskeletal_history = models.TextField(blank=True, help_text="Antecedentes músculo esquelético")
@@ -418,6 +449,10 @@ class Patient(models.Model):
     
     class Meta:
         ordering = ['full_name']
+        indexes = [
+            # Sincronización incremental por (updated_at, id) (core.sync)
+            models.Index(fields=['user', 'updated_at', 'id'], name='patient_sync'),
+        ]
         verbose_name = "Paciente"
         verbose_name_plural = "Pacientes"
 
@@ -453,12 +488,44 @@ class Appointment(models.Model):
     balloon_rectoanal_reflex = models.CharField(max_length=10, choices=YES_NO_CHOICES, blank=True, help_text="Reflejo rectoanal estriado")
     balloon_expulsion = models.CharField(max_length=10, choices=YES_NO_CHOICES, blank=True, help_text="Expulsión del balón")
     
+    # Volúmenes del Test del Balón en ml, derivados del texto en save() (ver core.volumes)
+    balloon_rectal_sensation_ml = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, editable=False, db_index=True, help_text="Sensación rectal consciente (ml)")
+    balloon_first_desire_volume_ml = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, editable=False, db_index=True, help_text="Volumen primer deseo (ml)")
+    balloon_normal_desire_volume_ml = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, editable=False, db_index=True, help_text="Volumen deseo normal constante (ml)")
+    balloon_max_tolerable_capacity_ml = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, editable=False, db_index=True, help_text="Capacidad máxima tolerable (ml)")
+    
+    # Campo de texto -> columna numérica derivada
+    BALLOON_VOLUME_FIELDS = {
+        'balloon_rectal_sensation': 'balloon_rectal_sensation_ml',
+        'balloon_first_desire_volume': 'balloon_first_desire_volume_ml',
+        'balloon_normal_desire_volume': 'balloon_normal_desire_volume_ml',
+        'balloon_max_tolerable_capacity': 'balloon_max_tolerable_capacity_ml',
+    }
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.patient.full_name} - {self.date_time.strftime('%d/%m/%Y %H:%M')}"
     
+    def parse_balloon_volumes(self):
+        """Fill the numeric balloon columns from their free-text fields"""
+        from .volumes import parse_volume_ml
+        for text_field, numeric_field in self.BALLOON_VOLUME_FIELDS.items():
+            setattr(self, numeric_field, parse_volume_ml(getattr(self, text_field)))
+    
+    def save(self, *args, **kwargs):
+        self.parse_balloon_volumes()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Si se guarda un texto del balón, guardar también su columna numérica
+            update_fields = set(update_fields)
+            update_fields |= {
+                numeric for text, numeric in self.BALLOON_VOLUME_FIELDS.items() if text in update_fields
+            }
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
     def get_perfect_score_display(self):
         """Return formatted PERFECT test results"""
         return {
@@ -473,5 +540,245 @@ class Appointment(models.Model):
     
     class Meta:
         ordering = ['-date_time']
+        indexes = [
+            # Últimas citas de un paciente (tarjeta del dashboard, historial)
+            models.Index(fields=['patient', '-date_time'], name='appointment_patient_recent'),
+            # Sincronización incremental por (updated_at, id) (core.sync)
+            models.Index(fields=['updated_at', 'id'], name='appointment_sync'),
+            # Rangos de fecha de todas las citas del profesional (calendario, feed iCal, dashboard).
+            # Un índice no puede incluir patient__user: se recorre el rango y el paciente se une por pk
+            models.Index(fields=['date_time', 'patient'], name='appointment_calendar'),
+        ]
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
+
+
+class RequestProfile(models.Model):
+    """Perfil de una request capturado a pedido por un usuario staff"""
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, help_text="Usuario que pidió el perfil")
+    created_at = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    profiler = models.CharField(max_length=20, help_text="cprofile o pyinstrument")
+    report = models.TextField(help_text="Árbol de llamadas / estadísticas del profiler")
+    queries = models.JSONField(default=list, help_text="SQL ejecutado con su duración")
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+    
+    @classmethod
+    def prune(cls, keep):
+        """Delete everything but the most recent `keep` profiles"""
+        cutoff = list(cls.objects.order_by('-pk').values_list('pk', flat=True)[keep:keep + 1])
+        if cutoff:
+            cls.objects.filter(pk__lte=cutoff[0]).delete()
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Perfil de Request"
+        verbose_name_plural = "Perfiles de Request"
+
+
+class WeeklyPracticeStats(models.Model):
+    """Agregado semanal por profesional y cohorte (mantenido por core.analytics)"""
+    COHORT_CHOICES = [
+        ('all', 'Todos'),
+        ('pregnant', 'Embarazadas'),
+        ('postpartum', 'Postparto'),
+        ('alta', 'Dados de alta'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='weekly_stats')
+    week = models.DateField(help_text="Lunes de la semana")
+    cohort = models.CharField(max_length=20, choices=COHORT_CHOICES)
+    
+    appointment_count = models.PositiveIntegerField(default=0)
+    patient_count = models.PositiveIntegerField(default=0, help_text="Pacientes distintos con citas en la semana")
+    perfect_p_sum = models.PositiveIntegerField(default=0)
+    perfect_p_count = models.PositiveIntegerField(default=0)
+    perfect_e_sum = models.PositiveIntegerField(default=0)
+    perfect_e_count = models.PositiveIntegerField(default=0)
+    perfect_r_sum = models.PositiveIntegerField(default=0)
+    perfect_r_count = models.PositiveIntegerField(default=0)
+    perfect_f_sum = models.PositiveIntegerField(default=0)
+    perfect_f_count = models.PositiveIntegerField(default=0)
+    ficha_count = models.PositiveIntegerField(default=0)
+    symptom_counts = models.JSONField(default=dict, help_text="Fichas de la semana con cada síntoma")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user} - {self.week} - {self.cohort}"
+    
+    class Meta:
+        ordering = ['-week', 'cohort']
+        unique_together = [('user', 'week', 'cohort')]
+        verbose_name = "Estadística Semanal"
+        verbose_name_plural = "Estadísticas Semanales"
+
+
+class PatientOutcome(models.Model):
+    """Resumen de evolución por paciente (mantenido por core.analytics)"""
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE, primary_key=True, related_name='outcome')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='patient_outcomes')
+    
+    # Copia de las banderas de cohorte del paciente
+    is_pregnant = models.BooleanField(default=False)
+    is_postpartum = models.BooleanField(default=False)
+    alta = models.BooleanField(default=False)
+    
+    session_count = models.PositiveIntegerField(default=0)
+    first_session = models.DateTimeField(null=True, blank=True)
+    last_session = models.DateTimeField(null=True, blank=True)
+    perfect_series = models.JSONField(default=dict, help_text="Puntajes P/E/R/F de las primeras sesiones, en orden")
+    latest_symptoms = models.JSONField(default=dict, help_text="Síntomas de la ficha clínica más reciente")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Resultados de {self.patient_id}"
+    
+    class Meta:
+        verbose_name = "Resultado de Paciente"
+        verbose_name_plural = "Resultados de Pacientes"
+
+
+class BackfillCheckpoint(models.Model):
+    """Progreso de un backfill por rangos de pk (ver core.data_migrations)"""
+    STATUS_CHOICES = [
+        ('running', 'En curso'),
+        ('completed', 'Completado'),
+    ]
+    
+    name = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    last_pk = models.BigIntegerField(default=0, help_text="Último pk procesado y confirmado")
+    rows_processed = models.PositiveBigIntegerField(default=0)
+    rows_changed = models.PositiveBigIntegerField(default=0)
+    rows_total = models.PositiveBigIntegerField(default=0, help_text="Estimación al comenzar")
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.status}, pk > {self.last_pk})"
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Checkpoint de Backfill"
+        verbose_name_plural = "Checkpoints de Backfill"
+
+
+class SyncTombstone(models.Model):
+    """Registro de un borrado para la sincronización incremental (ver core.sync)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', help_text="Profesional dueño del registro borrado")
+    resource = models.CharField(max_length=20, help_text="patients, appointments o fichas")
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.resource} {self.object_id} borrado {self.deleted_at:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_sync'),
+        ]
+        verbose_name = "Borrado Sincronizado"
+        verbose_name_plural = "Borrados Sincronizados"
+
+
+class StoredFile(models.Model):
+    """Archivo de los trabajos guardado en la BD, visible para web y worker (ver core.files)"""
+    name = models.CharField(max_length=255, unique=True, help_text="Ruta dentro del storage 'jobs'")
+    content = models.BinaryField()
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.size} bytes)"
+    
+    class Meta:
+        verbose_name = "Archivo de Trabajo"
+        verbose_name_plural = "Archivos de Trabajos"
+
+
+class Job(models.Model):
+    """Trabajo en segundo plano ejecutado por ``run_worker`` (ver core.jobs)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'En cola'),
+        (RUNNING, 'En curso'),
+        (SUCCEEDED, 'Completado'),
+        (FAILED, 'Fallido'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs', help_text="Profesional que lo pidió")
+    name = models.CharField(max_length=50, help_text="Tarea registrada en core.tasks")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0, help_text="Mayor número, antes se ejecuta")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text="No se ejecuta antes (reintentos con espera)")
+    locked_by = models.CharField(max_length=100, blank=True, help_text="Worker que lo tomó")
+    locked_at = models.DateTimeField(null=True, blank=True, help_text="Último latido del worker")
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+    
+    @property
+    def progress_percent(self):
+        if not self.progress_total:
+            return None
+        return min(100, round(100 * self.progress_done / self.progress_total))
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Siguiente trabajo a tomar: WHERE status = 'queued' AND run_after <= now ORDER BY priority DESC
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_claim'),
+            # Página de estado del profesional
+            models.Index(fields=['user', '-created_at'], name='job_user_recent'),
+        ]
+        verbose_name = "Trabajo"
+        verbose_name_plural = "Trabajos"
+
+
+class AppointmentReminder(models.Model):
+    """Recordatorio enviado (o en envío) de una cita; evita repetirlo (ver core.reminders)"""
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    date_time = models.DateTimeField(help_text="Fecha y hora de la cita recordada (si se reprograma, se recuerda de nuevo)")
+    run_id = models.CharField(max_length=32, help_text="Ejecución de send_reminders que lo tomó")
+    sent_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Recordatorio cita {self.appointment_id} ({self.date_time:%Y-%m-%d %H:%M})"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'date_time'], name='reminder_once_per_time'),
+        ]
+        indexes = [
+            models.Index(fields=['run_id'], name='reminder_run'),
+        ]
+        verbose_name = "Recordatorio de Cita"
+        verbose_name_plural = "Recordatorios de Citas"
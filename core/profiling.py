@@ -0,0 +1,149 @@
+"""
+Perfilado opcional de requests individuales.
+
+Un usuario staff agrega ``?_profile=<token>`` (o el header ``X-Profile``) a
+cualquier URL servida por ``core.views``. El token es un valor firmado con
+``django.core.signing`` para ese usuario. La vista se ejecuta bajo
+pyinstrument si está instalado (muestreo) o cProfile (determinista) y el
+resultado, junto con la lista de SQL, se guarda en ``RequestProfile``.
+
+Si la request no trae el parámetro ni el header, el middleware no hace nada más
+que esa comprobación.
+"""
+import cProfile
+import io
+import pstats
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:  # pyinstrument es opcional
+    SamplingProfiler = None
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+SIGNING_SALT = 'core.profiling'
+PROFILED_MODULE = 'core.views'
+
+
+def make_token(user):
+    """Signed token that enables profiling for this user's requests"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(str(user.pk))
+
+
+def token_is_valid(token, user):
+    """Check the token signature, age and owner"""
+    if not user.is_authenticated or not user.is_staff:
+        return False
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == str(user.pk)
+
+
+class _QueryRecorder:
+    """Execute wrapper that keeps the SQL and timing of every query"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'many': many,
+            })
+
+
+def _path_without_token(request):
+    query = request.GET.copy()
+    query.pop(PROFILE_PARAM, None)
+    return f"{request.path}?{query.urlencode()}" if query else request.path
+
+
+def _run_cprofile(func):
+    profiler = cProfile.Profile()
+    response = profiler.runcall(func)
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(settings.PROFILING_MAX_LINES)
+    stats.print_callees(settings.PROFILING_MAX_LINES // 4)
+    return response, 'cprofile', stream.getvalue()
+
+
+def _run_pyinstrument(func):
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        response = func()
+    finally:
+        profiler.stop()
+    return response, 'pyinstrument', profiler.output_text(unicode=True, color=False)
+
+
+class RequestProfilerMiddleware:
+    """
+    Profile a single request on demand.
+
+    Must be the last entry in MIDDLEWARE: process_view returns the response
+    itself, so middleware listed after it would skip their own process_view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        token = request.GET.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+        if not token:
+            return None
+        if getattr(view_func, '__module__', None) != PROFILED_MODULE:
+            return None
+        if not token_is_valid(token, request.user):
+            return None
+
+        from .models import RequestProfile
+
+        recorder = _QueryRecorder()
+        run = _run_pyinstrument if SamplingProfiler is not None else _run_cprofile
+
+        def call_view():
+            with connection.execute_wrapper(recorder):
+                response = view_func(request, *view_args, **view_kwargs)
+                # Las TemplateResponse se renderizan aquí para incluir el template en el perfil
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+                return response
+
+        start = time.perf_counter()
+        response, profiler_name, report = run(call_view)
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        profile = RequestProfile.objects.create(
+            user=request.user,
+            method=request.method,
+            path=_path_without_token(request)[:500],
+            view_name=request.resolver_match.view_name if request.resolver_match else '',
+            status_code=response.status_code,
+            duration_ms=round(duration_ms, 2),
+            query_count=len(recorder.queries),
+            profiler=profiler_name,
+            report=report,
+            queries=recorder.queries,
+        )
+        RequestProfile.prune(settings.PROFILING_MAX_STORED)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
@@ -0,0 +1,146 @@
+"""
+Evolución del Test PERFECT por paciente.
+
+La serie completa (valores, promedio móvil, delta contra la sesión anterior y
+contra la primera sesión) se calcula en una sola consulta con funciones de
+ventana. El delta del resumen compara el primer y el último puntaje
+registrado, saltando las sesiones sin ese puntaje. El resultado se guarda en la caché compartida (``CACHE_ALIAS``: la
+ven todos los workers, así que el borrado al invalidar llega a todos) y se
+invalida desde ``core.signals`` cada vez que se crea, edita o elimina una cita.
+"""
+from django.core.cache import caches
+from django.db.models import Avg, Case, F, FloatField, IntegerField, Value, When, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import FirstValue, Lag
+
+from .models import Appointment
+
+ROLLING_WINDOW = 3
+CACHE_ALIAS = 'shared'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Campos numéricos (0-10 / conteos) y campos sí/no, con su etiqueta corta
+NUMERIC_SCORES = {
+    'P': 'perfect_p_power',
+    'E': 'perfect_e_endurance',
+    'R': 'perfect_r_repetitions',
+    'F': 'perfect_f_fast',
+}
+YES_NO_SCORES = {
+    'E2': 'perfect_e_every',
+    'C': 'perfect_c_cocontraction',
+    'T': 'perfect_t_timing',
+}
+
+
+def cache_key(patient_id):
+    return f'perfect_series:{patient_id}'
+
+
+def invalidate(patient_id):
+    caches[CACHE_ALIAS].delete(cache_key(patient_id))
+
+
+def _yes_no_as_int(field):
+    """'si' -> 1, 'no' -> 0, '' -> NULL so averages ignore unanswered sessions"""
+    return Case(
+        When(**{field: 'si'}, then=Value(1)),
+        When(**{field: 'no'}, then=Value(0)),
+        default=None,
+        output_field=IntegerField(),
+    )
+
+
+def _first_scored(field, order, frame):
+    """First non-NULL value of `field` in `order`: NULL rows are sorted after the scored ones"""
+    unscored = Case(When(**{f'{field}__isnull': True}, then=Value(1)), default=Value(0), output_field=IntegerField())
+    return Window(FirstValue(field), order_by=[unscored.asc(), *order], frame=frame)
+
+
+def _series_queryset(patient_id):
+    order = [F('date_time').asc(), F('pk').asc()]
+    reverse = [F('date_time').desc(), F('pk').desc()]
+    rolling = RowRange(start=-(ROLLING_WINDOW - 1), end=0)
+    whole = RowRange(start=None, end=None)
+
+    annotations = {}
+    for label, field in YES_NO_SCORES.items():
+        annotations[f'{label}_value'] = _yes_no_as_int(field)
+    for label in YES_NO_SCORES:
+        annotations[f'{label}_rate'] = Window(
+            Avg(f'{label}_value', output_field=FloatField()), order_by=order, frame=rolling
+        )
+    for label, field in NUMERIC_SCORES.items():
+        annotations[f'{label}_avg'] = Window(
+            Avg(field, output_field=FloatField()), order_by=order, frame=rolling
+        )
+        annotations[f'{label}_prev'] = Window(Lag(field), order_by=order)
+        annotations[f'{label}_first'] = _first_scored(field, order, whole)
+        annotations[f'{label}_last'] = _first_scored(field, reverse, whole)
+
+    values = ['pk', 'date_time'] + list(NUMERIC_SCORES.values()) + list(YES_NO_SCORES.values())
+    return (
+        Appointment.objects
+        .filter(patient_id=patient_id)
+        .order_by()
+        .annotate(**annotations)
+        .order_by(*order)
+        .values(*values, *annotations.keys())
+    )
+
+
+def _delta(current, previous):
+    if current is None or previous is None:
+        return None
+    return current - previous
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def build_series(patient_id):
+    """Compute the PERFECT series for a patient (one query, no cache)"""
+    sessions = []
+    summary = {'count': 0, 'first_date': None, 'last_date': None, 'deltas': {}}
+
+    for row in _series_queryset(patient_id):
+        session = {
+            'appointment_id': row['pk'],
+            'date': row['date_time'].isoformat(),
+        }
+        for label, field in NUMERIC_SCORES.items():
+            session[label] = row[field]
+            session[f'{label}_avg'] = _round(row[f'{label}_avg'])
+            session[f'{label}_delta'] = _delta(row[field], row[f'{label}_prev'])
+        for label, field in YES_NO_SCORES.items():
+            session[label] = row[field] or None
+            session[f'{label}_rate'] = _round(row[f'{label}_rate'])
+        sessions.append(session)
+
+        if summary['count'] == 0:
+            summary['first_date'] = session['date']
+            summary['deltas'] = {
+                label: _delta(row[f'{label}_last'], row[f'{label}_first'])
+                for label in NUMERIC_SCORES
+            }
+        summary['count'] += 1
+        summary['last_date'] = session['date']
+
+    return {
+        'patient_id': patient_id,
+        'rolling_window': ROLLING_WINDOW,
+        'summary': summary,
+        'sessions': sessions,
+    }
+
+
+def get_series(patient_id):
+    """Cached PERFECT series; invalidated on every appointment write"""
+    cache = caches[CACHE_ALIAS]
+    key = cache_key(patient_id)
+    series = cache.get(key)
+    if series is None:
+        series = build_series(patient_id)
+        cache.set(key, series, CACHE_TIMEOUT)
+    return series
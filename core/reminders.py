@@ -0,0 +1,117 @@
+"""
+Recordatorios por correo de las próximas citas (comando ``send_reminders``).
+
+* Una sola consulta por ejecución: las citas con ``date_time`` dentro de la
+  ventana (índice ``appointment_calendar``), de pacientes con correo y sin
+  recordatorio para esa fecha y hora, con los datos del paciente y del
+  profesional traídos por JOIN. Se recorre con un iterador en lotes.
+* Idempotencia: antes de enviar un lote se insertan sus marcas en
+  ``AppointmentReminder`` (única por cita y fecha/hora) con
+  ``ignore_conflicts``; solo se envían las que quedaron a nombre de esta
+  ejecución, así dos ejecuciones simultáneas no duplican correos. Si el envío
+  falla a mitad de lote, solo se borran las marcas de los mensajes que no
+  salieron y la próxima ejecución reintenta esos, sin repetir los ya enviados.
+* Todos los mensajes se envían de a uno por una única conexión del backend de
+  correo abierta para toda la ejecución, sin abrir una conexión SMTP por
+  mensaje.
+* Una cita reprogramada se vuelve a recordar (la marca guarda la fecha/hora).
+"""
+import uuid
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Appointment, AppointmentReminder
+
+COLUMNS = (
+    'pk', 'date_time', 'patient__full_name', 'patient__email',
+    'patient__user__first_name', 'patient__user__last_name', 'patient__user__username', 'patient__user__email',
+)
+
+
+def due(now=None, window_hours=None):
+    """Rows (COLUMNS) of the appointments that still need a reminder, soonest first"""
+    now = now or timezone.now()
+    window_hours = settings.REMINDER_WINDOW_HOURS if window_hours is None else window_hours
+    already_sent = AppointmentReminder.objects.filter(appointment=OuterRef('pk'), date_time=OuterRef('date_time'))
+    return (
+        Appointment.objects.filter(date_time__gte=now, date_time__lt=now + timedelta(hours=window_hours))
+        .exclude(patient__email='')
+        .filter(~Exists(already_sent))
+        .order_by('date_time', 'pk')
+        .values_list(*COLUMNS)
+    )
+
+
+class Renderer:
+    """Subject/body templates loaded once and rendered per reminder"""
+
+    def __init__(self):
+        self.subject = get_template('emails/appointment_reminder_subject.txt')
+        self.body = get_template('emails/appointment_reminder.txt')
+
+    def message(self, row, connection):
+        pk, date_time, patient_name, patient_email, first_name, last_name, username, practitioner_email = row
+        context = {
+            'patient_name': patient_name,
+            'date_time': timezone.localtime(date_time),
+            'practitioner': f'{first_name} {last_name}'.strip() or username,
+        }
+        return EmailMessage(
+            subject=' '.join(self.subject.render(context).split()),
+            body=self.body.render(context),
+            to=[patient_email],
+            reply_to=[practitioner_email] if practitioner_email else None,
+            connection=connection,
+        )
+
+
+def _claim(rows, run_id):
+    """Insert this batch's sent-markers; returns the appointment ids this run now owns"""
+    AppointmentReminder.objects.bulk_create(
+        [AppointmentReminder(appointment_id=row[0], date_time=row[1], run_id=run_id) for row in rows],
+        ignore_conflicts=True,
+    )
+    return set(
+        AppointmentReminder.objects.filter(run_id=run_id, appointment_id__in=[row[0] for row in rows])
+        .values_list('appointment_id', flat=True)
+    )
+
+
+def dispatch(now=None, window_hours=None, batch_size=None, dry_run=False):
+    """Send every due reminder in batches; returns {'due', 'sent', 'skipped'}"""
+    batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+    rows = due(now, window_hours).iterator(chunk_size=batch_size)
+    result = {'due': 0, 'sent': 0, 'skipped': 0}
+    if dry_run:
+        result['due'] = sum(1 for _ in rows)
+        return result
+
+    run_id = uuid.uuid4().hex
+    renderer = Renderer()
+    with get_connection() as connection:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            result['due'] += len(batch)
+            claimed = _claim(batch, run_id)
+            # Otra ejecución ya tomó (o envió) las demás
+            result['skipped'] += len(batch) - len(claimed)
+            sent = set()
+            try:
+                for row in batch:
+                    if row[0] in claimed and connection.send_messages([renderer.message(row, connection)]):
+                        sent.add(row[0])
+            finally:
+                # Liberar solo las marcas de lo que no salió, para reintentarlo en la próxima ejecución
+                unsent = claimed - sent
+                if unsent:
+                    AppointmentReminder.objects.filter(run_id=run_id, appointment_id__in=unsent).delete()
+            result['sent'] += len(sent)
+    return result
@@ -0,0 +1,112 @@
+"""
+Señales de la app core.
+
+Mantienen al día los datos derivados (cachés y tablas de analítica) cuando
+cambian los modelos clínicos.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import analytics, dossier, hover_cards, progress, sync
+from .models import Appointment, FichaClinica, Patient
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def invalidate_perfect_series(sender, instance, **kwargs):
+    """Drop the cached PERFECT series of the appointment's patient"""
+    progress.invalidate(instance.patient_id)
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def invalidate_hover_card(sender, instance, **kwargs):
+    """Drop the cached dashboard hover card of the appointment's patient"""
+    hover_cards.invalidate(analytics.owner_of(instance), instance.patient_id)
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=FichaClinica)
+def touch_patient_on_child_delete(sender, instance, **kwargs):
+    """Bump Patient.updated_at so conditional GET validators see the deletion"""
+    Patient.objects.filter(pk=instance.patient_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Patient)
+def record_patient_tombstone(sender, instance, **kwargs):
+    """Tell syncing devices the patient is gone"""
+    sync.record_deletion(instance, instance.user_id)
+
+
+@receiver(post_delete, sender=Patient)
+def discard_patient_dossiers(sender, instance, **kwargs):
+    """Remove the cached dossier files of a deleted patient"""
+    dossier.discard(instance.pk)
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=FichaClinica)
+def record_child_tombstone(sender, instance, **kwargs):
+    """Tell syncing devices the appointment/ficha is gone (also on patient cascades)"""
+    sync.record_deletion(instance, analytics.owner_of(instance))
+
+
+# ----------------------------------------------
+# Analítica (core.analytics)
+# ----------------------------------------------
+
+def _previous_value(sender, instance, field):
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Appointment)
+@receiver(pre_save, sender=FichaClinica)
+def remember_previous_date(sender, instance, **kwargs):
+    """Keep the stored date so a moved record also refreshes its old week"""
+    if not settings.ANALYTICS_UPDATE_ON_WRITE:
+        return
+    field = 'date_time' if sender is Appointment else 'fecha'
+    instance._analytics_previous_date = _previous_value(sender, instance, field)
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=FichaClinica)
+def schedule_clinical_rollup(sender, instance, **kwargs):
+    """Refresh the weekly bucket(s) and the patient outcome touched by this record"""
+    if not settings.ANALYTICS_UPDATE_ON_WRITE:
+        return
+    user_id = analytics.owner_of(instance)
+    current = instance.date_time if sender is Appointment else instance.fecha
+    for value in (current, getattr(instance, '_analytics_previous_date', None)):
+        if value is not None:
+            analytics.schedule(user_id=user_id, week=analytics.week_start(value))
+    analytics.schedule(patient_id=instance.patient_id)
+
+
+@receiver(pre_save, sender=Patient)
+def remember_previous_cohort(sender, instance, **kwargs):
+    if not settings.ANALYTICS_UPDATE_ON_WRITE or instance.pk is None:
+        instance._analytics_previous_cohort = None
+        return
+    instance._analytics_previous_cohort = (
+        sender.objects.filter(pk=instance.pk).values_list(*analytics.COHORT_FLAGS.values()).first()
+    )
+
+
+@receiver(post_save, sender=Patient)
+def schedule_patient_rollup(sender, instance, created, **kwargs):
+    """Refresh the outcome row; a cohort change also moves the patient's weekly buckets"""
+    cohort = tuple(getattr(instance, flag) for flag in analytics.COHORT_FLAGS.values())
+    previous = getattr(instance, '_analytics_previous_cohort', None)
+    analytics.schedule(
+        user_id=instance.user_id,
+        patient_id=instance.pk,
+        cohort_changed=previous is not None and previous != cohort,
+    )
+
+
+@receiver(pre_delete, sender=Patient)
+def remember_patient_owner(sender, instance, **kwargs):
+    analytics.remember_owner(instance.pk, instance.user_id)
@@ -0,0 +1,163 @@
+"""
+Registro de consultas lentas.
+
+Un execute wrapper de Django mide cada consulta que se ejecuta durante una
+request y, si supera ``SLOW_QUERY_THRESHOLD_MS``, escribe una línea JSON en un
+archivo rotativo con el SQL, los parámetros, la duración, la vista que la
+originó y la línea del proyecto que la disparó. Opcionalmente se adjunta el
+plan de las consultas SELECT con ``EXPLAIN`` simple: nunca ``EXPLAIN ANALYZE``,
+que volvería a ejecutar la consulta lenta (o una escritura) dentro de la request.
+
+El comando ``slow_query_report`` agrupa esas líneas por huella de SQL.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections.abc import Mapping
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('core.slow_queries')
+
+_state = threading.local()
+_handler_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize SQL so queries that differ only in literals group together"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip().lower()
+
+
+def _get_logger():
+    """Attach the rotating JSONL handler the first time a slow query is logged"""
+    if not logger.handlers:
+        with _handler_lock:
+            if not logger.handlers:
+                path = str(settings.SLOW_QUERY_LOG_FILE)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+                    encoding='utf-8',
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+    return logger
+
+
+def _project_frame():
+    """Return 'file:line in function' for the innermost frame inside the project"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if not filename.startswith(base_dir) or 'site-packages' in filename:
+            continue
+        if filename.endswith('slow_queries.py'):
+            continue
+        return f"{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}"
+    return None
+
+
+def explain_prefix(vendor):
+    """EXPLAIN keyword for the database vendor; plans only, the query is not run"""
+    return 'EXPLAIN QUERY PLAN' if vendor == 'sqlite' else 'EXPLAIN'
+
+
+def _explain(sql, params):
+    """Run EXPLAIN for a SELECT statement, never raising"""
+    if not settings.SLOW_QUERY_EXPLAIN or not sql.lstrip().lower().startswith('select'):
+        return None
+
+    prefix = explain_prefix(connection.vendor)
+
+    _state.explaining = True
+    try:
+        # El savepoint evita que un EXPLAIN fallido aborte la transacción en curso
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+    except Exception as exc:  # El EXPLAIN es diagnóstico, nunca debe romper la request
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        _state.explaining = False
+
+
+def format_params(params):
+    """Loggable copy of the query params; named (dict) params keep their names"""
+    if isinstance(params, Mapping):
+        return {str(name): str(value) for name, value in params.items()}
+    return [str(p) for p in (params or [])]
+
+
+class SlowQueryLogger:
+    """Execute wrapper that logs queries slower than the configured threshold"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_state, 'explaining', False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= self.threshold:
+            self.log(sql, params, many, duration_ms)
+        return result
+
+    @property
+    def view_name(self):
+        # resolver_match se asigna durante la resolución de la URL, dentro de la request
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    def log(self, sql, params, many, duration_ms):
+        record = {
+            'timestamp': timezone.now().isoformat(),
+            'duration_ms': round(duration_ms, 2),
+            'sql': sql,
+            'params': [] if many else format_params(params),
+            'fingerprint': fingerprint(sql),
+            'view': self.view_name,
+            'path': self.request.path if self.request is not None else None,
+            'location': _project_frame(),
+            'vendor': connection.vendor,
+        }
+        if not many:
+            record['explain'] = _explain(sql, params)
+        _get_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class SlowQueryLogMiddleware:
+    """Install SlowQueryLogger around every request (negative threshold disables it)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS < 0:
+            return self.get_response(request)
+        with connection.execute_wrapper(SlowQueryLogger(request)):
+            return self.get_response(request)
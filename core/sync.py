@@ -0,0 +1,304 @@
+"""
+Sincronización incremental para las tablets (``/api/v1/sync/``).
+
+* ``GET`` devuelve los pacientes, citas y fichas cambiados desde el cursor, más
+  los borrados (``SyncTombstone``), en lotes acotados. Cada flujo avanza por
+  ``(updated_at, id)`` usando los índices ``*_sync``; el cursor lo emite el
+  servidor (firmado) y guarda la posición de cada flujo.
+* Solo se entregan filas con ``updated_at`` anterior a ``SYNC_SETTLE_SECONDS``
+  (5 minutos por defecto), para que una transacción que aún no confirma con una
+  hora anterior no quede detrás del cursor de un cliente. El margen debe
+  superar la transacción de escritura más larga sobre estas tablas: el push
+  (máx. ``MAX_PUSH_RECORDS``) y la importación CSV, que confirma por lotes.
+* Los borrados se guardan ``SYNC_TOMBSTONE_RETENTION_DAYS`` días (el comando
+  ``cleanup_tombstones`` purga los más antiguos). El cursor recuerda hasta qué
+  momento el cliente recibió todos los borrados; si eso es anterior a la
+  retención, la respuesta trae ``full_resync: true`` y todo desde cero, y el
+  cliente debe reemplazar su copia local.
+* ``POST /api/v1/sync/push/`` aplica en bloque las ediciones encoladas sin
+  conexión, con las mismas validaciones de los formularios HTML y detección de
+  conflictos por ``base_updated_at``.
+"""
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q
+from django.forms.models import model_to_dict
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET, require_POST
+
+from .api import API_VERSION, RESOURCES, ApiError, api_view, parse_limit
+from .forms import AppointmentForm, FichaClinicaForm, PatientForm
+from .models import SyncTombstone
+
+CURSOR_SALT = 'core.sync.cursor'
+MAX_PUSH_RECORDS = 500
+DELETED = 'deleted'
+# Orden de los flujos: los padres antes que sus citas y fichas; los borrados al final
+STREAMS = ('patients', 'appointments', 'fichas', DELETED)
+FORMS = {
+    'patients': PatientForm,
+    'appointments': AppointmentForm,
+    'fichas': FichaClinicaForm,
+}
+RESOURCE_NAMES = {resource.model: name for name, resource in RESOURCES.items()}
+
+
+# ----------------------------------------------
+# Cursor
+# ----------------------------------------------
+
+def encode_cursor(user, positions, deleted_until):
+    return signing.dumps({
+        'user': user.pk,
+        'positions': {name: [at.isoformat(), pk] for name, (at, pk) in positions.items()},
+        'deleted_until': deleted_until.isoformat(),
+    }, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(user, cursor):
+    """
+    Per-stream (updated_at, id) positions from a cursor issued to this user, and
+    the time up to which the client has received every deletion (None for
+    cursors issued before it was recorded).
+    """
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise ApiError('Invalid cursor')
+    if data.get('user') != user.pk:
+        raise ApiError('Invalid cursor')
+    positions = {
+        name: (datetime.fromisoformat(at), pk)
+        for name, (at, pk) in data['positions'].items() if name in STREAMS
+    }
+    deleted_until = data.get('deleted_until')
+    return positions, datetime.fromisoformat(deleted_until) if deleted_until else None
+
+
+def settled_until():
+    """Rows stamped before this instant are delivered; later ones wait for the next request"""
+    return timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+def retention_start():
+    """Tombstones older than this may have been pruned"""
+    return timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+
+# ----------------------------------------------
+# Cambios desde el cursor
+# ----------------------------------------------
+
+def _after(field, position):
+    if position is None:
+        return Q()
+    at, pk = position
+    return Q(**{f'{field}__gt': at}) | Q(**{field: at, 'pk__gt': pk})
+
+
+def _stream(user, name, position, until):
+    """Queryset of one stream after `position`, ordered by its (timestamp, id) key, and that timestamp field"""
+    if name == DELETED:
+        queryset = SyncTombstone.objects.filter(user=user).values('id', 'resource', 'object_id', 'deleted_at')
+        field = 'deleted_at'
+    else:
+        resource = RESOURCES[name]
+        queryset = resource.queryset(user).values(*resource.fields)
+        field = 'updated_at'
+    queryset = queryset.filter(_after(field, position), **{f'{field}__lt': until})
+    return queryset.order_by(field, 'pk'), field
+
+
+def changes(user, positions, limit, until=None):
+    """
+    Up to `limit` changed rows across all streams stamped before `until`, the
+    new positions and whether more rows are pending.
+    """
+    until = until or settled_until()
+    positions = dict(positions)
+    batch = {name: [] for name in STREAMS}
+    remaining = limit
+    has_more = False
+    for name in STREAMS:
+        if remaining == 0:
+            has_more = True
+            break
+        queryset, field = _stream(user, name, positions.get(name), until)
+        rows = list(queryset[:remaining + 1])
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+            has_more = True
+        if rows:
+            positions[name] = (rows[-1][field], rows[-1]['id'])
+        batch[name] = rows
+        remaining -= len(rows)
+        if has_more:
+            break
+    batch[DELETED] = [
+        {'resource': row['resource'], 'id': row['object_id'], 'deleted_at': row['deleted_at']}
+        for row in batch[DELETED]
+    ]
+    return batch, positions, has_more
+
+
+@require_GET
+@api_view
+def sync_changes(request):
+    """
+    Changes since ?cursor= (everything without one), in batches of ?limit= rows.
+
+    A cursor whose deletions are older than the tombstone retention gets
+    everything again with "full_resync": true.
+    """
+    until = settled_until()
+    positions, deleted_until, full_resync = {}, until, False
+    if request.GET.get('cursor'):
+        positions, deleted_until = decode_cursor(request.user, request.GET['cursor'])
+        if deleted_until is None or deleted_until < retention_start():
+            positions, deleted_until, full_resync = {}, until, True
+    batch, positions, has_more = changes(request.user, positions, parse_limit(request), until)
+    if not has_more:
+        # Todos los flujos, borrados incluidos, quedaron al día hasta `until`
+        deleted_until = until
+    return JsonResponse({
+        'version': API_VERSION,
+        'full_resync': full_resync,
+        'changes': {name: batch[name] for name in STREAMS if name != DELETED},
+        'deleted': batch[DELETED],
+        'cursor': encode_cursor(request.user, positions, deleted_until),
+        'has_more': has_more,
+    })
+
+
+# ----------------------------------------------
+# Borrados
+# ----------------------------------------------
+
+def record_deletion(instance, user_id):
+    """Tombstone for a deleted Patient/Appointment/FichaClinica"""
+    SyncTombstone.objects.create(
+        user_id=user_id,
+        resource=RESOURCE_NAMES[type(instance)],
+        object_id=instance.pk,
+    )
+
+
+def prune_tombstones(chunk_size=1000):
+    """Delete tombstones older than the retention window in batches; returns how many"""
+    start = retention_start()
+    deleted = 0
+    while True:
+        ids = list(SyncTombstone.objects.filter(deleted_at__lt=start).values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            SyncTombstone.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+# ----------------------------------------------
+# Ediciones encoladas sin conexión
+# ----------------------------------------------
+
+def _owned(user, name, ids):
+    if not ids:
+        return {}
+    return RESOURCES[name].queryset(user).in_bulk(ids)
+
+
+def _apply(user, name, record, existing, patients, created_patients):
+    """Validate and save one pushed record; returns its result entry"""
+    form_class = FORMS[name]
+    result = {'resource': name, 'client_id': record.get('client_id'), 'id': record.get('id')}
+    values = {key: value for key, value in record.items()
+              if key not in ('id', 'client_id', 'base_updated_at', 'patient_id', 'patient_client_id')}
+    unknown = sorted(set(values) - set(form_class._meta.fields))
+    if unknown:
+        return {**result, 'status': 'error', 'errors': {'__all__': [f"Unknown fields: {', '.join(unknown)}"]}}
+
+    instance = None
+    if record.get('id') is not None:
+        instance = existing.get(record['id'])
+        if instance is None:
+            return {**result, 'status': 'error', 'errors': {'__all__': ['Not found']}}
+        base = parse_datetime(str(record.get('base_updated_at') or ''))
+        if base is not None and instance.updated_at > base:
+            return {**result, 'status': 'conflict', 'updated_at': instance.updated_at}
+
+    data = model_to_dict(instance, fields=form_class._meta.fields) if instance else {}
+    data.update(values)
+    form = form_class(data, instance=instance)
+    if not form.is_valid():
+        return {**result, 'status': 'error', 'errors': form.errors.get_json_data()}
+
+    obj = form.save(commit=False)
+    if instance is None:
+        if name == 'patients':
+            obj.user = user
+        else:
+            if record.get('patient_client_id') is not None:
+                patient = created_patients.get(record['patient_client_id'])
+            else:
+                patient = patients.get(record.get('patient_id'))
+            if patient is None:
+                return {**result, 'status': 'error', 'errors': {'patient_id': ['Unknown patient']}}
+            obj.patient = patient
+    obj.save()
+    status = 'updated' if instance else 'created'
+    if name == 'patients' and record.get('client_id') is not None:
+        created_patients[record['client_id']] = obj
+    return {**result, 'id': obj.pk, 'status': status, 'updated_at': obj.updated_at}
+
+
+@require_POST
+@api_view
+def sync_push(request):
+    """
+    Apply queued offline edits: {"patients": [...], "appointments": [...], "fichas": [...]}.
+
+    Records with "id" update that row (rejected as a conflict if it changed
+    after "base_updated_at"); records without one are created. New
+    appointments/fichas name their patient by "patient_id" or by the
+    "patient_client_id" of a patient created earlier in the same push.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        raise ApiError('Invalid JSON')
+    if not isinstance(payload, dict):
+        raise ApiError('Expected a JSON object')
+    records = {name: payload.get(name) or [] for name in FORMS}
+    if any(not isinstance(items, list) for items in records.values()):
+        raise ApiError('Each resource must be a list of records')
+    if sum(len(items) for items in records.values()) > MAX_PUSH_RECORDS:
+        raise ApiError(f'At most {MAX_PUSH_RECORDS} records per push', 413)
+
+    # Una consulta por recurso para traer (y verificar la propiedad de) todo lo referenciado
+    existing = {
+        name: _owned(request.user, name, [r['id'] for r in items if isinstance(r, dict) and isinstance(r.get('id'), int)])
+        for name, items in records.items()
+    }
+    patient_ids = [
+        r['patient_id'] for name in ('appointments', 'fichas') for r in records[name]
+        if isinstance(r, dict) and r.get('id') is None and isinstance(r.get('patient_id'), int)
+    ]
+    patients = _owned(request.user, 'patients', patient_ids)
+    created_patients = {}
+
+    results = []
+    with transaction.atomic():
+        for name in FORMS:
+            for record in records[name]:
+                if not isinstance(record, dict):
+                    results.append({'resource': name, 'status': 'error', 'errors': {'__all__': ['Expected an object']}})
+                    continue
+                results.append(_apply(
+                    request.user, name, record, existing[name], patients, created_patients
+                ))
+    return JsonResponse({'version': API_VERSION, 'results': results})
@@ -0,0 +1,76 @@
+"""
+Tareas que se ejecutan en segundo plano con ``run_worker`` (ver core.jobs).
+
+Cada tarea recibe el trabajo (``job``) y su payload como argumentos con nombre,
+y devuelve un resultado serializable a JSON que se guarda en ``Job.result``.
+"""
+import io
+import tempfile
+
+from django.core.files import File
+from django.core.management import call_command
+
+from . import conditional, dossier, exports, imports
+from .files import job_storage
+from .jobs import file_name, task
+from .models import Patient
+
+
+@task('import_records')
+def import_records(job, patients=None, appointments=None, dry_run=False):
+    """CSV import of the files stored by the upload view (deleted afterwards)"""
+    storage = job_storage()
+    names = {name: filename for name, filename in (('patients', patients), ('appointments', appointments)) if filename}
+    handles = {name: storage.open(filename, 'rb') for name, filename in names.items()}
+
+    def on_chunk(result):
+        job.report(message=f'{result.patients} pacientes, {result.appointments} citas, {len(result.errors)} errores')
+
+    try:
+        result = imports.run(
+            job.user, handles.get('patients'), handles.get('appointments'),
+            dry_run=dry_run, on_chunk=on_chunk,
+        )
+    finally:
+        for handle in handles.values():
+            handle.close()
+        for filename in names.values():
+            storage.delete(filename)
+    return {**result.as_dict(), 'dry_run': dry_run}
+
+
+@task('export_records')
+def export_records(job, resource, format, filters):
+    """Gzip-compressed export kept in the shared storage for download"""
+    parsed = exports.parse_filters(**filters)
+    filename = f'makimotion-{resource}-{job.created_at:%Y-%m-%d}.{format}.gz'
+
+    def on_progress(rows, total):
+        job.report(done=rows, total=total, message=f'{rows} filas escritas')
+
+    storage = job_storage()
+    name = file_name(job, filename)
+    with tempfile.TemporaryFile() as handle:
+        rows = exports.write_gzip(handle, resource, format, job.user, parsed, on_progress)
+        # Un reintento reemplaza lo que haya dejado el intento anterior
+        storage.delete(name)
+        storage.save(name, File(handle))
+    return {'file': filename, 'rows': rows}
+
+
+@task('analytics_rollup')
+def analytics_rollup(job):
+    """Rebuild the practitioner's analytics aggregate tables"""
+    output = io.StringIO()
+    call_command('analytics_rollup', user=job.user.username, stdout=output)
+    return {'output': output.getvalue().strip()}
+
+
+@task('render_dossier')
+def render_dossier(job, patient_id, format):
+    """Printable dossier of one patient, cached by version in the shared storage"""
+    patient = Patient.objects.get(pk=patient_id, user=job.user)
+    dossier_version = dossier.version(conditional.latest_patient_change(job.user.pk, patient_id))
+    job.report(message='Generando dossier', force=True)
+    dossier.render(patient, dossier_version, format)
+    return {'patient_id': patient_id, 'format': format, 'version': dossier_version}
@@ -0,0 +1,85 @@
+"""
+Etiquetas para usar los estáticos generados por ``build_assets``.
+
+Si el build no existe o está desactivado (``ASSET_BUILD_ENABLED``, apagado por
+defecto con DEBUG) se usan los archivos originales de ``static/``.
+
+El CSS crítico se incrusta sin escapar (las comillas y los combinadores ``>``
+deben llegar tal cual a ``<style>``); solo se neutraliza ``</style`` para que
+el contenido no pueda cerrar la etiqueta.
+"""
+import re
+
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from core import assets
+
+register = template.Library()
+
+BUILD_PREFIX = 'build/'
+
+_style_end = re.compile(r'</(style)', re.IGNORECASE)
+
+
+@register.simple_tag
+def critical_css():
+    """Inline <style> with the above-the-fold rules (empty without a build)"""
+    css = assets.critical_css()
+    if not css:
+        return ''
+    # "<\/style" es el mismo texto para CSS y no cierra la etiqueta en HTML
+    return mark_safe('<style>' + _style_end.sub(r'<\\/\1', css) + '</style>')
+
+
+@register.simple_tag
+def stylesheet():
+    """Purged stylesheet loaded without blocking render, or the full one without a build"""
+    manifest = assets.load_manifest()
+    if manifest is None:
+        return format_html('<link rel="stylesheet" href="{}">', static(assets.SOURCE_CSS))
+    url = static(BUILD_PREFIX + manifest['css'])
+    return format_html(
+        '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{0}"></noscript>',
+        url,
+    )
+
+
+@register.simple_tag
+def favicon_links():
+    manifest = assets.load_manifest()
+    if manifest is None or 'favicon' not in manifest:
+        return format_html('<link rel="icon" type="image/jpeg" href="{}">', static(assets.SOURCE_LOGO))
+    return format_html(
+        '<link rel="icon" href="{}" sizes="any">'
+        '<link rel="apple-touch-icon" href="{}">',
+        static(BUILD_PREFIX + manifest['favicon']),
+        static(BUILD_PREFIX + manifest['apple_touch_icon']),
+    )
+
+
+@register.simple_tag
+def logo(height, css_class):
+    """<picture> with WebP/PNG variants for a logo shown at `height` px"""
+    manifest = assets.load_manifest()
+    variants = (manifest or {}).get('logo', {}).get(str(height))
+    if variants is None:
+        return format_html(
+            '<img src="{}" alt="MakiMotion" class="{}">', static(assets.SOURCE_LOGO), css_class
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{} 1x, {} 2x">'
+        '<img src="{}" srcset="{} 2x" width="{}" height="{}" alt="MakiMotion" class="{}">'
+        '</picture>',
+        static(BUILD_PREFIX + variants['webp_1x']),
+        static(BUILD_PREFIX + variants['webp_2x']),
+        static(BUILD_PREFIX + variants['png_1x']),
+        static(BUILD_PREFIX + variants['png_2x']),
+        variants['width'],
+        height,
+        css_class,
+    )
@@ -1,3 +1,1191 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.db import OperationalError, connection, transaction
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from . import (
+    analytics, api, assets, backfills, compression, data_migrations, dossier, exports, ficha_diff, files, hover_cards,
+    imports, jobs, metrics, profiling, progress, reminders, slow_queries, sync, timeline, volumes,
+)
+from .loaders import get_owned_appointment, get_owned_ficha, get_owned_patient
+from .models import (
+    Appointment, AppointmentReminder, BackfillCheckpoint, FichaClinica, Job, Patient, RequestProfile, StoredFile, SyncTombstone, WeeklyPracticeStats,
+)
+
+
+# Sin manifiesto de collectstatic en los tests
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'jobs': {'BACKEND': 'core.files.DatabaseStorage'},
+}
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class LoggedInTestCase(TestCase):
+    """A practitioner with one patient, logged in on self.client"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('practitioner', password='pw')
+        cls.patient = Patient.objects.create(user=cls.user, full_name='Paciente Prueba', birth_date=date(1990, 1, 1))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+
+@override_settings(HTML_MINIFY=False)
+class CompressionCsrfTests(LoggedInTestCase):
+    """BREACH: pages carrying a CSRF token must never be served with Brotli"""
+
+    def get(self, url):
+        return self.client.get(url, HTTP_ACCEPT_ENCODING='br, gzip')
+
+    def test_token_pages_use_gzip(self):
+        for url in ('/patients/add/', f'/patients/{self.patient.pk}/', f'/patients/{self.patient.pk}/fichas-clinicas/add/'):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertTrue(compression.uses_csrf_token(response.wsgi_request))
+
+    def test_pages_without_token_may_use_brotli(self):
+        for index in range(10):
+            Patient.objects.create(user=self.user, full_name=f'Paciente {index}', birth_date=date(1990, 1, 1))
+        response = self.get('/api/v1/patients/')
+        self.assertFalse(compression.uses_csrf_token(response.wsgi_request))
+        self.assertEqual(response['Content-Encoding'], 'br' if compression.brotli is not None else 'gzip')
+
+
+class CriticalCssTagTests(TestCase):
+    """The critical CSS is inlined verbatim, but can never close its <style>"""
+
+    def render(self, css):
+        with tempfile.TemporaryDirectory() as build_dir:
+            Path(build_dir, 'critical.css').write_text(css, encoding='utf-8')
+            Path(build_dir, assets.MANIFEST_NAME).write_text(json.dumps({'critical_css': 'critical.css'}))
+            with override_settings(ASSET_BUILD_ENABLED=True, ASSET_BUILD_DIR=build_dir):
+                assets.load_manifest.cache_clear()
+                assets.critical_css.cache_clear()
+                try:
+                    return Template('{% load asset_tags %}{% critical_css %}').render(Context())
+                finally:
+                    assets.load_manifest.cache_clear()
+                    assets.critical_css.cache_clear()
+
+    def test_quotes_and_combinators_survive(self):
+        css = "body{font-family:'Segoe UI',\"Helvetica Neue\"}.nav>li+li{content:\"&\"}"
+        self.assertEqual(self.render(css), f'<style>{css}</style>')
+
+    def test_style_end_is_neutralised(self):
+        html = self.render("a{content:'</style><script>x()</script>'}")
+        self.assertEqual(html.lower().count('</style'), 1)
+        self.assertIn("content:'<\\/style><script>", html)
+
+
+class MinifyHtmlTests(TestCase):
+    """Minifying only drops whitespace between tags"""
+
+    def test_text_and_attribute_values_are_kept(self):
+        html = '<form>\n    <input value="a  b">\n    <p>Hola   mundo</p>  <b>x</b>\n</form>'
+        self.assertEqual(
+            compression.minify_html(html), '<form>\n<input value="a  b">\n<p>Hola   mundo</p> <b>x</b>\n</form>',
+        )
+
+    def test_protected_blocks_are_kept(self):
+        html = '<div>\n\n  <pre>  a\n\n  b</pre>  <textarea>x   y</textarea></div>'
+        self.assertEqual(compression.minify_html(html), '<div>\n<pre>  a\n\n  b</pre> <textarea>x   y</textarea></div>')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SessionBenchmarkTests(TestCase):
+    """session_benchmark must reverse every core route it can and skip the rest"""
+
+    def test_runs_over_all_reversible_views(self):
+        output = io.StringIO()
+        call_command('session_benchmark', stdout=output)
+        report = output.getvalue()
+        for name in ('patient_timeline', 'calendar_agenda', 'ficha_clinica_diff'):
+            self.assertIn(name, report)
+        self.assertNotIn('patient_timeline_event', report)
+        self.assertNotIn('calendar_feed', report)
+
+    def test_cached_sessions_measured_on_the_configured_cache(self):
+        # La caché compartida de los tests es la tabla de la BD: cached_db no ahorra consultas
+        with self.assertRaisesMessage(CommandError, 'No query saved for'):
+            call_command('session_benchmark', strategies=['cached_db'], stdout=io.StringIO())
+
+    @override_settings(SESSION_CACHE_ALIAS='default')
+    def test_refuses_a_per_process_session_cache(self):
+        with self.assertRaisesMessage(CommandError, 'not shared by all processes'):
+            call_command('session_benchmark', strategies=['cached_db'], stdout=io.StringIO())
+
+
+class _Rollback(Exception):
+    pass
+
+
+@override_settings(ANALYTICS_UPDATE_ON_WRITE=True)
+class AnalyticsOnCommitTests(TransactionTestCase):
+    """On-write analytics keep working after a rolled-back write (real commits)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('practitioner', password='pw')
+        self.patient = Patient.objects.create(user=self.user, full_name='Paciente Prueba', birth_date=date(1990, 1, 1))
+
+    def create_appointment(self):
+        return Appointment.objects.create(
+            patient=self.patient, date_time=datetime(2025, 3, 5, 10, tzinfo=dt_timezone.utc), session_description='Sesión',
+        )
+
+    def queued_flushes(self):
+        return sum(entry[1] is analytics._flush for entry in transaction.get_connection().run_on_commit)
+
+    def test_flush_runs_after_rollback(self):
+        with self.assertRaises(_Rollback):
+            with transaction.atomic():
+                Patient.objects.create(user=self.user, full_name='Revertido', birth_date=date(1990, 1, 1))
+                raise _Rollback
+
+        with transaction.atomic():
+            self.create_appointment()
+            self.assertEqual(self.queued_flushes(), 1)
+        self.assertTrue(
+            WeeklyPracticeStats.objects.filter(user=self.user, week=analytics.week_start(date(2025, 3, 5))).exists()
+        )
+
+    def test_one_flush_per_transaction(self):
+        with transaction.atomic():
+            self.create_appointment()
+            self.create_appointment()
+            self.assertEqual(self.queued_flushes(), 1)
+
+    def test_savepoint_rollback_requeues(self):
+        with transaction.atomic():
+            with self.assertRaises(_Rollback):
+                with transaction.atomic():
+                    self.create_appointment()
+                    raise _Rollback
+            self.assertEqual(self.queued_flushes(), 0)
+            self.create_appointment()
+            self.assertEqual(self.queued_flushes(), 1)
+
+
+@override_settings(JOBS_EAGER=False, JOB_RETRY_BASE_SECONDS=30)
+class JobQueueTests(TransactionTestCase):
+    """Claim protocol, retries and the worker heartbeat of core.jobs"""
+
+    def setUp(self):
+        self.calls = []
+        jobs.TASKS['test_echo'] = lambda job, value: self.calls.append(value) or {'value': value}
+        jobs.TASKS['test_fail'] = self.fail_task
+        self.addCleanup(jobs.TASKS.pop, 'test_echo')
+        self.addCleanup(jobs.TASKS.pop, 'test_fail')
+
+    def fail_task(self, job):
+        raise RuntimeError('boom')
+
+    def test_concurrent_workers_never_share_a_job(self):
+        for value in range(20):
+            jobs.enqueue('test_echo', value=value)
+        claimed = []
+        lock = threading.Lock()
+
+        def work(worker):
+            try:
+                while True:
+                    try:
+                        job = jobs.claim(worker)
+                    except OperationalError:
+                        # La BD SQLite en memoria de los tests bloquea la tabla en vez de esperar
+                        time.sleep(0.01)
+                        continue
+                    if job is None:
+                        return
+                    with lock:
+                        claimed.append(job.pk)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(f'w{index}',)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), sorted(Job.objects.values_list('pk', flat=True)))
+        self.assertEqual(Job.objects.filter(status=Job.RUNNING, attempts=1).count(), 20)
+
+    def test_claim_order_and_single_owner(self):
+        low = jobs.enqueue('test_echo', value='low')
+        high = jobs.enqueue('test_echo', value='high', priority=10)
+        self.assertEqual(jobs.claim('a').pk, high.pk)
+        self.assertEqual(jobs.claim('b').pk, low.pk)
+        self.assertIsNone(jobs.claim('c'))
+
+    def test_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue('test_fail', max_attempts=2)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.execute(jobs.claim('a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(jobs.claim('a'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.execute(jobs.claim('a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('boom', job.error)
+
+    @override_settings(JOB_LEASE_SECONDS=1)
+    def test_heartbeat_keeps_silent_job_leased(self):
+        def silent(job):
+            # Más que el lease y sin job.report(): solo el latido del worker lo mantiene
+            time.sleep(1.6)
+            return {'requeued': jobs.requeue_stale()}
+
+        jobs.TASKS['test_silent'] = silent
+        self.addCleanup(jobs.TASKS.pop, 'test_silent')
+        job = jobs.enqueue('test_silent', max_attempts=1)
+        jobs.execute(jobs.claim('a'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'requeued': 0})
+
+
+class SharedCacheInvalidationTests(LoggedInTestCase):
+    """Cached fragments live in the shared cache, so a write invalidates them for every worker"""
+
+    def add_appointment(self, power):
+        return Appointment.objects.create(
+            patient=self.patient, date_time=timezone.now(), session_description='Sesión', perfect_p_power=power,
+        )
+
+    def test_progress_series_invalidated_in_shared_cache(self):
+        self.add_appointment(2)
+        progress.get_series(self.patient.pk)
+        key = progress.cache_key(self.patient.pk)
+        self.assertIsNotNone(caches[progress.CACHE_ALIAS].get(key))
+        self.assertIsNone(caches['default'].get(key))
+
+        self.add_appointment(4)
+        self.assertIsNone(caches[progress.CACHE_ALIAS].get(key))
+        self.assertEqual(len(progress.get_series(self.patient.pk)['sessions']), 2)
+
+    def test_summary_delta_skips_unscored_sessions(self):
+        for power in (None, 2, 5, None):
+            self.add_appointment(power)
+        series = progress.build_series(self.patient.pk)
+        self.assertEqual(series['summary']['deltas']['P'], 3)
+        self.assertIsNone(series['summary']['deltas']['E'])
+
+    def test_hover_card_invalidated_in_shared_cache(self):
+        self.add_appointment(2)
+        hover_cards.render_card(self.user.pk, self.patient.pk)
+        key = hover_cards.cache_key(self.user.pk, self.patient.pk)
+        self.assertIsNotNone(caches[hover_cards.CACHE_ALIAS].get(key))
+        self.assertIsNone(caches['default'].get(key))
+
+        self.add_appointment(4)
+        self.assertIsNone(caches[hover_cards.CACHE_ALIAS].get(key))
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """locmem backend whose SMTP server goes away before the mail to FAILING_ADDRESS"""
+
+    FAILING_ADDRESS = 'falla@example.com'
+
+    def send_messages(self, messages):
+        if any(self.FAILING_ADDRESS in message.to for message in messages):
+            raise ConnectionError('smtp down')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ReminderDispatchTests(TestCase):
+    """A reminder goes out once, even across a run that failed halfway"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('practitioner', password='pw')
+        start = timezone.now() + timedelta(hours=1)
+        for index, email in enumerate(('uno@example.com', FlakyEmailBackend.FAILING_ADDRESS, 'tres@example.com')):
+            patient = Patient.objects.create(
+                user=user, full_name=f'Paciente {index}', birth_date=date(1990, 1, 1), email=email,
+            )
+            Appointment.objects.create(patient=patient, date_time=start + timedelta(hours=index), session_description='Sesión')
+
+    def recipients(self):
+        return sorted(message.to[0] for message in mail.outbox)
+
+    def test_partial_failure_resends_only_unsent(self):
+        with override_settings(EMAIL_BACKEND='core.tests.FlakyEmailBackend'):
+            with self.assertRaises(ConnectionError):
+                reminders.dispatch()
+        self.assertEqual(self.recipients(), ['uno@example.com'])
+        self.assertEqual(AppointmentReminder.objects.count(), 1)
+
+        self.assertEqual(reminders.dispatch(), {'due': 2, 'sent': 2, 'skipped': 0})
+        self.assertEqual(
+            self.recipients(), sorted(['uno@example.com', FlakyEmailBackend.FAILING_ADDRESS, 'tres@example.com']),
+        )
+
+        self.assertEqual(reminders.dispatch(), {'due': 0, 'sent': 0, 'skipped': 0})
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class SlowQueryLogTests(TestCase):
+    """Logged params keep their values; EXPLAIN never re-runs the slow query"""
+
+    def test_positional_and_named_params(self):
+        self.assertEqual(slow_queries.format_params((1, 'a', None)), ['1', 'a', 'None'])
+        self.assertEqual(slow_queries.format_params(None), [])
+        self.assertEqual(slow_queries.format_params({'user_id': 7, 'name': 'x'}), {'user_id': '7', 'name': 'x'})
+
+    @override_settings(SLOW_QUERY_EXPLAIN='explain')
+    def test_explain_plans_selects_without_running_them(self):
+        for vendor in ('postgresql', 'sqlite', 'mysql'):
+            self.assertNotIn('ANALYZE', slow_queries.explain_prefix(vendor))
+        self.assertIsNone(slow_queries._explain('UPDATE core_patient SET email = %s', ['x@example.com']))
+        with CaptureQueriesContext(connection) as queries:
+            plan = slow_queries._explain('SELECT id FROM core_patient WHERE id = %s', [1])
+        self.assertTrue(plan)
+        self.assertTrue(all(query['sql'].startswith(('SAVEPOINT', 'RELEASE', 'EXPLAIN')) for query in queries))
+
+
+class CsvExportTests(LoggedInTestCase):
+    """CSV cells that start like a formula are neutralised; numbers are left alone"""
+
+    def test_formula_cells_are_quoted(self):
+        lines = list(exports.csv_lines(['a', 'b', 'c', 'd'], [['=HYPERLINK("x")', '@SUM(A1)', -3, 'Ana']]))
+        self.assertEqual(lines[1], '"\'=HYPERLINK(""x"")",\'@SUM(A1),-3,Ana\r\n')
+
+    def test_patient_export_escapes_names(self):
+        Patient.objects.filter(pk=self.patient.pk).update(full_name='+56 9 1234 5678')
+        body = ''.join(exports.lines('patients', 'csv', self.user))
+        self.assertIn("'+56 9 1234 5678", body)
+        self.assertNotIn("'+56", ''.join(exports.lines('patients', 'jsonl', self.user)))
+
+
+class CacheMetricsTests(TestCase):
+    """The shared cache (sessions, progress, hover cards) reports its hit ratio"""
+
+    def lookups(self, cache, result):
+        return REGISTRY.get_sample_value('makimotion_cache_requests_total', {'cache': cache, 'result': result}) or 0
+
+    def test_shared_cache_is_instrumented(self):
+        shared = caches['shared']
+        self.assertIsInstance(shared, metrics.InstrumentedCacheMixin)
+        name = shared._metrics_name
+        hits, misses = self.lookups(name, 'hit'), self.lookups(name, 'miss')
+        shared.get('metrics-test')
+        shared.set('metrics-test', 1)
+        self.assertEqual(shared.get('metrics-test'), 1)
+        self.assertEqual(self.lookups(name, 'hit'), hits + 1)
+        self.assertEqual(self.lookups(name, 'miss'), misses + 1)
+
+    def test_shared_backends_accept_instrumented_caches(self):
+        for backend in ('InstrumentedDatabaseCache', 'InstrumentedRedisCache'):
+            self.assertIn(f'core.metrics.{backend}', settings.SHARED_CACHE_BACKENDS)
+        self.assertIn(settings.CACHES['shared']['BACKEND'], settings.SHARED_CACHE_BACKENDS)
+
+
+class SyncTests(LoggedInTestCase):
+    """Settle margin, tombstone retention and the full-resync signal of /api/v1/sync/"""
+
+    def sync(self, cursor=None):
+        response = self.client.get('/api/v1/sync/', {'cursor': cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_rows_wait_for_the_settle_margin(self):
+        with override_settings(SYNC_SETTLE_SECONDS=300):
+            self.assertEqual(self.sync()['changes']['patients'], [])
+        with override_settings(SYNC_SETTLE_SECONDS=0):
+            self.assertEqual([row['id'] for row in self.sync()['changes']['patients']], [self.patient.pk])
+
+    @override_settings(SYNC_SETTLE_SECONDS=0, SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_cursor_older_than_retention_gets_full_resync(self):
+        first = self.sync()
+        self.assertFalse(first['full_resync'])
+        again = self.sync(first['cursor'])
+        self.assertEqual((again['full_resync'], again['changes']['patients']), (False, []))
+
+        positions, _ = sync.decode_cursor(self.user, first['cursor'])
+        stale = sync.encode_cursor(self.user, positions, timezone.now() - timedelta(days=31))
+        resync = self.sync(stale)
+        self.assertTrue(resync['full_resync'])
+        self.assertEqual([row['id'] for row in resync['changes']['patients']], [self.patient.pk])
+        self.assertFalse(self.sync(resync['cursor'])['full_resync'])
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_cleanup_prunes_old_tombstones(self):
+        SyncTombstone.objects.create(
+            user=self.user, resource='patients', object_id=1, deleted_at=timezone.now() - timedelta(days=31),
+        )
+        recent = SyncTombstone.objects.create(user=self.user, resource='patients', object_id=2)
+        call_command('cleanup_tombstones', stdout=io.StringIO())
+        self.assertEqual(list(SyncTombstone.objects.values_list('pk', flat=True)), [recent.pk])
+
+
+@override_settings(JOBS_EAGER=False)
+class JobFilesTests(LoggedInTestCase):
+    """Uploads and results go through the shared storage, never the web or worker disk"""
+
+    def run_worker(self):
+        job = jobs.claim('worker')
+        jobs.execute(job)
+        job.refresh_from_db()
+        return job
+
+    def test_upload_reaches_the_worker(self):
+        upload = SimpleUploadedFile('pacientes.csv', b'full_name,birth_date\nImportada Uno,1985-04-02\n')
+        response = self.client.post('/import/', {'patients': upload})
+        self.assertEqual(StoredFile.objects.filter(name__startswith='uploads/').count(), 1)
+
+        job = self.run_worker()
+        self.assertRedirects(response, f'/jobs/{job.pk}/', fetch_redirect_response=False)
+        self.assertEqual((job.status, job.result['patients']), (Job.SUCCEEDED, 1))
+        self.assertTrue(Patient.objects.filter(user=self.user, full_name='Importada Uno').exists())
+        self.assertFalse(StoredFile.objects.filter(name__startswith='uploads/').exists())
+
+    def test_export_is_downloadable_from_the_web(self):
+        self.client.post('/export/background/', {'resource': 'patients', 'format': 'csv'})
+        job = self.run_worker()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertTrue(files.job_storage().exists(jobs.file_name(job, job.result['file'])))
+
+        response = self.client.get(f'/jobs/{job.pk}/download/')
+        self.assertEqual(response.status_code, 200)
+        with gzip.open(io.BytesIO(b''.join(response.streaming_content)), 'rt', encoding='utf-8') as handle:
+            self.assertIn('Paciente Prueba', handle.read())
+
+        Job.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=30))
+        jobs.prune()
+        self.assertFalse(StoredFile.objects.filter(name__startswith=f'jobs/{job.pk}/').exists())
+
+    def test_dossier_rendered_by_the_worker_is_served_by_the_web(self):
+        url = f'/patients/{self.patient.pk}/dossier/'
+        response = self.client.get(url)
+        job = self.run_worker()
+        self.assertRedirects(response, f'/jobs/{job.pk}/', fetch_redirect_response=False)
+        self.assertEqual(job.status, Job.SUCCEEDED)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Paciente Prueba', b''.join(response.streaming_content).decode())
+        self.assertEqual(Job.objects.filter(name='render_dossier').count(), 1)
+
+        self.patient.delete()
+        self.assertFalse(StoredFile.objects.filter(name__startswith=dossier.directory(job.payload['patient_id']) + '/').exists())
+
+
+@override_settings(PROFILING_MAX_STORED=2)
+class RequestProfilingTests(LoggedInTestCase):
+    """Only a staff user's own signed token profiles a core view"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user.is_staff = True
+        cls.user.save(update_fields=['is_staff'])
+        cls.other = User.objects.create_user('other', password='pw', is_staff=True)
+
+    def test_valid_token_stores_a_profile(self):
+        token = profiling.make_token(self.user)
+        response = self.client.get('/patients/', {'q': 'Prueba', profiling.PROFILE_PARAM: token})
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.path, profile.view_name, profile.status_code), ('/patients/?q=Prueba', 'patient_list', 200))
+        self.assertEqual(profile.query_count, len(profile.queries))
+        self.assertGreater(profile.query_count, 0)
+
+        response = self.client.get('/patients/', HTTP_X_PROFILE=token)
+        self.assertIn('X-Profile-Id', response)
+
+    def test_foreign_forged_or_non_staff_tokens_are_ignored(self):
+        for token in (profiling.make_token(self.other), 'forged:token', profiling.make_token(self.user) + 'x'):
+            with self.subTest(token=token):
+                response = self.client.get('/patients/', {profiling.PROFILE_PARAM: token})
+                self.assertNotIn('X-Profile-Id', response)
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        response = self.client.get('/patients/', {profiling.PROFILE_PARAM: profiling.make_token(self.user)})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_only_the_latest_profiles_are_kept(self):
+        token = profiling.make_token(self.user)
+        ids = [self.client.get('/patients/', {profiling.PROFILE_PARAM: token})['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(sorted(RequestProfile.objects.values_list('pk', flat=True)), sorted(map(int, ids[1:])))
+
+
+class BalloonVolumeParserTests(TestCase):
+    """Free-text balloon-test volumes parsed into millilitres"""
+
+    CASES = [
+        # Unidades
+        ('40', '40.0'),
+        ('40 ml', '40.0'),
+        ('40ml', '40.0'),
+        ('40 ML', '40.0'),
+        ('40cc', '40.0'),
+        ('40 cm3', '40.0'),
+        ('1,5 l', '1500.0'),
+        ('0,3 lt', '300.0'),
+        ('2 litros', '2000.0'),
+        # Coma o punto decimal
+        ('45,5 ml', '45.5'),
+        ('45.5ml', '45.5'),
+        # Rangos: punto medio
+        ('40-60 ml', '50.0'),
+        ('40 – 60', '50.0'),
+        ('40 ml - 60 ml', '50.0'),
+        ('40 a 60', '50.0'),
+        ('50 al 70 ml', '60.0'),
+        ('100/150', '125.0'),
+        ('90 hasta 120ml', '105.0'),
+        ('45,5-50,5', '48.0'),
+        # Texto alrededor del número
+        ('aprox. 50', '50.0'),
+        ('>200', '200.0'),
+        ('  120  ', '120.0'),
+        # Sin número reconocible o fuera de rango
+        ('', None),
+        ('   ', None),
+        (None, None),
+        ('no sintió', None),
+        ('sin dato', None),
+        ('ml', None),
+        ('6000 ml', None),
+        ('6 l', None),
+    ]
+
+    def test_cases(self):
+        for text, expected in self.CASES:
+            with self.subTest(text=text):
+                self.assertEqual(volumes.parse_volume_ml(text), None if expected is None else Decimal(expected))
+
+    def test_save_fills_the_numeric_columns(self):
+        user = User.objects.create_user('practitioner', password='pw')
+        patient = Patient.objects.create(user=user, full_name='Paciente Prueba', birth_date=date(1990, 1, 1))
+        appointment = Appointment.objects.create(
+            patient=patient, date_time=timezone.now(), session_description='Sesión',
+            balloon_first_desire_volume='50 - 60 ml', balloon_max_tolerable_capacity='no tolera',
+        )
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.balloon_first_desire_volume_ml, Decimal('55.0'))
+        self.assertIsNone(appointment.balloon_max_tolerable_capacity_ml)
+        self.assertEqual(
+            Appointment.objects.filter(balloon_first_desire_volume_ml__gte=50).get(), appointment,
+        )
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class ChunkedBackfillTests(TestCase):
+    """Backfills commit per pk chunk and resume from their checkpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('practitioner', password='pw')
+        patient = Patient.objects.create(user=user, full_name='Paciente Prueba', birth_date=date(1990, 1, 1))
+        for volume in ('40 ml', '50-60', 'no sintió', '1 l', '70cc'):
+            Appointment.objects.create(
+                patient=patient, date_time=timezone.now(), session_description='Sesión', balloon_rectal_sensation=volume,
+            )
+        # Filas anteriores a la columna numérica
+        Appointment.objects.update(balloon_rectal_sensation_ml=None)
+
+    def backfill(self, **kwargs):
+        return backfills.BalloonVolumeBackfill(chunk_size=2, report=lambda message: None, **kwargs)
+
+    def volumes(self):
+        return list(Appointment.objects.order_by('pk').values_list('balloon_rectal_sensation_ml', flat=True))
+
+    def test_fills_every_chunk_and_completes(self):
+        checkpoint = self.backfill().run()
+        self.assertEqual(self.volumes(), [Decimal('40.0'), Decimal('55.0'), None, Decimal('1000.0'), Decimal('70.0')])
+        self.assertEqual(
+            (checkpoint.status, checkpoint.rows_processed, checkpoint.rows_changed, checkpoint.rows_total),
+            ('completed', 5, 4, 5),
+        )
+        self.assertEqual(checkpoint.last_pk, Appointment.objects.order_by('-pk').values_list('pk', flat=True)[0])
+        # Ya completado: no vuelve a recorrer la tabla
+        self.assertEqual(self.backfill().run().rows_processed, 5)
+
+    def test_resumes_after_an_interruption(self):
+        backfill = self.backfill()
+        process = backfill.process
+        calls = []
+
+        def fail_on_second_chunk(chunk):
+            calls.append(1)
+            if len(calls) == 2:
+                raise _Interrupted
+            return process(chunk)
+
+        backfill.process = fail_on_second_chunk
+        with self.assertRaises(_Interrupted):
+            backfill.run()
+        checkpoint = BackfillCheckpoint.objects.get(name='balloon_volumes')
+        # Solo el primer lote quedó confirmado
+        self.assertEqual((checkpoint.status, checkpoint.rows_processed), ('running', 2))
+        self.assertEqual(self.volumes()[:3], [Decimal('40.0'), Decimal('55.0'), None])
+
+        pks = []
+        resumed = self.backfill()
+        process_resumed = resumed.process
+        resumed.process = lambda chunk: pks.extend(chunk.values_list('pk', flat=True)) or process_resumed(chunk)
+        checkpoint = resumed.run()
+        self.assertEqual(sorted(pks), list(Appointment.objects.order_by('pk').values_list('pk', flat=True)[2:]))
+        self.assertEqual((checkpoint.status, checkpoint.rows_processed), ('completed', 5))
+        self.assertEqual(self.volumes()[3:], [Decimal('1000.0'), Decimal('70.0')])
+
+    def test_reset_starts_over(self):
+        self.backfill().run()
+        Appointment.objects.update(balloon_rectal_sensation_ml=None)
+        checkpoint = self.backfill().run(reset=True)
+        self.assertEqual((checkpoint.rows_processed, checkpoint.rows_changed), (5, 4))
+
+    def test_command_lists_registered_backfills(self):
+        output = io.StringIO()
+        call_command('run_backfill', stdout=output)
+        self.assertIn('balloon_volumes: not started', output.getvalue())
+        self.assertIn('balloon_volumes', data_migrations.REGISTRY)
+        with self.assertRaisesMessage(CommandError, 'Unknown backfill'):
+            call_command('run_backfill', 'nope', stdout=io.StringIO())
+
+
+class OwnedLoaderTests(LoggedInTestCase):
+    """One joined, owner-filtered query per resource, memoized on the request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ficha = FichaClinica.objects.create(patient=cls.patient)
+        cls.appointment = Appointment.objects.create(
+            patient=cls.patient, date_time=timezone.now(), session_description='Sesión',
+        )
+        stranger = User.objects.create_user('stranger', password='pw')
+        cls.foreign_patient = Patient.objects.create(user=stranger, full_name='Ajeno', birth_date=date(1980, 1, 1))
+        cls.foreign_ficha = FichaClinica.objects.create(patient=cls.foreign_patient)
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return request
+
+    def test_child_and_patient_in_one_memoized_query(self):
+        request = self.request()
+        with self.assertNumQueries(1):
+            ficha = get_owned_ficha(request, self.patient.pk, self.ficha.pk)
+            self.assertEqual(ficha.patient.full_name, 'Paciente Prueba')
+            self.assertIs(get_owned_ficha(request, self.patient.pk, self.ficha.pk), ficha)
+            self.assertIs(get_owned_patient(request, self.patient.pk), ficha.patient)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_owned_appointment(request, self.appointment.pk).patient, self.patient)
+
+    def test_foreign_or_mismatched_resources_are_404(self):
+        request = self.request()
+        for load in (
+            lambda: get_owned_patient(request, self.foreign_patient.pk),
+            lambda: get_owned_ficha(request, self.foreign_patient.pk, self.foreign_ficha.pk),
+            # Ficha ajena bajo un paciente propio
+            lambda: get_owned_ficha(request, self.patient.pk, self.foreign_ficha.pk),
+        ):
+            with self.assertRaises(Http404):
+                load()
+
+    def test_views_use_the_loader(self):
+        urls = {
+            f'/patients/{self.patient.pk}/fichas-clinicas/{self.ficha.pk}/': 200,
+            f'/appointments/{self.appointment.pk}/': 200,
+            f'/patients/{self.foreign_patient.pk}/fichas-clinicas/{self.foreign_ficha.pk}/': 404,
+            f'/patients/{self.patient.pk}/fichas-clinicas/{self.foreign_ficha.pk}/edit/': 404,
+            f'/patients/{self.foreign_patient.pk}/': 404,
+        }
+        for url, status in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, status)
+
+
+class ConditionalGetTests(LoggedInTestCase):
+    """Detail pages answer 304 while nothing they show has changed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.appointment = Appointment.objects.create(
+            patient=cls.patient, date_time=timezone.now(), session_description='Sesión',
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/patients/{self.patient.pk}/'
+        # La primera visita fija la cookie CSRF, que forma parte del ETag
+        self.client.get(self.url)
+
+    def test_unchanged_page_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(cached['ETag'], response['ETag'])
+        modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified.status_code, 304)
+
+    def test_editing_a_child_record_changes_the_validator(self):
+        etag = self.client.get(self.url)['ETag']
+        Appointment.objects.get(pk=self.appointment.pk).save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        appointment_url = f'/appointments/{self.appointment.pk}/'
+        self.client.get(appointment_url)
+        etag = self.client.get(appointment_url)['ETag']
+        Patient.objects.get(pk=self.patient.pk).save()
+        self.assertEqual(self.client.get(appointment_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validator_is_bound_to_the_session(self):
+        etag = self.client.get(self.url)['ETag']
+        # Otra sesión (otro secreto CSRF) del mismo usuario no reutiliza la página cacheada
+        other = self.client_class()
+        other.force_login(self.user)
+        self.assertEqual(other.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # Tampoco otro usuario, que además recibe 404
+        stranger = self.client_class()
+        stranger.force_login(User.objects.create_user('stranger', password='pw'))
+        self.assertEqual(stranger.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_pending_messages_are_never_swallowed(self):
+        etag = self.client.get(self.url)['ETag']
+        request = RequestFactory().get(self.url)
+        request._messages = CookieStorage(request)
+        messages.success(request, 'Cita actualizada exitosamente.')
+        carrier = HttpResponse()
+        request._messages.update(carrier)
+        self.client.cookies['messages'] = carrier.cookies['messages'].value
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Cita actualizada exitosamente.')
+
+
+class FragmentRenderingTests(LoggedInTestCase):
+    """HX-Request gets only the block the full page includes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Patient.objects.create(user=cls.user, full_name='Otra Persona', birth_date=date(1985, 5, 5))
+
+    def test_dashboard_fragment_is_only_the_grid(self):
+        page = self.client.get('/')
+        self.assertContains(page, '<html')
+        self.assertContains(page, 'id="patient-grid"')
+        self.assertIn('HX-Request', page['Vary'])
+
+        with CaptureQueriesContext(connection) as queries:
+            fragment = self.client.get('/', HTTP_HX_REQUEST='true')
+        self.assertEqual(fragment.status_code, 200)
+        self.assertNotContains(fragment, '<html')
+        self.assertNotContains(fragment, 'id="patient-grid"')
+        self.assertContains(fragment, 'class="patient-card"', count=2)
+        self.assertIn('HX-Request', fragment['Vary'])
+        # El conteo de la cabecera no se calcula para la grilla sola
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    def test_patient_list_fragment_is_only_the_filtered_table(self):
+        fragment = self.client.get('/patients/', {'q': 'Otra'}, HTTP_HX_REQUEST='true')
+        self.assertNotContains(fragment, '<html')
+        self.assertContains(fragment, 'data-total="1"')
+        self.assertContains(fragment, 'Otra Persona')
+        self.assertNotContains(fragment, 'Paciente Prueba')
+
+    def test_other_header_values_render_the_full_page(self):
+        response = self.client.get('/patients/', HTTP_HX_REQUEST='false')
+        self.assertContains(response, '<html')
+
+
+class TimelinePaginationTests(LoggedInTestCase):
+    """Keyset pages of the UNION ALL timeline neither skip nor repeat events"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        day = date(2024, 5, 10)
+        at = timezone.make_aware(datetime(2024, 5, 10, 12, 0))
+        cls.appointments = [
+            Appointment.objects.create(patient=cls.patient, date_time=at + timedelta(minutes=index))
+            for index in range(3)
+        ]
+        cls.fichas = [FichaClinica.objects.create(patient=cls.patient, fecha=day) for _ in range(3)]
+        cls.older = Appointment.objects.create(patient=cls.patient, date_time=at - timedelta(days=1))
+
+        cls.stranger = User.objects.create_user('stranger', password='pw')
+        cls.foreign_patient = Patient.objects.create(
+            user=cls.stranger, full_name='Paciente Ajeno', birth_date=date(1990, 1, 1),
+        )
+        cls.foreign_ficha = FichaClinica.objects.create(patient=cls.foreign_patient, fecha=day)
+
+    def expected(self):
+        return (
+            [(timeline.FICHA, ficha.pk) for ficha in reversed(self.fichas)]
+            + [(timeline.APPOINTMENT, appointment.pk) for appointment in reversed(self.appointments)]
+            + [(timeline.APPOINTMENT, self.older.pk)]
+        )
+
+    def walk(self, size):
+        seen, cursor = [], None
+        while True:
+            events, next_cursor = timeline.page(self.patient.pk, timeline.decode_cursor(cursor), size=size)
+            seen.extend((event['kind'], event['pk']) for event in events)
+            if next_cursor is None:
+                return seen
+            cursor = next_cursor
+
+    def test_every_page_size_yields_each_event_once(self):
+        # Con tamaño 2 y 4 los cortes caen dentro de un mismo día y entre ramas del UNION
+        for size in (1, 2, 4, 7, 20):
+            with self.subTest(size=size):
+                self.assertEqual(self.walk(size), self.expected())
+
+    def test_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            timeline.page(self.patient.pk, (date(2024, 5, 10), timeline.FICHA, self.fichas[1].pk), size=2)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        url = f'/patients/{self.patient.pk}/timeline/'
+        first = self.client.get(url, HTTP_HX_REQUEST='true').content
+        for cursor in ('garbage', '2024-05-10.secret.1', '2024-13-40.ficha.1', '2024-05-10.ficha.abc', '1.2.3.4'):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(timeline.decode_cursor(cursor))
+                response = self.client.get(url, {'cursor': cursor}, HTTP_HX_REQUEST='true')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, first)
+
+    def test_foreign_cursor_only_positions_within_own_timeline(self):
+        cursor = timeline.encode_cursor({'day': date(2024, 5, 10), 'kind': timeline.FICHA, 'pk': self.foreign_ficha.pk})
+        events, _ = timeline.page(self.patient.pk, timeline.decode_cursor(cursor))
+        self.assertTrue(events)
+        self.assertNotIn(self.foreign_ficha.pk, [event['pk'] for event in events if event['kind'] == timeline.FICHA])
+        self.assertTrue(all(
+            Appointment.objects.filter(pk=event['pk'], patient=self.patient).exists()
+            if event['kind'] == timeline.APPOINTMENT
+            else FichaClinica.objects.filter(pk=event['pk'], patient=self.patient).exists()
+            for event in events
+        ))
+        response = self.client.get(f'/patients/{self.foreign_patient.pk}/timeline/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class FichaDiffTests(LoggedInTestCase):
+    """Ficha comparison groups changes by section and stays within the patient"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.first = FichaClinica.objects.create(patient=cls.patient, fecha=date(2024, 1, 10), consultation_reason='Dolor')
+        cls.second = FichaClinica.objects.create(
+            patient=cls.patient, fecha=date(2024, 3, 10), consultation_reason='Dolor', smoking='si', iue=True,
+        )
+        cls.third = FichaClinica.objects.create(
+            patient=cls.patient, fecha=date(2024, 6, 10), consultation_reason='Control', smoking='si', iue=False,
+        )
+        stranger = User.objects.create_user('stranger', password='pw')
+        cls.foreign_patient = Patient.objects.create(user=stranger, full_name='Paciente Ajeno', birth_date=date(1990, 1, 1))
+        cls.foreign_ficha = FichaClinica.objects.create(patient=cls.foreign_patient, fecha=date(2024, 2, 1))
+        cls.url = f'/patients/{cls.patient.pk}/fichas-clinicas/diff.json'
+
+    def test_changes_are_grouped_by_section_in_form_order(self):
+        # Pasadas en orden inverso: la más antigua queda igual como "older"
+        data = self.client.get(self.url, {'a': self.second.pk, 'b': self.first.pk}).json()
+        self.assertEqual((data['older']['id'], data['newer']['id']), (self.first.pk, self.second.pk))
+        self.assertEqual(
+            [(section['section'], [change['field'] for change in section['changes']]) for section in data['sections']],
+            [
+                ('Fecha de la Ficha Clínica', ['fecha']),
+                ('Hábitos de Vida', ['smoking']),
+                ('Incontinencia Orina', ['iue']),
+            ],
+        )
+        smoking = data['sections'][1]['changes'][0]
+        self.assertEqual((smoking['label'], smoking['old'], smoking['new']), ('Fuma', '—', 'Sí'))
+        iue = data['sections'][2]['changes'][0]
+        self.assertEqual((iue['old'], iue['new']), ('No', 'Sí'))
+
+    def test_default_pair_is_the_two_latest(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['older']['id'], data['newer']['id']), (self.second.pk, self.third.pk))
+        self.assertEqual(
+            [section['section'] for section in data['sections']],
+            ['Fecha de la Ficha Clínica', 'Motivo de Consulta', 'Incontinencia Orina'],
+        )
+
+    def test_history_summary_counts_changes_per_transition(self):
+        with self.assertNumQueries(1):
+            history = ficha_diff.history_summary(self.patient.pk)
+        self.assertEqual([ficha['pk'] for ficha in history['fichas']], [self.first.pk, self.second.pk, self.third.pk])
+        self.assertEqual(
+            [(transition['changed'], transition['sections']) for transition in history['transitions']],
+            [
+                (2, {'Hábitos de Vida': 1, 'Incontinencia Orina': 1}),
+                (2, {'Motivo de Consulta': 1, 'Incontinencia Orina': 1}),
+            ],
+        )
+        self.assertEqual(
+            [(field['field'], field['count']) for field in history['fields']],
+            [('iue', 2), ('consultation_reason', 1), ('smoking', 1)],
+        )
+        data = self.client.get(self.url, {'history': 1}).json()
+        self.assertEqual(len(data['history']['transitions']), 2)
+
+    def test_foreign_or_malformed_fichas_are_not_found(self):
+        for params in ({'a': self.first.pk, 'b': self.foreign_ficha.pk}, {'a': 'x', 'b': self.first.pk}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 404)
+        page = self.client.get(
+            f'/patients/{self.patient.pk}/fichas-clinicas/diff/', {'a': self.first.pk, 'b': self.foreign_ficha.pk},
+        )
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(page.context['sections'], [])
+        foreign_url = f'/patients/{self.foreign_patient.pk}/fichas-clinicas/diff.json'
+        self.assertEqual(self.client.get(foreign_url).status_code, 404)
+
+
+class FichaCopyLatestTests(LoggedInTestCase):
+    """Copying the latest ficha is one INSERT with today's date"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/patients/{self.patient.pk}/fichas-clinicas/copy-latest/'
+
+    def test_copies_the_latest_ficha_with_a_new_date(self):
+        FichaClinica.objects.create(patient=self.patient, fecha=date(2024, 1, 10), consultation_reason='Antigua')
+        latest = FichaClinica.objects.create(
+            patient=self.patient, fecha=date(2024, 6, 10), consultation_reason='Control', smoking='si', iue=True,
+        )
+        with CaptureQueriesContext(connection) as queries:
+            ficha, source_fecha = FichaClinica.copy_latest(self.patient)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(sum(query['sql'].startswith('INSERT') for query in queries.captured_queries), 1)
+
+        self.assertEqual(source_fecha, latest.fecha)
+        ficha.refresh_from_db()
+        self.assertNotEqual(ficha.pk, latest.pk)
+        self.assertEqual(ficha.patient, self.patient)
+        self.assertEqual(ficha.fecha, timezone.localdate())
+        self.assertEqual((ficha.consultation_reason, ficha.smoking, ficha.iue), ('Control', 'si', True))
+        self.assertGreater(ficha.created_at, latest.created_at)
+
+    def test_view_opens_the_copy_for_editing(self):
+        FichaClinica.objects.create(patient=self.patient, fecha=date(2024, 6, 10))
+        response = self.client.post(self.url)
+        ficha = FichaClinica.objects.filter(patient=self.patient).latest('created_at')
+        self.assertRedirects(
+            response, f'/patients/{self.patient.pk}/fichas-clinicas/{ficha.pk}/edit/', fetch_redirect_response=False,
+        )
+        self.assertEqual(FichaClinica.objects.filter(patient=self.patient).count(), 2)
+
+    def test_get_does_not_copy(self):
+        FichaClinica.objects.create(patient=self.patient, fecha=date(2024, 6, 10))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(FichaClinica.objects.filter(patient=self.patient).count(), 1)
+
+    def test_without_fichas_redirects_to_the_create_form(self):
+        self.assertEqual(FichaClinica.copy_latest(self.patient), (None, None))
+        response = self.client.post(self.url, follow=True)
+        self.assertRedirects(response, f'/patients/{self.patient.pk}/fichas-clinicas/add/')
+        self.assertContains(response, 'no tiene una ficha clínica anterior')
+        self.assertFalse(FichaClinica.objects.exists())
+
+    def test_foreign_patient_is_not_found(self):
+        stranger = User.objects.create_user('stranger', password='pw')
+        foreign = Patient.objects.create(user=stranger, full_name='Paciente Ajeno', birth_date=date(1990, 1, 1))
+        FichaClinica.objects.create(patient=foreign, fecha=date(2024, 6, 10))
+        response = self.client.post(f'/patients/{foreign.pk}/fichas-clinicas/copy-latest/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(FichaClinica.objects.filter(patient=foreign).count(), 1)
+
+
+class ApiTests(LoggedInTestCase):
+    """JSON API projection, signed cursors and ownership"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.patients = [cls.patient] + [
+            Patient.objects.create(user=cls.user, full_name=f'Paciente {index}', birth_date=date(1990, 1, 1))
+            for index in range(4)
+        ]
+        stranger = User.objects.create_user('stranger', password='pw')
+        cls.foreign_patient = Patient.objects.create(user=stranger, full_name='Paciente Ajeno', birth_date=date(1990, 1, 1))
+        cls.foreign_appointment = Appointment.objects.create(patient=cls.foreign_patient, date_time=timezone.now())
+
+    def test_fields_projects_the_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/patients/', {'fields': 'full_name, phone'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'full_name', 'phone'])
+        select = next(query['sql'] for query in queries.captured_queries if 'core_patient' in query['sql'])
+        self.assertNotIn('birth_date', select)
+
+        detail = self.client.get(f'/api/v1/patients/{self.patient.pk}/', {'fields': 'birth_date'}).json()
+        self.assertEqual(detail['result'], {'id': self.patient.pk, 'birth_date': '1990-01-01'})
+
+    def test_unknown_or_hidden_fields_are_rejected(self):
+        for fields in ('nope', 'full_name,user_id', 'user'):
+            with self.subTest(fields=fields):
+                response = self.client.get('/api/v1/patients/', {'fields': fields})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Unknown fields', response.json()['error'])
+
+    def test_cursor_pages_cover_every_row_once(self):
+        ids, params = [], {'limit': 2}
+        while True:
+            data = self.client.get('/api/v1/patients/', params).json()
+            ids.extend(row['id'] for row in data['results'])
+            if not data['next_cursor']:
+                break
+            params = {'limit': 2, 'cursor': data['next_cursor']}
+        self.assertEqual(ids, sorted(patient.pk for patient in self.patients))
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = self.client.get('/api/v1/patients/', {'limit': 2}).json()['next_cursor']
+        for tampered in (cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B'), '0', api.encode_cursor(0) + 'x'):
+            with self.subTest(cursor=tampered):
+                response = self.client.get('/api/v1/patients/', {'cursor': tampered})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_other_users_rows_are_not_found(self):
+        self.assertEqual(self.client.get(f'/api/v1/patients/{self.foreign_patient.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/appointments/{self.foreign_appointment.pk}/').status_code, 404)
+        listed = self.client.get('/api/v1/patients/', {'limit': 200}).json()['results']
+        self.assertNotIn(self.foreign_patient.pk, [row['id'] for row in listed])
+        filtered = self.client.get('/api/v1/appointments/', {'patient': self.foreign_patient.pk}).json()
+        self.assertEqual(filtered['results'], [])
+        # Un cursor válido no salta el filtro de propiedad
+        data = self.client.get('/api/v1/patients/', {'cursor': api.encode_cursor(0), 'limit': 200}).json()
+        self.assertNotIn(self.foreign_patient.pk, [row['id'] for row in data['results']])
+
+    def test_errors_are_json(self):
+        self.assertEqual(self.client.get('/api/v1/patients/', {'limit': 'x'}).status_code, 400)
+        self.client.logout()
+        response = self.client.get('/api/v1/patients/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'error': 'Authentication required'})
+
+
+class CsvImportTests(LoggedInTestCase):
+    """CSV import validates rows by line, maps patient keys and refreshes caches"""
+
+    def setUp(self):
+        super().setUp()
+        caches[progress.CACHE_ALIAS].clear()
+
+    @staticmethod
+    def csv(text):
+        return io.BytesIO(text.encode())
+
+    def test_invalid_rows_are_reported_by_line_and_skipped(self):
+        result = imports.run(self.user, patients_file=self.csv(
+            'key;full_name;birth_date\n'
+            'a;Ana Pérez;15/03/1980\n'
+            'b;X;1980-01-01\n'
+            'c;Carla Soto;2999-01-01\n'
+            'a;Ana Repetida;1980-01-01\n'
+            'd;Dora Díaz;no es fecha\n'
+        ))
+        self.assertEqual(result.patients, 1)
+        self.assertEqual(
+            [(error['line'], error['column']) for error in result.errors],
+            [(3, 'full_name'), (4, 'birth_date'), (5, 'key'), (6, 'birth_date')],
+        )
+        self.assertEqual(Patient.objects.get(full_name='Ana Pérez').birth_date, date(1980, 3, 15))
+
+    def test_appointments_attach_through_keys_and_owned_ids(self):
+        stranger = User.objects.create_user('stranger', password='pw')
+        foreign = Patient.objects.create(user=stranger, full_name='Paciente Ajeno', birth_date=date(1990, 1, 1))
+        result = imports.run(
+            self.user,
+            patients_file=self.csv('key,full_name,birth_date\nk1,Berta Ruiz,1985-02-02\n'),
+            appointments_file=self.csv(
+                'patient_key,patient_id,date_time,session_description,perfect_p_power\n'
+                'k1,,2024-05-10 10:00,Primera,3\n'
+                f',{self.patient.pk},10/05/2024 11:00,Control,4\n'
+                'k9,,2024-05-10 12:00,Clave mala,\n'
+                f',{foreign.pk},2024-05-10 13:00,Ajeno,\n'
+                f',{self.patient.pk},2024-05-10 14:00,Fuera de rango,11\n'
+            ),
+        )
+        self.assertEqual((result.patients, result.appointments), (1, 2))
+        self.assertEqual(
+            [(error['file'], error['line'], error['column']) for error in result.errors],
+            [
+                ('appointments', 4, 'patient_key'),
+                ('appointments', 6, 'perfect_p_power'),
+                ('appointments', 5, 'patient_id'),
+            ],
+        )
+        berta = Patient.objects.get(full_name='Berta Ruiz')
+        self.assertEqual(berta.user, self.user)
+        self.assertEqual(list(berta.appointments.values_list('session_description', flat=True)), ['Primera'])
+        self.assertEqual(self.patient.appointments.get().session_description, 'Control')
+        self.assertFalse(foreign.appointments.exists())
+
+    def test_unknown_columns_reject_the_file(self):
+        with self.assertRaises(imports.ImportFileError):
+            imports.run(self.user, patients_file=self.csv('full_name,birth_date,password\nAna,1980-01-01,x\n'))
+        self.assertEqual(Patient.objects.count(), 1)
+
+    def test_import_invalidates_cached_fragments(self):
+        progress.get_series(self.patient.pk)
+        hover_cards.render_card(self.user.pk, self.patient.pk)
+        progress_key = progress.cache_key(self.patient.pk)
+        card_key = hover_cards.cache_key(self.user.pk, self.patient.pk)
+        shared = caches[progress.CACHE_ALIAS]
+        self.assertIsNotNone(shared.get(progress_key))
+        self.assertIsNotNone(shared.get(card_key))
+
+        text = f'patient_id,date_time,session_description\n{self.patient.pk},2024-05-10 10:00,Sesión\n'
+        imports.run(self.user, appointments_file=self.csv(text), dry_run=True)
+        self.assertIsNotNone(shared.get(progress_key))
+
+        result = imports.run(self.user, appointments_file=self.csv(text))
+        self.assertEqual(result.appointments, 1)
+        self.assertIsNone(shared.get(progress_key))
+        self.assertIsNone(shared.get(card_key))
+        self.assertEqual(len(progress.get_series(self.patient.pk)['sessions']), 1)
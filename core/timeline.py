@@ -0,0 +1,104 @@
+"""
+Línea de tiempo del paciente: citas y fichas clínicas en una sola lista.
+
+Cada página sale de una sola consulta ``UNION ALL`` de dos proyecciones
+angostas (día, tipo, id, hora, resumen) ordenada por ``(día, tipo, id)``
+descendente. La paginación es por cursor sobre esa misma clave (keyset), así
+que abrir la página 50 cuesta lo mismo que la primera. El detalle completo de
+cada evento se pide aparte solo cuando se despliega.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import CharField, DateTimeField, Q, Value
+from django.db.models.functions import Substr, TruncDate
+from django.utils import timezone
+
+from .models import Appointment, FichaClinica
+
+PAGE_SIZE = 20
+SUMMARY_LENGTH = 160
+
+APPOINTMENT = 'appointment'
+FICHA = 'ficha'
+KINDS = (APPOINTMENT, FICHA)
+
+
+def encode_cursor(event):
+    return f"{event['day'].isoformat()}.{event['kind']}.{event['pk']}"
+
+
+def decode_cursor(cursor):
+    """(day, kind, pk) from a cursor string, or None if it is missing or malformed"""
+    try:
+        day, kind, pk = cursor.split('.')
+        if kind not in KINDS:
+            return None
+        return date.fromisoformat(day), kind, int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _before(kind, cursor, day_filter):
+    """
+    Rows of one branch (constant `kind`) that sort after the cursor in
+    (day, kind, pk) descending order.
+    """
+    if cursor is None:
+        return Q()
+    day, cursor_kind, pk = cursor
+    earlier_day = day_filter('lt', day)
+    if kind < cursor_kind:
+        return earlier_day | day_filter('eq', day)
+    if kind == cursor_kind:
+        return earlier_day | (day_filter('eq', day) & Q(pk__lt=pk))
+    return earlier_day
+
+
+def _appointment_day(op, day):
+    # Rango sobre date_time (usa el índice patient/-date_time) en vez de comparar TruncDate
+    if op == 'lt':
+        return Q(date_time__lt=_day_start(day))
+    return Q(date_time__gte=_day_start(day), date_time__lt=_day_start(day + timedelta(days=1)))
+
+
+def _ficha_day(op, day):
+    return Q(fecha__lt=day) if op == 'lt' else Q(fecha=day)
+
+
+def page(patient_id, cursor=None, size=PAGE_SIZE):
+    """One page of events, newest first, and the cursor of the next page (or None)"""
+    appointments = (
+        Appointment.objects
+        .filter(Q(patient_id=patient_id) & _before(APPOINTMENT, cursor, _appointment_day))
+        .order_by()
+        .annotate(
+            day=TruncDate('date_time'),
+            kind=Value(APPOINTMENT, output_field=CharField()),
+            summary=Substr('session_description', 1, SUMMARY_LENGTH),
+        )
+        .values_list('day', 'kind', 'pk', 'date_time', 'summary')
+    )
+    fichas = (
+        FichaClinica.objects
+        .filter(Q(patient_id=patient_id) & _before(FICHA, cursor, _ficha_day))
+        .order_by()
+        .annotate(
+            kind=Value(FICHA, output_field=CharField()),
+            at=Value(None, output_field=DateTimeField()),
+            summary=Substr('consultation_reason', 1, SUMMARY_LENGTH),
+        )
+        .values_list('fecha', 'kind', 'pk', 'at', 'summary')
+    )
+    rows = list(appointments.union(fichas, all=True).order_by('-day', '-kind', '-pk')[:size + 1])
+
+    events = [
+        {'day': day, 'kind': kind, 'pk': pk, 'at': at, 'summary': summary}
+        for day, kind, pk, at, summary in rows[:size]
+    ]
+    next_cursor = encode_cursor(events[-1]) if len(rows) > size else None
+    return events, next_cursor
+
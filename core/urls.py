@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, sync, views
 
 urlpatterns = [
     # Authentication URLs
@@ -9,13 +9,34 @@ urlpatterns = [
     
     # Dashboard
     path('', views.dashboard, name='dashboard'),
+
+    # Analytics
+    path('analytics/', views.analytics_dashboard, name='analytics_dashboard'),
+    path('analytics/rollup/', views.analytics_rollup_enqueue, name='analytics_rollup_enqueue'),
+
+    # Calendario (core.agenda)
+    path('calendar/', views.calendar_agenda, name='calendar_agenda'),
+    path('calendar/week/', views.calendar_week, name='calendar_week'),
+    path('calendar/month/', views.calendar_month, name='calendar_month'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+
+    # Monitoring
+    path('metrics', views.metrics, name='metrics'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<int:pk>/', views.profile_detail, name='profile_detail'),
     
     # Patient URLs
     path('patients/', views.patient_list, name='patient_list'),
     path('patients/add/', views.patient_create, name='patient_create'),
     path('patients/<int:pk>/', views.patient_detail, name='patient_detail'),
+    path('patients/<int:pk>/hover-card/', views.patient_hover_card, name='patient_hover_card'),
+    path('patients/<int:pk>/timeline/', views.patient_timeline, name='patient_timeline'),
+    path('patients/<int:pk>/timeline/<str:kind>/<int:event_pk>/', views.patient_timeline_event, name='patient_timeline_event'),
+    path('patients/<int:pk>/dossier/', views.patient_dossier, name='patient_dossier'),
     path('patients/<int:pk>/edit/', views.patient_update, name='patient_update'),
     path('patients/<int:pk>/delete/', views.patient_delete, name='patient_delete'),
+    path('patients/<int:pk>/progress/', views.patient_progress, name='patient_progress'),
+    path('patients/<int:pk>/progress.json', views.patient_progress_data, name='patient_progress_data'),
     
     # Appointment URLs
     path('patients/<int:patient_id>/appointments/add/', views.appointment_create, name='appointment_create'),
@@ -26,7 +47,34 @@ urlpatterns = [
     # Clinical Records (Fichas Clínicas) URLs
     path('patients/<int:patient_pk>/fichas-clinicas/', views.ficha_clinica_list, name='ficha_clinica_list'),
     path('patients/<int:patient_pk>/fichas-clinicas/add/', views.ficha_clinica_create, name='ficha_clinica_create'),
+    path('patients/<int:patient_pk>/fichas-clinicas/copy-latest/', views.ficha_clinica_copy_latest, name='ficha_clinica_copy_latest'),
+    path('patients/<int:patient_pk>/fichas-clinicas/diff/', views.ficha_clinica_diff, name='ficha_clinica_diff'),
+    path('patients/<int:patient_pk>/fichas-clinicas/diff.json', views.ficha_clinica_diff_data, name='ficha_clinica_diff_data'),
     path('patients/<int:patient_pk>/fichas-clinicas/<int:pk>/', views.ficha_clinica_detail, name='ficha_clinica_detail'),
     path('patients/<int:patient_pk>/fichas-clinicas/<int:pk>/edit/', views.ficha_clinica_update, name='ficha_clinica_update'),
     path('patients/<int:patient_pk>/fichas-clinicas/<int:pk>/delete/', views.ficha_clinica_delete, name='ficha_clinica_delete'),
-]
\ No newline at end of file
+
+    # Exportación
+    path('export/', views.export_page, name='export_page'),
+    path('export/download/', views.export_download, name='export_download'),
+    path('export/background/', views.export_enqueue, name='export_enqueue'),
+
+    # Importación
+    path('import/', views.import_page, name='import_page'),
+
+    # Trabajos en segundo plano (core.jobs)
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+
+    # API JSON v1 (core.api)
+    path('api/v1/patients/', api.resource_list, {'resource_name': 'patients'}, name='api_patients_list'),
+    path('api/v1/patients/<int:pk>/', api.resource_detail, {'resource_name': 'patients'}, name='api_patients_detail'),
+    path('api/v1/appointments/', api.resource_list, {'resource_name': 'appointments'}, name='api_appointments_list'),
+    path('api/v1/appointments/<int:pk>/', api.resource_detail, {'resource_name': 'appointments'}, name='api_appointments_detail'),
+    path('api/v1/fichas/', api.resource_list, {'resource_name': 'fichas'}, name='api_fichas_list'),
+    path('api/v1/fichas/<int:pk>/', api.resource_detail, {'resource_name': 'fichas'}, name='api_fichas_detail'),
+    path('api/v1/sync/', sync.sync_changes, name='api_sync_changes'),
+    path('api/v1/sync/push/', sync.sync_push, name='api_sync_push'),
+]
@@ -1,8 +1,35 @@
+import hmac
+from datetime import date, timedelta
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
 from django.db.models import Max, Q
-from .models import Patient, Appointment, FichaClinica
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from .models import Patient, Appointment, FichaClinica, Job, RequestProfile, WeeklyPracticeStats
+from . import metrics as metrics_registry
+from . import agenda
+from . import analytics
+from . import conditional
+from . import dossier
+from . import exports
+from . import files
+from . import imports
+from . import jobs
+from . import ficha_diff
+from . import fragments
+from . import hover_cards
+from .loaders import get_owned_appointment, get_owned_ficha, get_owned_patient
+from . import profiling
+from . import progress
+from . import timeline
 
 @login_required
 def patient_list(request):
@@ -18,7 +45,7 @@ def patient_list(request):
         'total_patients': total_patients,
         'query': query,
     }
-    return render(request, 'patients/patient_list.html', context)
+    return fragments.render_page(request, 'patients/patient_list.html', 'patients/patient_table.html', context)
 from .forms import PatientForm, AppointmentForm, FichaClinicaForm
 
 @login_required
@@ -28,8 +55,10 @@ def dashboard(request):
     sort_by = request.GET.get('sort', 'name')
     sort_order = request.GET.get('order', 'asc')
     
-    # Get user's patients que no han sido dados de alta
-    patients = Patient.objects.filter(user=request.user, alta=False)
+    # Get user's patients que no han sido dados de alta, con la fecha de su última cita
+    patients = Patient.objects.filter(user=request.user, alta=False).annotate(
+        last_appointment=Max('appointments__date_time')
+    )
     
     # Apply sorting
     if sort_by == 'name':
@@ -39,15 +68,13 @@ def dashboard(request):
             patients = patients.order_by('full_name')
     elif sort_by == 'appointment':
         # Sort by last appointment date
-        patients = patients.annotate(
-            last_appointment=Max('appointments__date_time')
-        ).order_by('-last_appointment')
+        patients = patients.order_by('-last_appointment')
     
-    # Get some statistics
-    total_patients = patients.count()
+    # Get some statistics (la respuesta parcial solo muestra la grilla)
+    total_patients = None if fragments.wants_fragment(request) else patients.count()
     recent_appointments = Appointment.objects.filter(
         patient__user=request.user
-    ).order_by('-date_time')[:5]
+    ).select_related('patient').order_by('-date_time')[:5]
     
     context = {
         'user': request.user,
@@ -58,7 +85,16 @@ def dashboard(request):
         'current_order': sort_order,
     }
     
-    return render(request, 'dashboard/dashboard.html', context)
+    return fragments.render_page(request, 'dashboard/dashboard.html', 'dashboard/patient_grid.html', context)
+
+
+@login_required
+def patient_hover_card(request, pk):
+    """Dashboard hover card fragment, fetched on first hover"""
+    html = hover_cards.render_card(request.user.pk, pk)
+    if html is None:
+        raise Http404
+    return HttpResponse(html)
 
 
 @login_required
@@ -79,9 +115,10 @@ def patient_create(request):
 
 
 @login_required
+@conditional.conditional_page(conditional.patient_last_modified)
 def patient_detail(request, pk):
     """View patient details with appointment history and latest clinical record"""
-    patient = get_object_or_404(Patient, pk=pk, user=request.user)
+    patient = get_owned_patient(request, pk)
     appointments = patient.appointments.all()
     
     # Get the latest clinical record
@@ -102,7 +139,7 @@ def patient_detail(request, pk):
 @login_required
 def patient_update(request, pk):
     """Update patient information"""
-    patient = get_object_or_404(Patient, pk=pk, user=request.user)
+    patient = get_owned_patient(request, pk)
     
     if request.method == 'POST':
         print(request.POST)  # Debugging line to check POST data
@@ -127,7 +164,7 @@ def patient_update(request, pk):
 @login_required
 def patient_delete(request, pk):
     """Delete patient with confirmation"""
-    patient = get_object_or_404(Patient, pk=pk, user=request.user)
+    patient = get_owned_patient(request, pk)
     
     if request.method == 'POST':
         patient_name = patient.full_name
@@ -146,7 +183,7 @@ def patient_delete(request, pk):
 @login_required
 def appointment_create(request, patient_id):
     """Create a new appointment for a specific patient"""
-    patient = get_object_or_404(Patient, pk=patient_id, user=request.user)
+    patient = get_owned_patient(request, patient_id)
     
     if request.method == 'POST':
         form = AppointmentForm(request.POST)
@@ -169,7 +206,7 @@ def appointment_create(request, patient_id):
 @login_required
 def appointment_update(request, pk):
     """Update appointment information"""
-    appointment = get_object_or_404(Appointment, pk=pk, patient__user=request.user)
+    appointment = get_owned_appointment(request, pk)
     
     if request.method == 'POST':
         form = AppointmentForm(request.POST, instance=appointment)
@@ -188,9 +225,10 @@ def appointment_update(request, pk):
 
 
 @login_required
+@conditional.conditional_page(conditional.appointment_last_modified)
 def appointment_detail(request, pk):
     """View appointment details"""
-    appointment = get_object_or_404(Appointment, pk=pk, patient__user=request.user)
+    appointment = get_owned_appointment(request, pk)
     
     context = {
         'appointment': appointment,
@@ -202,7 +240,7 @@ def appointment_detail(request, pk):
 @login_required
 def appointment_delete(request, pk):
     """Delete appointment with confirmation"""
-    appointment = get_object_or_404(Appointment, pk=pk, patient__user=request.user)
+    appointment = get_owned_appointment(request, pk)
     patient = appointment.patient
     
     if request.method == 'POST':
@@ -218,6 +256,86 @@ def appointment_delete(request, pk):
     return render(request, 'appointments/appointment_confirm_delete.html', context)
 
 
+@login_required
+def patient_progress(request, pk):
+    """PERFECT score evolution (charts + table) for a patient"""
+    patient = get_owned_patient(request, pk)
+    series = progress.get_series(patient.pk)
+
+    context = {
+        'patient': patient,
+        'series': series,
+        'sessions': reversed(series['sessions']),
+        'numeric_labels': list(progress.NUMERIC_SCORES),
+    }
+    return render(request, 'patients/patient_progress.html', context)
+
+
+@login_required
+def patient_progress_data(request, pk):
+    """PERFECT score evolution as JSON"""
+    patient = get_owned_patient(request, pk)
+    return JsonResponse(progress.get_series(patient.pk))
+
+
+@login_required
+def patient_timeline(request, pk):
+    """Appointments and clinical records in one date-ordered, keyset-paginated list"""
+    patient = get_owned_patient(request, pk)
+    cursor = timeline.decode_cursor(request.GET.get('cursor'))
+    events, next_cursor = timeline.page(patient.pk, cursor)
+
+    context = {
+        'patient': patient,
+        'events': events,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+    }
+    return fragments.render_page(request, 'patients/patient_timeline.html', 'patients/timeline_events.html', context)
+
+
+@login_required
+def patient_timeline_event(request, pk, kind, event_pk):
+    """Full detail of one timeline event, loaded when it is expanded"""
+    if kind == timeline.APPOINTMENT:
+        appointment = get_owned_appointment(request, event_pk)
+        if appointment.patient_id != pk:
+            raise Http404
+        return render(request, 'patients/timeline_appointment.html', {'appointment': appointment})
+    if kind == timeline.FICHA:
+        ficha = get_owned_ficha(request, pk, event_pk)
+        return render(request, 'patients/timeline_ficha.html', {'ficha': ficha})
+    raise Http404
+
+
+@login_required
+def analytics_dashboard(request):
+    """Practice-wide outcomes, read only from the analytics aggregate tables"""
+    try:
+        sessions = int(request.GET.get('sessions', 8))
+    except ValueError:
+        sessions = 8
+    sessions = max(2, min(sessions, analytics.MAX_TRACKED_SESSIONS))
+
+    outcomes = analytics.outcome_summary(request.user, sessions=sessions)
+    weekly = analytics.weekly_summary(request.user)
+    cohorts = [
+        {
+            'key': key,
+            'label': label,
+            'outcome': outcomes[key],
+            'weeks': list(reversed(weekly[key])),
+        }
+        for key, label in WeeklyPracticeStats.COHORT_CHOICES
+    ]
+
+    context = {
+        'cohorts': cohorts,
+        'sessions': sessions,
+    }
+    return render(request, 'analytics/analytics_dashboard.html', context)
+
+
 # ==============================================
 # FICHAS CLÍNICAS VIEWS
 # ==============================================
@@ -225,7 +343,7 @@ def appointment_delete(request, pk):
 @login_required
 def ficha_clinica_list(request, patient_pk):
     """List all clinical records for a patient"""
-    patient = get_object_or_404(Patient, pk=patient_pk, user=request.user)
+    patient = get_owned_patient(request, patient_pk)
     fichas = patient.fichas_clinicas.all()
     
     context = {
@@ -236,10 +354,11 @@ def ficha_clinica_list(request, patient_pk):
 
 
 @login_required
+@conditional.conditional_page(conditional.ficha_last_modified)
 def ficha_clinica_detail(request, patient_pk, pk):
     """View clinical record details"""
-    patient = get_object_or_404(Patient, pk=patient_pk, user=request.user)
-    ficha = get_object_or_404(FichaClinica, pk=pk, patient=patient)
+    ficha = get_owned_ficha(request, patient_pk, pk)
+    patient = ficha.patient
     
     context = {
         'patient': patient,
@@ -248,10 +367,56 @@ def ficha_clinica_detail(request, patient_pk, pk):
     return render(request, 'fichas_clinicas/ficha_clinica_detail.html', context)
 
 
+def _ficha_pair(request, patient):
+    """Fichas chosen with ?a=&b= (default: the two latest), or 404"""
+    try:
+        first = int(request.GET['a']) if request.GET.get('a') else None
+        second = int(request.GET['b']) if request.GET.get('b') else None
+    except ValueError:
+        raise Http404
+    return ficha_diff.load_pair(patient.pk, first, second)
+
+
+@login_required
+def ficha_clinica_diff(request, patient_pk):
+    """Changed fields between two clinical records, plus the whole-history summary"""
+    patient = get_owned_patient(request, patient_pk)
+    pair = _ficha_pair(request, patient)
+    history = ficha_diff.history_summary(patient.pk)
+
+    context = {
+        'patient': patient,
+        'older': pair[0] if pair else None,
+        'newer': pair[1] if pair else None,
+        'sections': ficha_diff.diff(*pair) if pair else [],
+        'history': history,
+    }
+    return render(request, 'fichas_clinicas/ficha_clinica_diff.html', context)
+
+
+@login_required
+def ficha_clinica_diff_data(request, patient_pk):
+    """Diff between two clinical records as JSON (?history=1 adds the history summary)"""
+    patient = get_owned_patient(request, patient_pk)
+    pair = _ficha_pair(request, patient)
+    if pair is None:
+        raise Http404
+    older, newer = pair
+    data = {
+        'patient_id': patient.pk,
+        'older': {'id': older['pk'], 'fecha': older['fecha']},
+        'newer': {'id': newer['pk'], 'fecha': newer['fecha']},
+        'sections': ficha_diff.diff(older, newer),
+    }
+    if request.GET.get('history'):
+        data['history'] = ficha_diff.history_summary(patient.pk)
+    return JsonResponse(data)
+
+
 @login_required
 def ficha_clinica_create(request, patient_pk):
     """Create a new clinical record for a patient"""
-    patient = get_object_or_404(Patient, pk=patient_pk, user=request.user)
+    patient = get_owned_patient(request, patient_pk)
     
     if request.method == 'POST':
         form = FichaClinicaForm(request.POST)
@@ -272,11 +437,31 @@ def ficha_clinica_create(request, patient_pk):
     return render(request, 'fichas_clinicas/ficha_clinica_form.html', context)
 
 
+@login_required
+def ficha_clinica_copy_latest(request, patient_pk):
+    """Create a clinical record from the latest one and open it for editing"""
+    patient = get_owned_patient(request, patient_pk)
+    if request.method != 'POST':
+        return redirect('ficha_clinica_list', patient_pk=patient.pk)
+
+    ficha, source_fecha = FichaClinica.copy_latest(patient)
+    if ficha is None:
+        messages.error(request, 'El paciente no tiene una ficha clínica anterior para copiar.')
+        return redirect('ficha_clinica_create', patient_pk=patient.pk)
+
+    messages.success(
+        request,
+        f'Nueva ficha creada con los datos de la ficha del {source_fecha.strftime("%d/%m/%Y")}. '
+        'Revisa y actualiza los campos que cambiaron.'
+    )
+    return redirect('ficha_clinica_update', patient_pk=patient.pk, pk=ficha.pk)
+
+
 @login_required
 def ficha_clinica_update(request, patient_pk, pk):
     """Update an existing clinical record"""
-    patient = get_object_or_404(Patient, pk=patient_pk, user=request.user)
-    ficha = get_object_or_404(FichaClinica, pk=pk, patient=patient)
+    ficha = get_owned_ficha(request, patient_pk, pk)
+    patient = ficha.patient
     
     if request.method == 'POST':
         form = FichaClinicaForm(request.POST, instance=ficha)
@@ -299,8 +484,8 @@ def ficha_clinica_update(request, patient_pk, pk):
 @login_required
 def ficha_clinica_delete(request, patient_pk, pk):
     """Delete a clinical record"""
-    patient = get_object_or_404(Patient, pk=patient_pk, user=request.user)
-    ficha = get_object_or_404(FichaClinica, pk=pk, patient=patient)
+    ficha = get_owned_ficha(request, patient_pk, pk)
+    patient = ficha.patient
     
     if request.method == 'POST':
         ficha_date = ficha.created_at.strftime('%d/%m/%Y')
@@ -313,3 +498,296 @@ def ficha_clinica_delete(request, patient_pk, pk):
         'patient': patient,
     }
     return render(request, 'fichas_clinicas/ficha_clinica_confirm_delete.html', context)
+
+
+# ==============================================
+# CALENDARIO
+# ==============================================
+
+def _requested_day(request):
+    try:
+        return date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        return timezone.localdate()
+
+
+@login_required
+def calendar_agenda(request):
+    """Appointments of today and tomorrow across all the practitioner's patients"""
+    today = timezone.localdate()
+    days = agenda.by_day(agenda.appointments_between(request.user, today, today + timedelta(days=2)))
+    feed_url = request.build_absolute_uri(reverse('calendar_feed', args=[agenda.feed_token(request.user)]))
+    context = {
+        'days': [(day, label, days.get(day, [])) for day, label in ((today, 'Hoy'), (today + timedelta(days=1), 'Mañana'))],
+        'feed_url': feed_url,
+    }
+    return render(request, 'calendar/agenda.html', context)
+
+
+@login_required
+def calendar_week(request):
+    """Seven-day view of the week containing ?date=YYYY-MM-DD (default: today)"""
+    start = agenda.week_start(_requested_day(request))
+    context = {
+        'days': [(day, agenda.WEEKDAY_NAMES[day.weekday()], items) for day, items in agenda.week(request.user, start)],
+        'week_start': start,
+        'week_end': start + timedelta(days=6),
+        'previous_week': start - timedelta(days=7),
+        'next_week': start + timedelta(days=7),
+        'today': timezone.localdate(),
+    }
+    return render(request, 'calendar/week.html', context)
+
+
+@login_required
+def calendar_month(request):
+    """Month grid for the month containing ?date=YYYY-MM-DD (default: today)"""
+    first = _requested_day(request).replace(day=1)
+    context = {
+        'weeks': agenda.month(request.user, first.year, first.month),
+        'weekday_names': agenda.WEEKDAY_NAMES,
+        'month_name': agenda.MONTH_NAMES[first.month - 1],
+        'month_start': first,
+        'previous_month': (first - timedelta(days=1)).replace(day=1),
+        'next_month': (first + timedelta(days=31)).replace(day=1),
+        'today': timezone.localdate(),
+    }
+    return render(request, 'calendar/month.html', context)
+
+
+@require_GET
+def calendar_feed(request, token):
+    """
+    iCal feed of the token owner's appointments for calendar clients (no session).
+    Answers 304 from aggregate validators before reading any appointment.
+    """
+    user = agenda.feed_user(token)
+    if user is None:
+        raise Http404
+    etag, last_modified = agenda.feed_validator(user)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = StreamingHttpResponse(
+            agenda.feed_lines(
+                user, request.get_host(),
+                lambda pk: request.build_absolute_uri(reverse('appointment_detail', args=[pk])),
+            ),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="makimotion.ics"'
+    response.headers.setdefault('ETag', etag)
+    if timestamp is not None:
+        response.headers.setdefault('Last-Modified', http_date(timestamp))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# ==============================================
+# EXPORTACIÓN
+# ==============================================
+
+@login_required
+def export_page(request):
+    """Form to download the practitioner's records as CSV/JSONL"""
+    return render(request, 'exports/export_form.html', {
+        'resources': [('patients', 'Pacientes'), ('appointments', 'Citas'), ('fichas', 'Fichas Clínicas')],
+    })
+
+
+@login_required
+def export_download(request):
+    """Stream one resource of the practitioner's records, filtered by date range and status"""
+    name = request.GET.get('resource', '')
+    fmt = request.GET.get('format', 'csv')
+    if name not in exports.EXPORTS or fmt not in exports.FORMATS:
+        return HttpResponseBadRequest('Recurso o formato no válido.')
+    try:
+        filters = exports.parse_filters(
+            request.GET.get('date_from'), request.GET.get('date_to'), request.GET.get('status')
+        )
+    except ValueError:
+        return HttpResponseBadRequest('Filtros no válidos.')
+
+    response = StreamingHttpResponse(
+        exports.lines(name, fmt, request.user, **filters),
+        content_type=exports.CONTENT_TYPES[fmt],
+    )
+    filename = f'makimotion-{name}-{timezone.localdate():%Y-%m-%d}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ==============================================
+# IMPORTACIÓN
+# ==============================================
+
+@login_required
+def import_page(request):
+    """Upload patients/appointments CSV files; the import runs as a background job"""
+    if request.method == 'POST':
+        patients_file = request.FILES.get('patients')
+        appointments_file = request.FILES.get('appointments')
+        if patients_file is None and appointments_file is None:
+            messages.error(request, 'Selecciona al menos un archivo CSV.')
+        else:
+            # Los bloques ya guardados no se deshacen: reintentar duplicaría filas
+            job = jobs.enqueue(
+                'import_records', user=request.user, priority=10, max_attempts=1,
+                patients=jobs.save_upload(patients_file) if patients_file else None,
+                appointments=jobs.save_upload(appointments_file) if appointments_file else None,
+                dry_run=request.POST.get('dry_run') == 'on',
+            )
+            return redirect('job_detail', pk=job.pk)
+    context = {
+        'patient_columns': imports.PATIENTS.columns,
+        'appointment_columns': imports.APPOINTMENTS.columns,
+    }
+    return render(request, 'imports/import_form.html', context)
+
+
+# ==============================================
+# TRABAJOS EN SEGUNDO PLANO
+# ==============================================
+
+def _owned_job(request, pk):
+    return get_object_or_404(Job, pk=pk, user=request.user)
+
+
+@login_required
+def job_list(request):
+    """The practitioner's recent background jobs"""
+    user_jobs = Job.objects.filter(user=request.user).defer('payload', 'result', 'error')[:50]
+    return render(request, 'jobs/job_list.html', {'jobs': user_jobs})
+
+
+@login_required
+def job_detail(request, pk):
+    """Status, progress and result of a job; polls job_status while it runs"""
+    return render(request, 'jobs/job_detail.html', {'job': _owned_job(request, pk)})
+
+
+@login_required
+def job_status(request, pk):
+    job = _owned_job(request, pk)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'percent': job.progress_percent,
+        'message': job.progress_message,
+    })
+
+
+@login_required
+def job_download(request, pk):
+    """File produced by a finished job (exports)"""
+    job = _owned_job(request, pk)
+    filename = (job.result or {}).get('file')
+    if job.status != Job.SUCCEEDED or not filename:
+        raise Http404
+    name = jobs.file_name(job, filename)
+    storage = files.job_storage()
+    if not storage.exists(name):
+        raise Http404
+    return FileResponse(storage.open(name, 'rb'), as_attachment=True, filename=filename)
+
+
+@login_required
+def export_enqueue(request):
+    """Prepare a gzip-compressed export in the background"""
+    if request.method != 'POST':
+        return redirect('export_page')
+    name = request.POST.get('resource', '')
+    fmt = request.POST.get('format', 'csv')
+    filters = {key: request.POST.get(key) or None for key in ('date_from', 'date_to', 'status')}
+    try:
+        exports.parse_filters(**filters)
+    except ValueError:
+        name = None
+    if name not in exports.EXPORTS or fmt not in exports.FORMATS:
+        messages.error(request, 'Datos, formato o filtros no válidos.')
+        return redirect('export_page')
+    job = jobs.enqueue('export_records', user=request.user, resource=name, format=fmt, filters=filters)
+    return redirect('job_detail', pk=job.pk)
+
+
+@login_required
+def analytics_rollup_enqueue(request):
+    """Rebuild the practitioner's analytics tables in the background"""
+    if request.method != 'POST':
+        return redirect('analytics_dashboard')
+    job = jobs.enqueue('analytics_rollup', user=request.user, priority=-10)
+    return redirect('job_detail', pk=job.pk)
+
+
+@login_required
+@conditional.conditional_page(conditional.patient_last_modified)
+def patient_dossier(request, pk):
+    """Serve the cached printable dossier, or queue its rendering and show the job"""
+    patient = get_owned_patient(request, pk)
+    fmt = request.GET.get('format', 'html')
+    if fmt not in dossier.formats():
+        messages.error(request, 'El PDF requiere WeasyPrint instalado en el servidor.')
+        return redirect('patient_detail', pk=patient.pk)
+
+    dossier_version = dossier.version(conditional.latest_patient_change(request.user.pk, patient.pk))
+    name = dossier.file_name(patient.pk, dossier_version, fmt)
+    storage = files.job_storage()
+    if storage.exists(name):
+        filename = f'dossier-{patient.pk}-{timezone.localdate():%Y-%m-%d}.{fmt}'
+        return FileResponse(
+            storage.open(name, 'rb'), content_type=dossier.CONTENT_TYPES[fmt],
+            as_attachment=fmt == 'pdf', filename=filename,
+        )
+
+    # Reusar el trabajo pendiente si ya se pidió (doble clic, recargas)
+    payload = {'patient_id': patient.pk, 'format': fmt}
+    job = (
+        Job.objects.filter(user=request.user, name='render_dossier', status__in=(Job.QUEUED, Job.RUNNING), payload=payload)
+        .order_by('-pk').first()
+    )
+    if job is None:
+        job = jobs.enqueue('render_dossier', user=request.user, priority=5, **payload)
+    return redirect('job_detail', pk=job.pk)
+
+
+# ==============================================
+# MONITOREO
+# ==============================================
+
+def metrics(request):
+    """Prometheus metrics, restricted to staff users or the METRICS_TOKEN bearer token"""
+    token = settings.METRICS_TOKEN
+    auth_header = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(auth_header, f'Bearer {token}')
+    if not token_ok and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('Forbidden')
+
+    payload, content_type = metrics_registry.render_latest()
+    return HttpResponse(payload, content_type=content_type)
+
+
+@staff_member_required
+def profile_list(request):
+    """Recent request profiles and the token to trigger new ones"""
+    profiles = RequestProfile.objects.select_related('user').defer('report', 'queries')[:100]
+    context = {
+        'profiles': profiles,
+        'profile_param': profiling.PROFILE_PARAM,
+        'profile_header': profiling.PROFILE_HEADER,
+        'profile_token': profiling.make_token(request.user),
+    }
+    return render(request, 'profiling/profile_list.html', context)
+
+
+@staff_member_required
+def profile_detail(request, pk):
+    """Call tree and SQL list of a stored profile"""
+    profile = get_object_or_404(RequestProfile, pk=pk)
+    queries = sorted(profile.queries, key=lambda q: q['duration_ms'], reverse=True)
+    context = {
+        'profile': profile,
+        'queries': queries,
+    }
+    return render(request, 'profiling/profile_detail.html', context)
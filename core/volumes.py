@@ -0,0 +1,52 @@
+"""
+Parser tolerante de volúmenes del Test del Balón.
+
+Los campos ``balloon_*`` de ``Appointment`` son texto libre; los profesionales
+escriben cosas como "40 ml", "40ml", "40cc", "45,5 ml", "40-60 ml",
+"40 a 60", "aprox. 50", ">200" o "no sintió". ``parse_volume_ml`` devuelve el
+volumen en ml como ``Decimal`` (el punto medio si es un rango) o ``None`` si no
+hay un número reconocible.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+MAX_VOLUME_ML = Decimal('5000')
+
+_NUMBER = r'(\d+(?:[.,]\d+)?)'
+_RANGE_RE = re.compile(_NUMBER + r'\s*(?:ml|cc)?\s*(?:-|–|—|a|al|/|hasta)\s*' + _NUMBER, re.IGNORECASE)
+_SINGLE_RE = re.compile(_NUMBER + r'\s*(ml|cc|cm3|cm³|l|lt|litros?)?\b', re.IGNORECASE)
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        return None
+
+
+def parse_volume_ml(text):
+    """Parse a free-text volume into millilitres, or None"""
+    if not text:
+        return None
+    text = text.strip().lower()
+
+    match = _RANGE_RE.search(text)
+    if match:
+        low, high = _to_decimal(match.group(1)), _to_decimal(match.group(2))
+        if low is None or high is None:
+            return None
+        volume = (low + high) / 2
+    else:
+        match = _SINGLE_RE.search(text)
+        if not match:
+            return None
+        volume = _to_decimal(match.group(1))
+        if volume is None:
+            return None
+        unit = (match.group(2) or '').lower()
+        if unit in ('l', 'lt', 'litro', 'litros'):
+            volume *= 1000
+
+    if volume < 0 or volume > MAX_VOLUME_ML:
+        return None
+    return volume.quantize(Decimal('0.1'))
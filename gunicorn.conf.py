@@ -0,0 +1,24 @@
+"""
+Configuración de gunicorn (se carga automáticamente desde el directorio de trabajo).
+
+Prepara el directorio compartido de prometheus_client para que /metrics sume
+los contadores de todos los workers.
+"""
+import os
+import shutil
+import tempfile
+
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'makimotion-metrics')
+)
+
+
+def on_starting(server):
+    # Los archivos de una ejecución anterior inflarían los contadores
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
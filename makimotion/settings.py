@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,14 +44,22 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    # Antes que cualquier middleware que lea o modifique el cuerpo de la respuesta
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.slow_queries.SlowQueryLogMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    # Dentro de CsrfViewMiddleware: recuerda si la página usó un token CSRF (core.compression)
+    'core.compression.CsrfTokenUsageMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Debe ir al final: devuelve la respuesta desde process_view
+    'core.profiling.RequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'makimotion.urls'
@@ -98,6 +108,36 @@ else:
     }
 
 
+# Cache
+# Los backends "Instrumented*" de core.metrics cuentan aciertos/fallos para /metrics.
+# 'default' es por proceso (LocMem): solo para datos que no se invalidan al escribir.
+# 'shared' la ven todos los workers de gunicorn: Redis si hay REDIS_URL, si no una tabla
+# de la BD (python manage.py createcachetable). Sesiones cacheadas, progreso y tarjetas van ahí.
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHES = {
+    'default': {
+        'BACKEND': 'core.metrics.InstrumentedLocMemCache',
+        'LOCATION': 'makimotion',
+    },
+    'shared': {
+        'BACKEND': 'core.metrics.InstrumentedRedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'core.metrics.InstrumentedDatabaseCache',
+        'LOCATION': 'core_cache',
+    },
+}
+# Backends cuyo contenido es común a todos los procesos
+SHARED_CACHE_BACKENDS = (
+    'core.metrics.InstrumentedDatabaseCache',
+    'core.metrics.InstrumentedRedisCache',
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -136,14 +176,117 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Salida de `manage.py build_assets` (CSS purgado/crítico, variantes del logo), publicada bajo static/build/
+ASSET_BUILD_DIR = BASE_DIR / 'static_build'
+ASSET_BUILD_ENABLED = os.getenv('ASSET_BUILD_ENABLED', str(not DEBUG)).lower() == 'true'
+if ASSET_BUILD_DIR.is_dir():
+    STATICFILES_DIRS.append(('build', ASSET_BUILD_DIR))
+
 # WhiteNoise configuration for better static file serving
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# (STATICFILES_STORAGE ya no existe en Django 5.1+; sin STORAGES no se generaban los nombres con hash).
+# Los archivos con hash se sirven con Cache-Control: max-age=315360000, public, immutable.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+    # Subidas y resultados de los trabajos (core.files): web y worker no comparten disco, así que
+    # debe ser un backend común a ambos (la BD por defecto, o p. ej. S3 con django-storages)
+    'jobs': {
+        'BACKEND': os.getenv('JOBS_STORAGE_BACKEND', 'core.files.DatabaseStorage'),
+    },
+}
+
+# Sessions
+# SESSION_STRATEGY: 'db' (por defecto de Django, una consulta por request), 'cached_db' (caché +
+# respaldo en BD), 'signed_cookies' (sin estado en el servidor) o 'cache' (solo caché).
+# cached_db y cache exigen que SESSION_CACHE_ALIAS sea compartida entre procesos: con una caché
+# por proceso, un logout en un worker no cierra la sesión en los demás. Sin Redis la caché
+# compartida es una tabla de la BD y cached_db no ahorra la consulta, así que por defecto se usa
+# cached_db solo con REDIS_URL y si no signed_cookies (la sesión solo guarda el usuario y los
+# mensajes, firmados con SECRET_KEY).
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_STRATEGY = os.getenv('SESSION_STRATEGY', 'cached_db' if REDIS_URL else 'signed_cookies')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
+SESSION_CACHE_ALIAS = os.getenv('SESSION_CACHE_ALIAS', 'shared')
+if SESSION_STRATEGY in ('cached_db', 'cache') and CACHES[SESSION_CACHE_ALIAS]['BACKEND'] not in SHARED_CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'SESSION_STRATEGY={SESSION_STRATEGY} needs SESSION_CACHE_ALIAS to be a cache shared by all '
+        f'processes (database, Redis or Memcached), not {CACHES[SESSION_CACHE_ALIAS]["BACKEND"]}'
+    )
 
 # Authentication
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Slow query log
+# Consultas sobre el umbral (ms) se escriben en un JSONL rotativo; un valor negativo lo desactiva.
+# SLOW_QUERY_EXPLAIN: '' (sin plan) o 'explain' (EXPLAIN simple de los SELECT, sin volver a ejecutarlos)
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '').lower()
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE', str(BASE_DIR / 'logs' / 'slow_queries.jsonl'))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUP_COUNT = int(os.getenv('SLOW_QUERY_LOG_BACKUP_COUNT', '5'))
+
+# Metrics (/metrics, formato Prometheus)
+# Accesible para usuarios staff o con "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Request profiling (?_profile=<token> o header X-Profile, solo staff)
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', str(60 * 60 * 8)))
+PROFILING_MAX_STORED = int(os.getenv('PROFILING_MAX_STORED', '200'))
+PROFILING_MAX_LINES = 80
+
+# Analytics: recalcular los agregados al guardar (si es False, solo con analytics_rollup)
+ANALYTICS_UPDATE_ON_WRITE = os.getenv('ANALYTICS_UPDATE_ON_WRITE', 'True').lower() == 'true'
+
+# Colapsar espacios en blanco del HTML antes de comprimir (core.compression)
+HTML_MINIFY = os.getenv('HTML_MINIFY', 'True').lower() == 'true'
+
+# Versión desplegada: forma parte de los ETag para que un cambio de plantillas invalide lo cacheado
+RELEASE_VERSION = os.getenv('RELEASE_VERSION', os.getenv('RENDER_GIT_COMMIT', ''))
+
+# Cola de trabajos en la BD (core.jobs, comando run_worker)
+# JOBS_EAGER ejecuta cada trabajo al encolarlo, sin worker (útil en desarrollo)
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '300'))
+JOB_RETRY_BASE_SECONDS = int(os.getenv('JOB_RETRY_BASE_SECONDS', '30'))
+JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', '7'))
+
+# Calendario (core.agenda): duración mostrada de cada cita y días pasados incluidos en el feed iCal
+APPOINTMENT_DURATION_MINUTES = int(os.getenv('APPOINTMENT_DURATION_MINUTES', '60'))
+CALENDAR_FEED_PAST_DAYS = int(os.getenv('CALENDAR_FEED_PAST_DAYS', '90'))
+
+# Sincronización de tablets (core.sync)
+# Margen antes de entregar una fila: debe superar la transacción de escritura más larga
+SYNC_SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', '300'))
+# Días que se guardan los borrados (cleanup_tombstones); un cursor más viejo recibe full_resync
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '90'))
+
+# Correo: en local se imprime en consola (o se escribe en EMAIL_FILE_PATH con el backend filebased)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() == 'true'
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '30'))
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'MakiMotion <no-reply@makimotion.cl>')
+
+# Recordatorios de citas (core.reminders, comando send_reminders)
+# Se recuerdan las citas que empiezan dentro de las próximas REMINDER_WINDOW_HOURS horas
+REMINDER_WINDOW_HOURS = int(os.getenv('REMINDER_WINDOW_HOURS', '24'))
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '500'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 